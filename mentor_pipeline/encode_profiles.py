@@ -0,0 +1,127 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from dataclasses import asdict, dataclass, field, replace
+import os
+from typing import Dict, List, Optional
+
+from mentor_pipeline.utils import yaml_load, yaml_write
+
+
+@dataclass
+class EncodeProfile:
+    """
+    How video assets get encoded.
+    The default values are the settings we've always used.
+    """
+
+    name: str = "default"
+    videoCodec: str = "libx264"
+    preset: str = ""  # empty uses the codec's default preset
+    crf: Optional[int] = 23
+    videoBitrate: str = ""  # e.g. 2M, used instead of crf when set
+    threads: int = 0  # 0 lets ffmpeg decide
+    audioCodec: str = "aac"
+    audioBitrate: str = ""
+    mobileHeight: int = 480
+    webMaxHeight: int = 720
+
+    def video_output_command(self) -> List[str]:
+        return (
+            ["-c:v", self.videoCodec]
+            + (["-preset", self.preset] if self.preset else [])
+            + (
+                ["-b:v", self.videoBitrate]
+                if self.videoBitrate
+                else (["-crf", f"{self.crf}"] if self.crf is not None else [])
+            )
+            + (["-threads", f"{self.threads}"] if self.threads > 0 else [])
+        )
+
+    def audio_output_command(self) -> List[str]:
+        return ["-c:a", self.audioCodec] + (
+            ["-b:a", self.audioBitrate] if self.audioBitrate else []
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+DEFAULT_ENCODE_PROFILE = EncodeProfile()
+
+BUILT_IN_ENCODE_PROFILES: Dict[str, EncodeProfile] = {
+    p.name: p
+    for p in [
+        DEFAULT_ENCODE_PROFILE,
+        EncodeProfile(name="preview", preset="veryfast", crf=28),
+        EncodeProfile(name="release", preset="slow", crf=20),
+    ]
+}
+
+
+@dataclass
+class EncodeProfileRegistry:
+    """
+    Encode profiles by name.
+
+    A config file looks like this
+    (every prop of a profile is optional, a profile may extend another one
+    by name and otherwise overrides any earlier profile with the same name):
+
+        default: preview
+        profiles:
+          preview:
+            threads: 2
+          release-1080:
+            extends: release
+            webMaxHeight: 1080
+    """
+
+    profiles: Dict[str, EncodeProfile] = field(
+        default_factory=lambda: dict(BUILT_IN_ENCODE_PROFILES)
+    )
+    default: str = ""
+
+    def find(self, name: str = "") -> Optional[EncodeProfile]:
+        """
+        returns the profile with the given name, or else the configured default
+        (None if neither is set, meaning callers use the settings we've always used)
+        """
+        name = name or self.default
+        if not name:
+            return None
+        if name not in self.profiles:
+            raise KeyError(
+                f"no encode profile named '{name}' (have {sorted(self.profiles.keys())})"
+            )
+        return self.profiles[name]
+
+    def update_from_dict(self, d: dict) -> None:
+        for name, props in ((d or {}).get("profiles") or {}).items():
+            props = dict(props or {})
+            base = self.profiles.get(props.pop("extends", name), DEFAULT_ENCODE_PROFILE)
+            self.profiles[name] = replace(base, name=name, **props)
+        self.default = (d or {}).get("default") or self.default
+
+
+def load_encode_profile_registry(config_files: List[str]) -> EncodeProfileRegistry:
+    """
+    builds a registry from the built-in profiles plus those
+    in each of the config files that exist (later files override earlier ones)
+    """
+    result = EncodeProfileRegistry()
+    for f in config_files:
+        if os.path.isfile(f):
+            result.update_from_dict(yaml_load(f))
+    return result
+
+
+def encode_profiles_by_asset_from_yaml(yml: str) -> Dict[str, str]:
+    return dict(yaml_load(yml) or {})
+
+
+def encode_profiles_by_asset_to_yaml(d: Dict[str, str], tgt_path: str) -> None:
+    yaml_write(d, tgt_path)
@@ -0,0 +1,212 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+import pickle
+import resource
+import time
+from typing import Callable, Generic, List, Optional, TypeVar
+
+from mentor_pipeline.progress import JobMetrics, progress_callback
+
+T = TypeVar("T")
+
+JobProgressCallback = Callable[[int, T, JobMetrics], None]
+
+
+@dataclass
+class JobResult(Generic[T]):
+    job: T
+    error: Optional[BaseException] = None
+    wall_time_secs: float = 0.0
+    metrics: JobMetrics = field(default_factory=JobMetrics)
+
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class JobsResultSummary:
+    jobCount: int
+    failedJobCount: int
+    maxWorkers: int
+    wallTimeSecs: float
+    jobsWallTimeSecs: float
+    cpuTimeSecs: float
+    mediaSecs: float
+    outputSize: int
+
+    def speed(self) -> float:
+        """
+        media secs processed per wall sec (x realtime)
+        """
+        return self.mediaSecs / self.wallTimeSecs if self.wallTimeSecs > 0 else 0.0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _cpu_time_secs() -> float:
+    # of this process and all its subprocesses that finished
+    return sum(
+        ru.ru_utime + ru.ru_stime
+        for ru in [
+            resource.getrusage(resource.RUSAGE_SELF),
+            resource.getrusage(resource.RUSAGE_CHILDREN),
+        ]
+    )
+
+
+@dataclass
+class JobsResult(Generic[T]):
+    max_workers: int = 1
+    results: List[JobResult[T]] = field(default_factory=lambda: [])
+    wall_time_secs: float = 0.0
+    cpu_time_secs: float = 0.0
+
+    def failed(self) -> List[JobResult[T]]:
+        return [r for r in self.results if not r.succeeded()]
+
+    def jobs_wall_time_secs(self) -> float:
+        """
+        returns the sum of wall time for all jobs,
+        i.e. roughly how long the jobs would have taken to run serially
+        """
+        return sum(r.wall_time_secs for r in self.results)
+
+    def metrics_summary(self) -> JobsResultSummary:
+        return JobsResultSummary(
+            jobCount=len(self.results),
+            failedJobCount=len(self.failed()),
+            maxWorkers=self.max_workers,
+            wallTimeSecs=self.wall_time_secs,
+            jobsWallTimeSecs=self.jobs_wall_time_secs(),
+            cpuTimeSecs=self.cpu_time_secs,
+            mediaSecs=sum(r.metrics.mediaSecs for r in self.results),
+            outputSize=sum(r.metrics.outputSize for r in self.results),
+        )
+
+    def summary(self) -> str:
+        speedup = (
+            self.jobs_wall_time_secs() / self.wall_time_secs
+            if self.wall_time_secs > 0
+            else 1.0
+        )
+        s = self.metrics_summary()
+        return (
+            f"{len(self.results)} jobs ({len(self.failed())} failed)"
+            f" with {self.max_workers} workers"
+            f" in {self.wall_time_secs:.2f}s"
+            f" (sum of job times {self.jobs_wall_time_secs():.2f}s, {speedup:.1f}x)"
+            f" cpu-time={s.cpuTimeSecs:.2f}s"
+        ) + (
+            f" media={s.mediaSecs:.1f}s ({s.speed():.1f}x realtime)"
+            f" output-size={s.outputSize}B"
+            if s.mediaSecs > 0
+            else ""
+        )
+
+
+def _run_job(
+    job_func: Callable[[int, T], None],
+    i: int,
+    job: T,
+    on_progress: Optional[JobProgressCallback] = None,
+) -> JobResult[T]:
+    result = JobResult(job=job)
+
+    def _on_ffmpeg_progress(p) -> None:
+        result.metrics.update(p)
+        if on_progress:
+            on_progress(i, job, result.metrics)
+
+    time_start = time.perf_counter()
+    try:
+        with progress_callback(_on_ffmpeg_progress):
+            job_func(i, job)
+    except BaseException as err:
+        result.error = err
+    result.wall_time_secs = time.perf_counter() - time_start
+    result.metrics.finish()
+    return result
+
+
+def _picklable_error(err: BaseException) -> BaseException:
+    """
+    the error if it survives pickling, otherwise a RuntimeError with its message
+    (e.g. ffmpy.FFRuntimeError can't be unpickled,
+    which would break the process pool that returns it)
+    """
+    try:
+        pickle.loads(pickle.dumps(err))
+        return err
+    except Exception:
+        return RuntimeError(f"{type(err).__name__}: {err}")
+
+
+def _run_job_in_process(
+    job_func: Callable[[int, T], None], i: int, job: T
+) -> JobResult[T]:
+    result = _run_job(job_func, i, job)
+    if result.error is not None:
+        result.error = _picklable_error(result.error)
+    return result
+
+
+def run_jobs(
+    jobs: List[T],
+    job_func: Callable[[int, T], None],
+    max_workers: int = 1,
+    on_progress: Optional[JobProgressCallback] = None,
+    use_processes: bool = False,
+) -> JobsResult[T]:
+    """
+    Runs job_func(i, job) for every job in a pool of max_workers threads.
+
+    The heavy lifting for most of our jobs happens in ffmpeg subprocesses,
+    so a thread pool is enough to keep all cores busy.
+    For jobs that do their heavy lifting in python (e.g. numpy),
+    use_processes runs them in a pool of processes instead
+    (job_func and jobs must then be picklable, i.e. module level,
+    there is no on_progress, and an error that can't be pickled
+    comes back as a RuntimeError with its type and message).
+    With max_workers=1 jobs run serially, in order, on the calling thread.
+
+    Returns a JobResult for each job in the same order as jobs
+    (NOT in order of completion). An exception raised by job_func
+    is captured in the JobResult instead of raised.
+
+    The ffmpeg runs of each job report their progress into its metrics
+    (media secs and output size, see progress.JobMetrics),
+    and on_progress(i, job, metrics) is called with every update.
+    """
+    time_start = time.perf_counter()
+    cpu_start = _cpu_time_secs()
+    if max_workers <= 1 or len(jobs) <= 1:
+        results = [
+            _run_job(job_func, i, job, on_progress) for i, job in enumerate(jobs)
+        ]
+    elif use_processes:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_run_job_in_process, job_func, i, job)
+                for i, job in enumerate(jobs)
+            ]
+            results = [f.result() for f in futures]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_run_job, job_func, i, job, on_progress)
+                for i, job in enumerate(jobs)
+            ]
+            results = [f.result() for f in futures]
+    return JobsResult(
+        max_workers=max_workers,
+        results=results,
+        wall_time_secs=time.perf_counter() - time_start,
+        cpu_time_secs=_cpu_time_secs() - cpu_start,
+    )
@@ -0,0 +1,95 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from dataclasses import asdict, dataclass, field
+import os
+from typing import Dict, Optional
+
+from mentor_pipeline.media_tools import LoudnessMeasurement
+from mentor_pipeline.utils import yaml_load, yaml_write
+
+
+@dataclass
+class SessionLoudness:
+    """
+    the loudness measurement of a session file,
+    along with the size and mtime of the file when it was measured
+    """
+
+    size: int
+    mtime: float
+    normalizeAudioLrt: int
+    loudness: LoudnessMeasurement
+
+    def __post_init__(self):
+        if isinstance(self.loudness, dict):
+            self.loudness = LoudnessMeasurement(**self.loudness)
+
+    def is_valid_for(self, session_file: str, normalize_audio_lrt: int = 7) -> bool:
+        if not os.path.isfile(session_file):
+            return False
+        st = os.stat(session_file)
+        return (
+            self.size == st.st_size
+            and self.mtime == st.st_mtime
+            and self.normalizeAudioLrt == normalize_audio_lrt
+        )
+
+
+@dataclass
+class SessionLoudnessMap:
+    """
+    loudness measurements by session file
+    (path relative to the mentor's data)
+    """
+
+    loudnessBySession: Dict[str, SessionLoudness] = field(default_factory=lambda: {})
+
+    def __post_init__(self):
+        self.loudnessBySession = {
+            k: v if isinstance(v, SessionLoudness) else SessionLoudness(**v)
+            for k, v in (self.loudnessBySession or {}).items()
+        }
+
+    def find(
+        self, session_key: str, session_file: str, normalize_audio_lrt: int = 7
+    ) -> Optional[LoudnessMeasurement]:
+        """
+        returns the measurement for a session
+        only if the session file hasn't changed since it was measured
+        """
+        sl = self.loudnessBySession.get(session_key)
+        return (
+            sl.loudness
+            if sl and sl.is_valid_for(session_file, normalize_audio_lrt)
+            else None
+        )
+
+    def set(
+        self,
+        session_key: str,
+        session_file: str,
+        loudness: LoudnessMeasurement,
+        normalize_audio_lrt: int = 7,
+    ) -> None:
+        st = os.stat(session_file)
+        self.loudnessBySession[session_key] = SessionLoudness(
+            size=st.st_size,
+            mtime=st.st_mtime,
+            normalizeAudioLrt=normalize_audio_lrt,
+            loudness=loudness,
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def session_loudness_from_yaml(yml: str) -> SessionLoudnessMap:
+    return SessionLoudnessMap(**(yaml_load(yml) or {}))
+
+
+def session_loudness_to_yaml(slm: SessionLoudnessMap, tgt_path: str) -> None:
+    yaml_write(slm.to_dict(), tgt_path)
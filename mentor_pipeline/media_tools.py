@@ -4,26 +4,109 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
+from dataclasses import dataclass
+import json
 import os
 import re
+import shutil
 import subprocess
+import tempfile
+from typing import Any, Callable, Dict, List, Optional
 
 import ffmpy
-from pymediainfo import MediaInfo
+
+from mentor_pipeline.encode_profiles import DEFAULT_ENCODE_PROFILE, EncodeProfile
+from mentor_pipeline.probe import find_media_probe
+from mentor_pipeline.progress import is_reporting_progress, run_with_progress
+from mentor_pipeline.utils import staged_file_path, staged_files
+
+
+def _ffmpeg(outputs: Dict[str, Any], **kwargs) -> None:
+    """
+    runs ffmpeg (args as for ffmpy.FFmpeg).
+    When the calling thread is reporting progress (see progress.progress_callback),
+    ffmpeg writes -progress to a pipe that's parsed and reported as it runs
+    """
+    if not is_reporting_progress():
+        ffmpy.FFmpeg(outputs=outputs, **kwargs).run()
+        return
+    global_options = kwargs.pop("global_options", None)
+    global_options = (
+        global_options.split()
+        if isinstance(global_options, str)
+        else list(global_options or [])
+    ) + ["-progress", "pipe:1", "-nostats"]
+    ff = ffmpy.FFmpeg(outputs=outputs, global_options=global_options, **kwargs)
+    run_with_progress(ff.run, output_files=list(outputs.keys()))
+
+
+def _run_ffmpeg(outputs: Dict[str, Any], **kwargs) -> None:
+    """
+    runs ffmpeg with each output written to a staged file
+    that's renamed to the output only once ffmpeg completes it
+    (see utils.staged_files), so an output that exists is never partial
+    """
+    targets = list(outputs.keys())
+    with staged_files(targets) as staged:
+        _ffmpeg(outputs={s: outputs[t] for s, t in zip(staged, targets)}, **kwargs)
+
+
+@dataclass
+class MediaSlice:
+    target_file: str
+    time_start: float
+    time_end: float
+
+
+def _chunk_slices(
+    slices: List[MediaSlice], max_outputs_per_call: int
+) -> List[List[MediaSlice]]:
+    slices_sorted = sorted(slices, key=lambda s: (s.time_start, s.time_end))
+    n = max(1, max_outputs_per_call)
+    return [slices_sorted[i : i + n] for i in range(0, len(slices_sorted), n)]
+
+
+def _slice_session(
+    src_file: str,
+    slices: List[MediaSlice],
+    output_command: Callable[[MediaSlice], List[str]],
+    max_outputs_per_call: int,
+) -> None:
+    """
+    Writes many slices of one session file with a single decode of the session.
+
+    Slices are sorted by start time and produced in chunks of
+    max_outputs_per_call outputs per ffmpeg call (to bound the number of
+    encoders running at once). Each call seeks the input to the start
+    of its first slice, so no part of the session is decoded more than
+    once no matter how many slices there are.
+    """
+    for chunk in _chunk_slices(slices, max_outputs_per_call):
+        seek = min(s.time_start for s in chunk)
+        outputs = {}
+        for s in chunk:
+            os.makedirs(os.path.dirname(s.target_file), exist_ok=True)
+            outputs[s.target_file] = tuple(
+                [
+                    "-ss",
+                    f"{round(s.time_start - seek, 3)}",
+                    "-to",
+                    f"{round(s.time_end - seek, 3)}",
+                ]
+                + output_command(s)
+            )
+        _run_ffmpeg(
+            inputs={src_file: ("-y", "-ss", f"{seek}", "-loglevel", "quiet")},
+            outputs=outputs,
+        )
 
 
 def find_video_dims(video_file):
-    media_info = MediaInfo.parse(video_file)
-    video_tracks = [t for t in media_info.tracks if t.track_type == "Video"]
-    return (
-        (video_tracks[0].width, video_tracks[0].height)
-        if len(video_tracks) >= 1
-        else (-1, -1)
-    )
+    p = find_media_probe(video_file)
+    return (p.width, p.height) if p.has_video() else (-1, -1)
 
 
-def video_encode_for_mobile(src_file: str, tgt_file: str, target_height=480) -> None:
-    i_w, i_h = find_video_dims(src_file)
+def _video_mobile_filter(i_w: int, i_h: int, target_height=480) -> str:
     o_w, o_h = (target_height, target_height)
     crop_w = 0
     crop_h = 0
@@ -34,36 +117,12 @@ def video_encode_for_mobile(src_file: str, tgt_file: str, target_height=480) ->
         crop_w = i_w - (i_h - crop_h)
     else:
         crop_h = crop_h - crop_h
-    os.makedirs(os.path.dirname(tgt_file), exist_ok=True)
-    output_command = [
-        "-y",
-        "-filter:v",
-        f"crop=iw-{crop_w:.0f}:ih-{crop_h:.0f},scale={o_w:.0f}:{o_h:.0f}",
-        "-c:v",
-        "libx264",
-        "-crf",
-        "23",
-        "-pix_fmt",
-        "yuv420p",
-        "-movflags",
-        "+faststart",
-        "-c:a",
-        "aac",
-        "-ac",
-        "1",
-        "-loglevel",
-        "quiet",
-    ]
-    ff = ffmpy.FFmpeg(
-        inputs={src_file: None}, outputs={tgt_file: tuple(i for i in output_command)}
-    )
-    ff.run()
+    return f"crop=iw-{crop_w:.0f}:ih-{crop_h:.0f},scale={o_w:.0f}:{o_h:.0f}"
 
 
-def video_encode_for_web(
-    src_file: str, tgt_file: str, max_height=720, target_aspect=1.77777777778
-) -> None:
-    i_w, i_h = find_video_dims(src_file)
+def _video_web_filter(
+    i_w: int, i_h: int, max_height=720, target_aspect=1.77777777778
+) -> str:
     crop_w = 0
     crop_h = 0
     o_w = 0
@@ -80,30 +139,190 @@ def video_encode_for_web(
         o_w += 1  # ensure width is divisible by 2
     if o_h % 2 != 0:
         o_h += 1  # ensure height is divisible by 2
+    return f"crop=iw-{crop_w:.0f}:ih-{crop_h:.0f},scale={o_w:.0f}:{o_h:.0f}"
+
+
+def _video_encode_output_command(
+    profile: Optional[EncodeProfile] = None, mp4_profile_and_level: bool = False
+) -> List[str]:
+    """
+    output options to encode video (and audio) with an encode profile.
+    With mp4_profile_and_level, the video is encoded with
+    the (main) profile and level we use for utterance videos
+    """
+    p = profile or DEFAULT_ENCODE_PROFILE
+    return (
+        p.video_output_command()
+        + ["-pix_fmt", "yuv420p", "-movflags", "+faststart"]
+        + (["-profile:v", "main", "-level", "4.0"] if mp4_profile_and_level else [])
+        + p.audio_output_command()
+        + ["-ac", "1"]
+    )
+
+
+def video_encode_for_mobile(
+    src_file: str,
+    tgt_file: str,
+    target_height: Optional[int] = None,
+    profile: Optional[EncodeProfile] = None,
+) -> None:
+    """
+    encodes a square video (target_height defaults to the profile's mobileHeight)
+    """
+    i_w, i_h = find_video_dims(src_file)
+    target_height = target_height or (profile or DEFAULT_ENCODE_PROFILE).mobileHeight
     os.makedirs(os.path.dirname(tgt_file), exist_ok=True)
-    output_command = [
-        "-y",
-        "-filter:v",
-        f"crop=iw-{crop_w:.0f}:ih-{crop_h:.0f},scale={o_w:.0f}:{o_h:.0f}",
-        "-c:v",
-        "libx264",
-        "-crf",
-        "23",
-        "-pix_fmt",
-        "yuv420p",
-        "-movflags",
-        "+faststart",
-        "-c:a",
-        "aac",
-        "-ac",
-        "1",
+    output_command = (
+        ["-y", "-filter:v", _video_mobile_filter(i_w, i_h, target_height)]
+        + _video_encode_output_command(profile)
+        + ["-loglevel", "quiet"]
+    )
+    _run_ffmpeg(
+        inputs={src_file: None}, outputs={tgt_file: tuple(i for i in output_command)}
+    )
+
+
+def video_encode_for_web(
+    src_file: str,
+    tgt_file: str,
+    max_height: Optional[int] = None,
+    target_aspect=1.77777777778,
+    profile: Optional[EncodeProfile] = None,
+) -> None:
+    """
+    encodes a 16:9 video (max_height defaults to the profile's webMaxHeight)
+    """
+    i_w, i_h = find_video_dims(src_file)
+    max_height = max_height or (profile or DEFAULT_ENCODE_PROFILE).webMaxHeight
+    os.makedirs(os.path.dirname(tgt_file), exist_ok=True)
+    output_command = (
+        ["-y", "-filter:v", _video_web_filter(i_w, i_h, max_height, target_aspect)]
+        + _video_encode_output_command(profile)
+        + ["-loglevel", "quiet"]
+    )
+    _run_ffmpeg(
+        inputs={src_file: None}, outputs={tgt_file: tuple(i for i in output_command)}
+    )
+
+
+@dataclass
+class HlsRendition:
+    """
+    one rung of an HLS bitrate ladder (a 16:9 video of the given height)
+    """
+
+    height: int
+    videoBitrate: str
+    audioBitrate: str
+
+
+DEFAULT_HLS_LADDER = [
+    HlsRendition(height=240, videoBitrate="400k", audioBitrate="64k"),
+    HlsRendition(height=360, videoBitrate="800k", audioBitrate="96k"),
+    HlsRendition(height=720, videoBitrate="2500k", audioBitrate="128k"),
+]
+
+
+def _hls_ladder_for_source(
+    i_w: int, i_h: int, ladder: List[HlsRendition], target_aspect: float
+) -> List[HlsRendition]:
+    """
+    the renditions of the ladder that don't upscale the source
+    (always at least the smallest one)
+    """
+    ladder = sorted(ladder, key=lambda r: r.height)
+    max_height = round(min(i_h, i_w / target_aspect))
+    return [r for r in ladder if r.height <= max_height] or ladder[:1]
+
+
+def video_encode_for_hls(
+    src_file: str,
+    tgt_file: str,
+    ladder: Optional[List[HlsRendition]] = None,
+    segment_time: int = 4,
+    target_aspect=1.77777777778,
+    profile: Optional[EncodeProfile] = None,
+) -> None:
+    """
+    encodes a bitrate ladder of 16:9 videos (DEFAULT_HLS_LADDER by default)
+    from one decode of the source and packages it as fragmented-mp4 HLS.
+
+    tgt_file is the master playlist, and each rendition goes
+    in a dir named for its height next to it, e.g.
+
+        hls/u1/master.m3u8
+        hls/u1/360p/index.m3u8
+        hls/u1/360p/init_1.mp4
+        hls/u1/360p/seg_000.m4s
+
+    Keyframes are forced at every segment boundary
+    so that clients can switch renditions between any two segments.
+    The profile's video codec, preset and threads are used,
+    but bitrates come from the ladder
+    """
+    i_w, i_h = find_video_dims(src_file)
+    p = profile or DEFAULT_ENCODE_PROFILE
+    renditions = _hls_ladder_for_source(
+        i_w, i_h, ladder or DEFAULT_HLS_LADDER, target_aspect
+    )
+    n = len(renditions)
+    filter_graph = ";".join(
+        [f"[0:v]split={n}" + "".join(f"[vs{i}]" for i in range(n))]
+        + [
+            f"[vs{i}]{_video_web_filter(i_w, i_h, r.height, target_aspect)}[v{i}]"
+            for i, r in enumerate(renditions)
+        ]
+    )
+    tgt_dir = os.path.dirname(tgt_file)
+    os.makedirs(tgt_dir, exist_ok=True)
+    output_command = ["-y"]
+    for i, r in enumerate(renditions):
+        output_command += ["-map", f"[v{i}]", "-map", "0:a:0"]
+    output_command += (
+        ["-c:v", p.videoCodec]
+        + (["-preset", p.preset] if p.preset else [])
+        + (["-threads", f"{p.threads}"] if p.threads > 0 else [])
+        + ["-pix_fmt", "yuv420p", "-sc_threshold", "0"]
+        + ["-force_key_frames", f"expr:gte(t,n_forced*{segment_time})"]
+        + ["-c:a", p.audioCodec, "-ac", "1", "-ar", "48000"]
+    )
+    for i, r in enumerate(renditions):
+        output_command += [
+            f"-b:v:{i}",
+            r.videoBitrate,
+            f"-maxrate:v:{i}",
+            r.videoBitrate,
+            f"-bufsize:v:{i}",
+            r.videoBitrate,
+            f"-b:a:{i}",
+            r.audioBitrate,
+        ]
+    output_command += [
+        "-f",
+        "hls",
+        "-hls_time",
+        f"{segment_time}",
+        "-hls_playlist_type",
+        "vod",
+        "-hls_segment_type",
+        "fmp4",
+        "-hls_segment_filename",
+        os.path.join(tgt_dir, "%v", "seg_%03d.m4s"),
+        "-master_pl_name",
+        # the master playlist is written last, staged like any other output
+        # (see _run_ffmpeg), so that it exists only once every rendition does
+        os.path.basename(staged_file_path(tgt_file)),
+        "-var_stream_map",
+        " ".join(f"v:{i},a:{i},name:{r.height}p" for i, r in enumerate(renditions)),
         "-loglevel",
         "quiet",
     ]
-    ff = ffmpy.FFmpeg(
-        inputs={src_file: None}, outputs={tgt_file: tuple(i for i in output_command)}
-    )
-    ff.run()
+    with staged_files([tgt_file]):
+        _ffmpeg(
+            global_options=["-filter_complex", filter_graph],
+            inputs={src_file: None},
+            outputs={os.path.join(tgt_dir, "%v", "index.m3u8"): tuple(output_command)},
+        )
 
 
 def slice_audio(
@@ -125,10 +344,211 @@ def slice_audio(
     if target_file.endswith(".mp3"):
         output_command.extend(["-acodec", "libmp3lame"])
     os.makedirs(os.path.dirname(target_file), exist_ok=True)
-    ff = ffmpy.FFmpeg(
+    _run_ffmpeg(
         inputs={src_file: None}, outputs={target_file: tuple(i for i in output_command)}
     )
-    ff.run()
+
+
+def slice_audio_session(
+    src_file: str, slices: List[MediaSlice], max_outputs_per_call: int = 32
+) -> None:
+    """
+    Like slice_audio, but for all slices of one session audio file at once
+    (see _slice_session)
+    """
+    _slice_session(
+        src_file,
+        slices,
+        lambda s: ["-ac", "1", "-q:a", "5"]
+        + (["-acodec", "libmp3lame"] if s.target_file.endswith(".mp3") else []),
+        max_outputs_per_call,
+    )
+
+
+@dataclass
+class LoudnessMeasurement:
+    """
+    the EBU R128 stats of a whole file, as measured by ffmpeg's loudnorm filter
+    """
+
+    input_i: float
+    input_lra: float
+    input_tp: float
+    input_thresh: float
+    target_offset: float
+
+
+def _loudnorm_filter(normalize_audio_lrt: int = 7) -> str:
+    return f"loudnorm=I=-23:LRA={normalize_audio_lrt}:TP=-2"
+
+
+def measure_loudness(
+    src_file: str, normalize_audio_lrt: int = 7
+) -> LoudnessMeasurement:
+    """
+    Runs the (analysis only) first pass of loudnorm over the audio of a file.
+    Nothing is encoded.
+    """
+    ff = ffmpy.FFmpeg(
+        global_options="-hide_banner -nostats",
+        inputs={src_file: None},
+        outputs={
+            "-": (
+                "-vn",
+                "-af",
+                f"{_loudnorm_filter(normalize_audio_lrt)}:print_format=json",
+                "-f",
+                "null",
+            )
+        },
+    )
+    _, stderr = ff.run(stderr=subprocess.PIPE)
+    stats_json = re.findall(r"\{[^{}]*\}", (stderr or b"").decode("utf-8"))
+    if not stats_json:
+        raise ValueError(f"no loudnorm stats in ffmpeg output for {src_file}")
+    stats = json.loads(stats_json[-1])
+    return LoudnessMeasurement(
+        input_i=float(stats["input_i"]),
+        input_lra=float(stats["input_lra"]),
+        input_tp=float(stats["input_tp"]),
+        input_thresh=float(stats["input_thresh"]),
+        target_offset=float(stats["target_offset"]),
+    )
+
+
+def _loudnorm_filter_measured(
+    normalize_audio_lrt: int = 7, loudness: Optional[LoudnessMeasurement] = None
+) -> str:
+    """
+    loudnorm with the same targets ffmpeg-normalize uses for slice_video
+    (EBU R128: -23 LUFS, -2 dBTP) but in a single pass.
+
+    Given a measurement (see measure_loudness) of the whole source,
+    the filter applies it as a linear gain instead of estimating
+    loudness on the fly from the slice alone.
+    """
+    measured = (
+        (
+            f":measured_I={loudness.input_i}"
+            f":measured_LRA={loudness.input_lra}"
+            f":measured_TP={loudness.input_tp}"
+            f":measured_thresh={loudness.input_thresh}"
+            f":offset={loudness.target_offset}"
+            ":linear=true"
+        )
+        if loudness
+        else ""
+    )
+    return f"{_loudnorm_filter(normalize_audio_lrt)}{measured}"
+
+
+def _loudnorm_command(
+    normalize_audio_lrt: int = 7, loudness: Optional[LoudnessMeasurement] = None
+) -> List[str]:
+    """
+    output options to normalize audio (see _loudnorm_filter_measured)
+    """
+    return [
+        "-af",
+        _loudnorm_filter_measured(normalize_audio_lrt, loudness),
+        "-ar",
+        "48000",
+    ]
+
+
+def _slice_video_output_command(
+    normalize_audio: bool,
+    normalize_audio_lrt: int = 7,
+    loudness: Optional[LoudnessMeasurement] = None,
+    profile: Optional[EncodeProfile] = None,
+) -> List[str]:
+    return _video_encode_output_command(profile, mp4_profile_and_level=True) + (
+        _loudnorm_command(normalize_audio_lrt, loudness) if normalize_audio else []
+    )
+
+
+def slice_video_session(
+    src_file: str,
+    slices: List[MediaSlice],
+    normalize_audio: bool = True,
+    normalize_audio_lrt: int = 7,
+    max_outputs_per_call: int = 8,
+    loudness: Optional[LoudnessMeasurement] = None,
+    profile: Optional[EncodeProfile] = None,
+) -> None:
+    """
+    Like slice_video, but for all slices of one session video at once
+    (see _slice_session).
+
+    ffmpeg-normalize only handles one output at a time,
+    so audio normalization here uses ffmpeg's loudnorm filter
+    with the same targets instead.
+    """
+    output_command = _slice_video_output_command(
+        normalize_audio, normalize_audio_lrt, loudness, profile
+    )
+    _slice_session(src_file, slices, lambda s: output_command, max_outputs_per_call)
+
+
+def slice_video_renditions(
+    src_file: str,
+    time_start: float,
+    time_end: float,
+    target_file: Optional[str] = None,
+    mobile_target_file: Optional[str] = None,
+    web_target_file: Optional[str] = None,
+    normalize_audio: bool = True,
+    normalize_audio_lrt: int = 7,
+    loudness: Optional[LoudnessMeasurement] = None,
+    profile: Optional[EncodeProfile] = None,
+) -> None:
+    """
+    Slices [time_start, time_end] from src_file to the utterance video
+    and its mobile and web renditions all at once: the range is decoded once
+    and a split filter graph feeds one encoder per target
+    (so the renditions are encoded from the source, not from the slice).
+
+    Any target that is None is not written.
+    Audio is normalized once (with loudnorm, see slice_video_session)
+    and shared by all targets.
+    """
+    i_w, i_h = find_video_dims(src_file)
+    p = profile or DEFAULT_ENCODE_PROFILE
+    video_targets = [
+        (target_file, "null"),
+        (mobile_target_file, _video_mobile_filter(i_w, i_h, p.mobileHeight)),
+        (web_target_file, _video_web_filter(i_w, i_h, p.webMaxHeight)),
+    ]
+    video_targets = [(t, f) for t, f in video_targets if t]
+    if not video_targets:
+        return
+    n = len(video_targets)
+    audio_filter = (
+        f"{_loudnorm_filter_measured(normalize_audio_lrt, loudness)},aresample=48000,"
+        if normalize_audio
+        else ""
+    )
+    filter_graph = ";".join(
+        [
+            f"[0:v]split={n}" + "".join(f"[vs{i}]" for i in range(n)),
+            f"[0:a]{audio_filter}asplit={n}" + "".join(f"[a{i}]" for i in range(n)),
+        ]
+        + [f"[vs{i}]{f}[v{i}]" for i, (_, f) in enumerate(video_targets)]
+    )
+    outputs = {}
+    for i, (t, _) in enumerate(video_targets):
+        os.makedirs(os.path.dirname(t), exist_ok=True)
+        outputs[t] = tuple(
+            ["-map", f"[v{i}]", "-map", f"[a{i}]"]
+            + _video_encode_output_command(
+                profile, mp4_profile_and_level=t == target_file
+            )
+        )
+    _run_ffmpeg(
+        global_options=["-y", "-loglevel", "quiet", "-filter_complex", filter_graph],
+        inputs={src_file: ("-ss", f"{time_start}", "-to", f"{time_end}")},
+        outputs=outputs,
+    )
 
 
 def slice_video(
@@ -138,64 +558,357 @@ def slice_video(
     time_end: float,
     normalize_audio: bool = True,
     normalize_audio_lrt: int = 7,
+    loudness: Optional[LoudnessMeasurement] = None,
+    profile: Optional[EncodeProfile] = None,
 ) -> None:
+    """
+    Slices [time_start, time_end] from src_file to target_file.
+
+    With normalize_audio (and no loudness measurement), ffmpeg-normalize
+    measures the loudness of the slice and then encodes it (two passes).
+    Given the loudness measurement of the whole src_file,
+    the slice is normalized and encoded in a single pass instead.
+    """
+    p = profile or DEFAULT_ENCODE_PROFILE
     os.makedirs(os.path.dirname(target_file), exist_ok=True)
-    if normalize_audio:
-        subprocess.run(
-            [
-                "ffmpeg-normalize",
-                src_file,
-                "--output",
-                target_file,
-                "-lrt",
-                "7",
-                "-v",
-                "-c:a",
-                "aac",
-                "-c:v",
-                "libx264",
-                "-ext",
-                "mp4",
-                "--extra-output-options",
-                f"-y -ss {time_start} -to {time_end} -crf 23 -pix_fmt yuv420p -movflags +faststart -profile:v main -level 4.0 -loglevel quiet",
+    if normalize_audio and not loudness:
+        # ffmpeg-normalize takes the codecs as its own options
+        # and everything else as extra output options
+        video_options = " ".join(p.video_output_command()[2:])
+        with staged_files([target_file]) as [staged_file]:
+            subprocess.run(
+                [
+                    "ffmpeg-normalize",
+                    src_file,
+                    "--output",
+                    staged_file,
+                    "-lrt",
+                    "7",
+                    "-v",
+                    "-c:a",
+                    p.audioCodec,
+                    "-c:v",
+                    p.videoCodec,
+                    "-ext",
+                    "mp4",
+                ]
+                + (["-b:a", p.audioBitrate] if p.audioBitrate else [])
+                + [
+                    "--extra-output-options",
+                    f"-y -ss {time_start} -to {time_end} {video_options} -pix_fmt yuv420p -movflags +faststart -profile:v main -level 4.0 -loglevel quiet",
+                ],
+                check=True,
+            )
+    else:
+        output_command = (
+            ["-y", "-ss", f"{time_start}", "-to", f"{time_end}"]
+            + _video_encode_output_command(profile, mp4_profile_and_level=True)
+            + (
+                _loudnorm_command(normalize_audio_lrt, loudness)
+                if normalize_audio
+                else []
+            )
+            + [
+                "-loglevel",
+                "quiet",
             ]
         )
-    else:
-        output_command = [
-            "-y",
-            "-ss",
-            f"{time_start}",
-            "-to",
-            f"{time_end}",
-            "-c:v",
-            "libx264",
-            "-crf",
-            "23",
-            "-pix_fmt",
-            "yuv420p",
-            "-movflags",
-            "+faststart",
-            "-c:a",
-            "aac",
-            "-ac",
-            "1",
-            "-profile:v",
-            "main",
-            "-level",
-            "4.0",
-            "-loglevel",
-            "quiet",
-        ]
-        ff = ffmpy.FFmpeg(
+        _run_ffmpeg(
             inputs={src_file: None},
             outputs={target_file: tuple(i for i in output_command)},
         )
-        ff.run()
+
+
+def _ffprobe_json(src_file: str, probe_command: List[str]) -> dict:
+    ff = ffmpy.FFprobe(
+        inputs={src_file: tuple(["-v", "error", "-of", "json"] + probe_command)}
+    )
+    stdout, _ = ff.run(stdout=subprocess.PIPE)
+    return json.loads(stdout or "{}")
+
+
+def find_video_stream_info(video_file: str) -> dict:
+    """
+    returns ffprobe's info (codec_name, profile, pix_fmt, width, height...)
+    for the first video stream of a file or an empty dict if there is none
+    """
+    streams = _ffprobe_json(
+        video_file, ["-select_streams", "v:0", "-show_streams"]
+    ).get("streams", [])
+    return streams[0] if streams else {}
+
+
+def _find_keyframe_packets(
+    video_file: str, time_start: float = 0.0, time_end: Optional[float] = None
+) -> List[dict]:
+    interval = f"{time_start}%{time_end}" if time_end is not None else f"{time_start}%"
+    packets = _ffprobe_json(
+        video_file,
+        [
+            "-select_streams",
+            "v:0",
+            "-read_intervals",
+            interval,
+            "-show_entries",
+            "packet=pts_time,dts_time,flags",
+        ],
+    ).get("packets", [])
+    return sorted(
+        (
+            p
+            for p in packets
+            if "K" in p.get("flags", "")
+            and p.get("pts_time", "N/A") != "N/A"
+            and p.get("dts_time", "N/A") != "N/A"
+        ),
+        key=lambda p: float(p["pts_time"]),
+    )
+
+
+def find_keyframe_times(
+    video_file: str, time_start: float = 0.0, time_end: Optional[float] = None
+) -> List[float]:
+    """
+    returns the (sorted) times of all video keyframes between time_start and time_end.
+    Reads packet flags only, so nothing is decoded.
+    """
+    return [
+        float(p["pts_time"])
+        for p in _find_keyframe_packets(video_file, time_start, time_end)
+    ]
+
+
+# codecs (and pixel formats) for which re-encoded edges made by libx264
+# can be concatenated with stream-copied packets from the source
+_SMART_CUT_CODECS = ["h264"]
+_SMART_CUT_PIX_FMTS = ["yuv420p", "yuvj420p"]
+# probed keyframe times are rounded to the microsecond.
+# Seeking a hair past the rounded time makes sure a stream-copy seek
+# never lands on the keyframe before the one we want
+_SMART_CUT_SEEK_OFFSET = 0.000001
+# ...and ending the copied part a bit before the next keyframe
+# makes sure that keyframe is left for the re-encoded tail
+_SMART_CUT_END_OFFSET = 0.001
+
+
+def _smart_cut_encode_command(
+    video_info: dict, profile: Optional[EncodeProfile] = None
+) -> List[str]:
+    """
+    output options to re-encode the edges of a smart cut
+    so they're compatible with the stream-copied middle.
+    B-frames are disabled so edge timestamps never overlap the middle's.
+    Only the preset and threads of an encode profile apply
+    (the edges must match the source, not the profile)
+    """
+    p = profile or DEFAULT_ENCODE_PROFILE
+    h264_profile = (
+        str(video_info.get("profile", "")).lower().replace("constrained ", "")
+    )
+    level = video_info.get("level")
+    return (
+        ["-an", "-c:v", "libx264", "-crf", "18", "-bf", "0", "-pix_fmt", "yuv420p"]
+        + (["-preset", p.preset] if p.preset else [])
+        + (["-threads", f"{p.threads}"] if p.threads > 0 else [])
+        + (
+            ["-profile:v", h264_profile]
+            if h264_profile in ["baseline", "main", "high"]
+            else []
+        )
+        + (["-level", f"{level / 10:.1f}"] if isinstance(level, int) else [])
+    )
+
+
+def slice_video_smart_cut(
+    src_file: str,
+    target_file: str,
+    time_start: float,
+    time_end: float,
+    normalize_audio: bool = True,
+    normalize_audio_lrt: int = 7,
+    loudness: Optional[LoudnessMeasurement] = None,
+    profile: Optional[EncodeProfile] = None,
+) -> None:
+    """
+    Like slice_video, but only re-encodes the partial GOPs at the start and end
+    of the slice and stream-copies all the whole GOPs in between
+    (cuts are still frame accurate).
+
+    The audio track of the slice is always re-encoded (it's cheap)
+    and normalized with the loudnorm filter when normalize_audio is set.
+
+    Falls back to slice_video (full re-encode) when the source video
+    codec is not one we can cut this way
+    or when the slice doesn't contain a whole GOP.
+    """
+    video_codec = find_media_probe(src_file).videoCodec
+    # the manifest (mediainfo) calls h264 AVC. Only ask ffprobe for details
+    # (profile, pix_fmt...) when that's what the source may be
+    video_info = find_video_stream_info(src_file) if video_codec in ["", "AVC"] else {}
+    keyframes = (
+        _find_keyframe_packets(src_file, time_start, time_end)
+        if video_info.get("codec_name") in _SMART_CUT_CODECS
+        and video_info.get("pix_fmt") in _SMART_CUT_PIX_FMTS
+        else []
+    )
+    keyframes = [k for k in keyframes if time_start <= float(k["pts_time"]) <= time_end]
+    if len(keyframes) < 2:
+        slice_video(
+            src_file,
+            target_file,
+            time_start,
+            time_end,
+            normalize_audio=normalize_audio,
+            normalize_audio_lrt=normalize_audio_lrt,
+            loudness=loudness,
+            profile=profile,
+        )
+        return
+    k_first = float(keyframes[0]["pts_time"])
+    k_last = float(keyframes[-1]["pts_time"])
+    # a stream copy keeps every packet that's decoded before the end time,
+    # so with B-frames the copied part must end at the decode time
+    # (not the presentation time) of the last keyframe
+    k_last_dts = float(keyframes[-1]["dts_time"])
+    os.makedirs(os.path.dirname(target_file), exist_ok=True)
+    # named like a staged file, so it's cleaned up if we're killed
+    tmp_dir = tempfile.mkdtemp(
+        prefix=".", suffix=".partial", dir=os.path.dirname(target_file)
+    )
+    try:
+        parts: List[str] = []
+        encode_command = _smart_cut_encode_command(video_info, profile)
+        for part_start, part_end, output_command in [
+            (time_start, k_first, encode_command),
+            (
+                k_first + _SMART_CUT_SEEK_OFFSET,
+                k_last_dts - _SMART_CUT_END_OFFSET,
+                ["-an", "-c:v", "copy"],
+            ),
+            (k_last, time_end, encode_command),
+        ]:
+            if part_end - part_start <= _SMART_CUT_END_OFFSET:
+                continue
+            part_file = os.path.join(tmp_dir, f"part{len(parts)}.mp4")
+            _ffmpeg(
+                inputs={
+                    src_file: (
+                        "-y",
+                        "-ss",
+                        f"{part_start:.6f}",
+                        "-t",
+                        f"{part_end - part_start:.6f}",
+                        "-loglevel",
+                        "quiet",
+                    )
+                },
+                outputs={part_file: tuple(output_command)},
+            )
+            parts.append(part_file)
+        concat_list = os.path.join(tmp_dir, "parts.txt")
+        with open(concat_list, "w") as f:
+            # relative to the list file, which is in the same dir as the parts
+            f.writelines(f"file '{os.path.basename(p)}'\n" for p in parts)
+        _run_ffmpeg(
+            inputs={
+                concat_list: ("-y", "-f", "concat", "-safe", "0", "-loglevel", "quiet"),
+                src_file: (
+                    "-ss",
+                    f"{time_start}",
+                    "-t",
+                    f"{round(time_end - time_start, 6)}",
+                ),
+            },
+            outputs={
+                target_file: tuple(
+                    [
+                        "-map",
+                        "0:v:0",
+                        "-map",
+                        "1:a:0?",
+                        "-c:v",
+                        "copy",
+                        "-c:a",
+                        "aac",
+                        "-ac",
+                        "1",
+                        "-movflags",
+                        "+faststart",
+                    ]
+                    + (
+                        _loudnorm_command(normalize_audio_lrt, loudness)
+                        if normalize_audio
+                        else []
+                    )
+                )
+            },
+        )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@dataclass
+class SessionAudioFormat:
+    """
+    a format for the session audio extracted from each session video
+    (which is only an intermediate: utterance audio is sliced from it)
+    """
+
+    name: str
+    ext: str
+    output_command: List[str]
+    # copies the source audio stream as is when it's in this codec
+    # (as named by mediainfo) and otherwise encodes it with output_command
+    copy_codec: str = ""
+
+
+SESSION_AUDIO_FORMATS: Dict[str, SessionAudioFormat] = {
+    f.name: f
+    for f in [
+        # what we've always used, lossy (and utterance audio gets encoded again)
+        SessionAudioFormat("mp3", "mp3", []),
+        # the aac audio of the session video without re-encoding
+        SessionAudioFormat("m4a", "m4a", ["-vn", "-c:a", "aac"], copy_codec="AAC"),
+        # lossless at the 16kHz mono that transcription needs
+        SessionAudioFormat(
+            "flac", "flac", ["-vn", "-ac", "1", "-ar", "16000", "-c:a", "flac"]
+        ),
+        SessionAudioFormat(
+            "wav", "wav", ["-vn", "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le"]
+        ),
+    ]
+}
+
+DEFAULT_SESSION_AUDIO_FORMAT = SESSION_AUDIO_FORMATS["mp3"]
+
+
+def find_session_audio_format(name_or_ext: str) -> SessionAudioFormat:
+    """
+    returns the session audio format with the given name or file ext
+    (mp3 for any ext that isn't one of the formats)
+    """
+    name_or_ext = (name_or_ext or "").lstrip(".").lower()
+    return SESSION_AUDIO_FORMATS.get(name_or_ext) or next(
+        (f for f in SESSION_AUDIO_FORMATS.values() if f.ext == name_or_ext),
+        DEFAULT_SESSION_AUDIO_FORMAT,
+    )
+
+
+def _session_audio_output_command(
+    input_file: str, audio_format: SessionAudioFormat
+) -> List[str]:
+    if (
+        audio_format.copy_codec
+        and find_media_probe(input_file).audioCodec == audio_format.copy_codec
+    ):
+        return ["-vn", "-c:a", "copy"]
+    return audio_format.output_command
 
 
 def video_to_audio(input_file, output_file=None, output_audio_encoding="mp3"):
     """
-    Converts the .mp4 file to an audio file (.mp3 by default).
+    Converts the .mp4 file to an audio file (.mp3 by default)
+    in the session audio format for the ext of output_file (see SESSION_AUDIO_FORMATS).
     Later, this audio file is split into smaller chunks for each Q-A pair.
     This is done because we want transcriptions for each question and the interview contains
     lots of other content like general talking and discussions.
@@ -215,11 +928,11 @@ def video_to_audio(input_file, output_file=None, output_audio_encoding="mp3"):
         output_file = output_file or re.sub(
             f".{input_ext}$", f".{output_audio_encoding}", input_file
         )
-        output_command = "-loglevel quiet -y"
-        ff = ffmpy.FFmpeg(
-            inputs={input_file: None}, outputs={output_file: output_command}
+        audio_format = find_session_audio_format(os.path.splitext(output_file)[1])
+        output_command = ["-loglevel", "quiet", "-y"] + _session_audio_output_command(
+            input_file, audio_format
         )
-        ff.run()
+        _run_ffmpeg(inputs={input_file: None}, outputs={output_file: output_command})
     else:
         print("ERROR: Can't covert audio, {} doesn't exist".format(input_file))
         error_code = 1
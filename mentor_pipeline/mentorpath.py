@@ -21,9 +21,37 @@ from mentor_pipeline.utterance_asset_type import (
     UTTERANCE_AUDIO,
     UTTERANCE_CAPTIONS,
     UTTERANCE_VIDEO,
+    UTTERANCE_VIDEO_HLS,
     UTTERANCE_VIDEO_MOBILE,
     UTTERANCE_VIDEO_WEB,
 )
+from mentor_pipeline.encode_profiles import (
+    EncodeProfileRegistry,
+    encode_profiles_by_asset_from_yaml,
+    encode_profiles_by_asset_to_yaml,
+    load_encode_profile_registry,
+)
+from mentor_pipeline.loudness import (
+    SessionLoudnessMap,
+    session_loudness_from_yaml,
+    session_loudness_to_yaml,
+)
+from mentor_pipeline.noise import (
+    NoiseReductionLedger,
+    noise_reduction_ledger_from_yaml,
+    noise_reduction_ledger_to_yaml,
+)
+from mentor_pipeline.noise_registry import NoiseRegistry
+from mentor_pipeline.provenance import (
+    ProvenanceManifest,
+    provenance_manifest_from_yaml,
+    provenance_manifest_to_yaml,
+)
+from mentor_pipeline.probe import (
+    ProbeManifest,
+    probe_manifest_from_yaml,
+    probe_manifest_to_yaml,
+)
 from mentor_pipeline.paraphrases import (
     ParaphrasesByQuestion,
     load_paraphrases_by_question_from_csv as _load_paraphrases_by_question_from_csv,
@@ -43,6 +71,18 @@ from mentor_pipeline.training_data import (
     write_questions_paraphrases_answers as _write_training_questions_paraphrases_answers,
     write_utterance_data as _write_training_utterance_data,
 )
+from mentor_pipeline.transcript_cache import (
+    TranscriptCache,
+    transcript_cache_from_yaml,
+    transcript_cache_to_yaml,
+)
+from mentor_pipeline.transcript_journal import (
+    apply_transcript_journal,
+    TranscriptJournalEntry,
+    transcript_journal_append,
+    transcript_journal_read,
+)
+from mentor_pipeline.utils import remove_stale_staged_files
 from mentor_pipeline.utterances import (
     Utterance,
     UtteranceMap,
@@ -99,6 +139,12 @@ class MentorPath:
             )
         return result
 
+    def _is_in_mentor_asset_root(
+        self, mentor_asset_root: MentorAssetRoot, p: str
+    ) -> bool:
+        root = os.path.abspath(self.get_mentor_asset(mentor_asset_root))
+        return os.path.commonpath([root, os.path.abspath(p)]) == root
+
     def _mentor_asset_isfile(self, mentor_asset_root: MentorAssetRoot, p: str) -> bool:
         return os.path.isfile(self.get_mentor_asset(mentor_asset_root, p))
 
@@ -111,9 +157,27 @@ class MentorPath:
     def get_data_path(self, p: str = None) -> str:
         return self._path_from(os.path.join(self.get_mentor_data(), "data"), p)
 
+    def get_denoised_path(self, p: str = None) -> str:
+        return self._path_from(os.path.join(self.get_build_path(), "denoised"), p)
+
     def get_mentor_id(self) -> str:
         return self.mentor_id
 
+    def get_encode_profiles_by_asset_data_path(self) -> str:
+        return os.path.join(
+            self.get_mentor_data(), ".mentor", "encode_profiles_by_asset.yaml"
+        )
+
+    def get_encode_profiles_config_paths(self) -> List[str]:
+        """
+        returns the paths of the encode profile config files,
+        global (shared by all mentors) first and then mentor-level
+        """
+        return [
+            self.get_root_path_data("encode_profiles.yaml"),
+            self.get_mentor_data("encode_profiles.yaml"),
+        ]
+
     def get_mentor_asset(
         self, mentor_asset_root: MentorAssetRoot, p: str = None
     ) -> str:
@@ -133,12 +197,26 @@ class MentorPath:
             os.path.join(self.root_path_video_mentors, self.get_mentor_id()), p
         )
 
+    def get_noise_reduction_ledger_data_path(self) -> str:
+        return os.path.join(
+            self.get_mentor_data(), ".mentor", "noise_reduction_ledger.yaml"
+        )
+
     def get_noise_path(self, p: str = None) -> str:
         return self._path_from(os.path.join(self.get_build_path(), "noise"), p)
 
+    def get_media_probes_data_path(self) -> str:
+        return os.path.join(self.get_mentor_data(), ".mentor", "media_probes.yaml")
+
     def get_paraphrases_by_question(self) -> str:
         return self.get_root_path_data("paraphrases_by_question.csv")
 
+    def get_pcm_cache_path(self, p: str = None) -> str:
+        return self._path_from(os.path.join(self.get_build_path(), "pcm"), p)
+
+    def get_provenance_data_path(self) -> str:
+        return os.path.join(self.get_mentor_data(), ".mentor", "provenance.yaml")
+
     def get_recordings_path(self, p: str = None) -> str:
         return self._path_from(os.path.join(self.get_build_path(), "recordings"), p)
 
@@ -151,6 +229,9 @@ class MentorPath:
     def get_root_path_video_mentors(self, p: str = None) -> str:
         return self._path_from(os.path.dirname(self.root_path_video_mentors), p)
 
+    def get_session_loudness_data_path(self) -> str:
+        return os.path.join(self.get_mentor_data(), ".mentor", "session_loudness.yaml")
+
     def get_topics_by_question(self, file_name: str = None) -> str:
         return self.get_root_path_data(file_name or "topics_by_question.csv")
 
@@ -166,6 +247,14 @@ class MentorPath:
     def get_training_utterance_data(self) -> str:
         return self.get_data_path("utterance_data.csv")
 
+    def get_transcript_cache_data_path(self) -> str:
+        return os.path.join(self.get_mentor_data(), ".mentor", "transcript_cache.yaml")
+
+    def get_transcript_journal_data_path(self) -> str:
+        return os.path.join(
+            self.get_mentor_data(), ".mentor", "transcript_journal.jsonl"
+        )
+
     def get_utterances_data_path(self) -> str:
         return os.path.join(self.get_mentor_data(), ".mentor", "utterances.yaml")
 
@@ -265,6 +354,22 @@ class MentorPath:
             return_non_existing_paths=return_non_existing_paths,
         )
 
+    def find_session_video_denoised(
+        self, utterance: Utterance, return_non_existing_paths=False
+    ) -> str:
+        """
+        the session video with its audio noise reduced
+        (see process.sessions_to_audio), which mirrors the session video
+        (by its path in the mentor's data) under build/denoised
+        """
+        session_video = self.find_session_video(utterance)
+        if not session_video:
+            return ""
+        p = self.get_denoised_path(
+            os.path.relpath(session_video, self.get_mentor_data())
+        )
+        return p if return_non_existing_paths or os.path.isfile(p) else ""
+
     def find_timestamps(self) -> List[SessionPartFile]:
         return self._find_session_part_files(
             os.path.join(self.get_recordings_path(), "**/*.csv")
@@ -297,6 +402,15 @@ class MentorPath:
             return_non_existing_paths=return_non_existing_paths,
         )
 
+    def find_utterance_video_hls(
+        self, utterance: Utterance, return_non_existing_paths=False
+    ) -> str:
+        return self.find_asset(
+            utterance,
+            UTTERANCE_VIDEO_HLS,
+            return_non_existing_paths=return_non_existing_paths,
+        )
+
     def find_utterance_video_mobile(
         self, utterance: Utterance, return_non_existing_paths=False
     ) -> str:
@@ -315,6 +429,47 @@ class MentorPath:
             return_non_existing_paths=return_non_existing_paths,
         )
 
+    def load_encode_profiles(self) -> EncodeProfileRegistry:
+        return load_encode_profile_registry(self.get_encode_profiles_config_paths())
+
+    def load_encode_profiles_by_asset(self) -> Dict[str, str]:
+        data_path = self.get_encode_profiles_by_asset_data_path()
+        return (
+            encode_profiles_by_asset_from_yaml(data_path)
+            if os.path.isfile(data_path)
+            else {}
+        )
+
+    def load_media_probes(self) -> ProbeManifest:
+        """
+        loads the media probe manifest, which keys each media file
+        relative to the mentor's videos (if it's one of them) or else data
+        """
+        data_path = self.get_media_probes_data_path()
+        result = (
+            probe_manifest_from_yaml(data_path)
+            if os.path.isfile(data_path)
+            else ProbeManifest()
+        )
+        result.key_for_path = lambda f: self.to_relative_path(
+            f,
+            MentorAssetRoot.VIDEOS
+            if self._is_in_mentor_asset_root(MentorAssetRoot.VIDEOS, f)
+            else MentorAssetRoot.DATA,
+        )
+        return result
+
+    def load_noise_reduction_ledger(self) -> NoiseReductionLedger:
+        data_path = self.get_noise_reduction_ledger_data_path()
+        return (
+            noise_reduction_ledger_from_yaml(data_path)
+            if os.path.isfile(data_path)
+            else NoiseReductionLedger()
+        )
+
+    def load_noise_registry(self) -> NoiseRegistry:
+        return NoiseRegistry(self.find_noise_samples())
+
     def load_paraphrases_by_question_from_csv(
         self, allow_file_not_exists=False
     ) -> ParaphrasesByQuestion:
@@ -345,11 +500,54 @@ class MentorPath:
     def load_training_utterance_data(self) -> pd.DataFrame:
         return _load_training_utterance_data(self.get_training_utterance_data())
 
+    def load_provenance(self) -> ProvenanceManifest:
+        data_path = self.get_provenance_data_path()
+        return (
+            provenance_manifest_from_yaml(data_path)
+            if os.path.isfile(data_path)
+            else ProvenanceManifest()
+        )
+
+    def load_session_loudness(self) -> SessionLoudnessMap:
+        data_path = self.get_session_loudness_data_path()
+        return (
+            session_loudness_from_yaml(data_path)
+            if os.path.isfile(data_path)
+            else SessionLoudnessMap()
+        )
+
+    def load_transcript_cache(self) -> TranscriptCache:
+        data_path = self.get_transcript_cache_data_path()
+        return (
+            transcript_cache_from_yaml(data_path)
+            if os.path.isfile(data_path)
+            else TranscriptCache()
+        )
+
+    def load_transcript_journal(self) -> List[TranscriptJournalEntry]:
+        return transcript_journal_read(self.get_transcript_journal_data_path())
+
     def load_utterances(self, create_new=False) -> Optional[UtteranceMap]:
+        """
+        the utterances, with any transcripts from the transcript journal
+        that aren't compacted into utterances.yaml yet
+        (i.e. that a transcription interrupted by a crash left)
+        """
         data_path = self.get_utterances_data_path()
         if not os.path.isfile(data_path):
             return UtteranceMap() if create_new else None
-        return utterances_from_yaml(data_path)
+        return apply_transcript_journal(
+            utterances_from_yaml(data_path), self.load_transcript_journal()
+        )
+
+    def remove_stale_staged_files(self) -> List[str]:
+        """
+        removes the incomplete outputs (see utils.staged_files)
+        that an interrupted run left in the mentor's data and videos
+        """
+        return remove_stale_staged_files(
+            self.get_mentor_data()
+        ) + remove_stale_staged_files(self.get_mentor_video())
 
     def set_session_audio_path(
         self, utterance: Utterance, session_audio_path: str
@@ -389,6 +587,25 @@ class MentorPath:
     def to_relative_path(self, p: str, mentor_asset_root: MentorAssetRoot) -> str:
         return os.path.relpath(p, self.get_mentor_asset(mentor_asset_root))
 
+    def write_encode_profiles_by_asset(self, d: Dict[str, str]) -> None:
+        encode_profiles_by_asset_to_yaml(
+            d, self.get_encode_profiles_by_asset_data_path()
+        )
+
+    def write_media_probes(self, pm: ProbeManifest) -> None:
+        probe_manifest_to_yaml(pm, self.get_media_probes_data_path())
+
+    def write_noise_reduction_ledger(self, ledger: NoiseReductionLedger) -> None:
+        noise_reduction_ledger_to_yaml(
+            ledger, self.get_noise_reduction_ledger_data_path()
+        )
+
+    def write_provenance(self, pm: ProvenanceManifest) -> None:
+        provenance_manifest_to_yaml(pm, self.get_provenance_data_path())
+
+    def write_session_loudness(self, slm: SessionLoudnessMap) -> None:
+        session_loudness_to_yaml(slm, self.get_session_loudness_data_path())
+
     def write_topics_by_question(self, d: TopicsByQuestion, file_name=None) -> None:
         _write_topics_by_question_to_csv(
             d, self.get_topics_by_question(file_name=file_name)
@@ -408,5 +625,21 @@ class MentorPath:
     def write_training_utterance_data(self, d: pd.DataFrame) -> None:
         _write_training_utterance_data(d, self.get_training_utterance_data())
 
-    def write_utterances(self, utterances: UtteranceMap) -> None:
+    def write_transcript_cache(self, tc: TranscriptCache) -> None:
+        transcript_cache_to_yaml(tc, self.get_transcript_cache_data_path())
+
+    def append_transcript_journal(self, entries: List[TranscriptJournalEntry]) -> None:
+        transcript_journal_append(entries, self.get_transcript_journal_data_path())
+
+    def write_utterances(
+        self, utterances: UtteranceMap, compact_transcript_journal: bool = False
+    ) -> None:
+        """
+        writes the utterances. With compact_transcript_journal,
+        also removes the transcript journal, which the utterances must include
+        (i.e. compacts the journal into utterances.yaml)
+        """
         utterances_to_yaml(utterances, self.get_utterances_data_path())
+        journal_path = self.get_transcript_journal_data_path()
+        if compact_transcript_journal and os.path.isfile(journal_path):
+            os.remove(journal_path)
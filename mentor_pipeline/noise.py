@@ -4,53 +4,705 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
+from dataclasses import asdict, dataclass, field
+from functools import partial
 import glob
+import hashlib
+import logging
 import os
+import shlex
+import subprocess
 import ffmpy
-import noisereduce as nr
 import numpy as np
-import shutil
 import soundfile as sf
-from typing import Iterable, Union
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+)
 
+from mentor_pipeline.jobs import run_jobs
+from mentor_pipeline.pcm import can_write, decode_pcm, decode_pcm_blocks, find_pcm
+from mentor_pipeline.utils import staged_files, yaml_load, yaml_write
 
-def _reduce_noise(noise_sample: np.ndarray, f: Union[str, os.PathLike]):
+NOISE_SAMPLE_RATE = 16000
+
+
+@dataclass
+class NoiseProfile:
+    """
+    The spectral statistics of a noise sample that spectral gating needs:
+    the threshold (in dB) for each frequency bin of the STFT,
+    below which a bin of the signal is taken to be noise.
+
+    Along with the STFT params it was computed with
+    and the hash of the noise sample it was computed from.
+    """
+
+    noiseThresh: np.ndarray
+    rate: int = NOISE_SAMPLE_RATE
+    nFft: int = 2048
+    winLength: int = 2048
+    hopLength: int = 512
+    nStdThresh: float = 1.5
+    sourceHash: str = ""
+
+    def is_valid_for(self, source_hash: str, **params) -> bool:
+        return self.sourceHash == source_hash and all(
+            getattr(self, k) == v for k, v in params.items()
+        )
+
+
+def _hann(n: int) -> np.ndarray:
+    # periodic (as for an fft), like scipy.signal.get_window("hann", n)
+    return 0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n) / n)
+
+
+def _window(n_fft: int, win_length: int) -> np.ndarray:
+    w = _hann(win_length)
+    lpad = (n_fft - win_length) // 2
+    return np.pad(w, (lpad, n_fft - win_length - lpad))
+
+
+def _stft(y: np.ndarray, n_fft: int, hop_length: int, win_length: int) -> np.ndarray:
+    """
+    centered STFT (frames padded by reflection), as (bins, frames)
+    """
+    y = np.pad(np.asarray(y, dtype=np.float64), n_fft // 2, mode="reflect")
+    n_frames = 1 + (len(y) - n_fft) // hop_length
+    frames = np.lib.stride_tricks.as_strided(
+        y, shape=(n_frames, n_fft), strides=(y.strides[0] * hop_length, y.strides[0])
+    )
+    return np.fft.rfft(frames * _window(n_fft, win_length), axis=1).T
+
+
+def _istft(stft: np.ndarray, hop_length: int, win_length: int) -> np.ndarray:
+    """
+    inverse of _stft by overlap-add (normalized by the summed squared window)
+    """
+    n_fft = 2 * (stft.shape[0] - 1)
+    n_frames = stft.shape[1]
+    window = _window(n_fft, win_length)
+    frames = np.fft.irfft(stft.T, n=n_fft, axis=1) * window
+    n = n_fft + hop_length * (n_frames - 1)
+    y = np.zeros(n)
+    window_sum = np.zeros(n)
+    for t in range(n_frames):
+        y[t * hop_length : t * hop_length + n_fft] += frames[t]
+        window_sum[t * hop_length : t * hop_length + n_fft] += window ** 2
+    nonzero = window_sum > np.finfo(window_sum.dtype).tiny
+    y[nonzero] /= window_sum[nonzero]
+    return y[n_fft // 2 : n - n_fft // 2]
+
+
+def _amp_to_db(a: np.ndarray, top_db: float = 80.0) -> np.ndarray:
+    db = 20.0 * np.log10(np.maximum(1e-20, a))
+    return np.maximum(db, db.max() - top_db)
+
+
+def _db_to_amp(db: np.ndarray) -> np.ndarray:
+    # 10 ** (db / 20), as exp (which is much faster than power)
+    return np.exp(db * (np.log(10.0) / 20.0))
+
+
+def _ramp(n_grad: int) -> np.ndarray:
+    return np.concatenate(
+        [np.linspace(0, 1, n_grad + 1, endpoint=False), np.linspace(1, 0, n_grad + 2)]
+    )[1:-1]
+
+
+def _smooth(mask: np.ndarray, n_grad_freq: int, n_grad_time: int) -> np.ndarray:
+    """
+    convolves the mask (mode same) with the normalized outer product
+    of a triangular ramp over frequency and one over time
+    """
+    for axis, n_grad in [(0, n_grad_freq), (1, n_grad_time)]:
+        k = _ramp(n_grad)
+        k = k / k.sum()
+        pad = [(0, 0)] * mask.ndim
+        pad[axis] = (len(k) // 2, len(k) // 2)
+        padded = np.pad(mask, pad)
+        result = np.zeros(mask.shape)
+        for i, w in enumerate(k):
+            # views of the padded mask (a fancy index like np.take would copy)
+            shifted = [slice(None)] * mask.ndim
+            shifted[axis] = slice(i, i + mask.shape[axis])
+            result += w * padded[tuple(shifted)]
+        mask = result
+    return mask
+
+
+def compute_noise_profile(
+    noise: np.ndarray,
+    rate: int = NOISE_SAMPLE_RATE,
+    n_fft: int = 2048,
+    win_length: int = 2048,
+    hop_length: int = 512,
+    n_std_thresh: float = 1.5,
+    source_hash: str = "",
+) -> NoiseProfile:
+    noise_stft_db = _amp_to_db(np.abs(_stft(noise, n_fft, hop_length, win_length)))
+    return NoiseProfile(
+        noiseThresh=np.mean(noise_stft_db, axis=1)
+        + np.std(noise_stft_db, axis=1) * n_std_thresh,
+        rate=rate,
+        nFft=n_fft,
+        winLength=win_length,
+        hopLength=hop_length,
+        nStdThresh=n_std_thresh,
+        sourceHash=source_hash,
+    )
+
+
+def _gated_stft(
+    sig_stft: np.ndarray,
+    db_floor: float,
+    profile: NoiseProfile,
+    prop_decrease: float,
+    n_grad_freq: int,
+    n_grad_time: int,
+    sig_abs: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    the STFT with the noise gated out (see reduce_noise_with_profile)
+    given the dB floor (top_db below the loudest bin of the whole signal)
+    (and, if the caller has it, the magnitude of the STFT)
+    """
+    sig_abs = np.abs(sig_stft) if sig_abs is None else sig_abs
+    sig_stft_db = np.maximum(20.0 * np.log10(np.maximum(1e-20, sig_abs)), db_floor)
+    sig_mask = (sig_stft_db < profile.noiseThresh[:, np.newaxis]).astype(np.float64)
+    # smoothed twice, as noisereduce (1.1) does
+    for _ in range(2):
+        sig_mask = _smooth(sig_mask, n_grad_freq, n_grad_time)
+    sig_mask *= prop_decrease
+    return sig_stft * (1 - sig_mask)
+
+
+def _db_floor(max_abs: float) -> float:
+    return 20.0 * np.log10(np.maximum(1e-20, max_abs)) - 80.0
+
+
+def reduce_noise_with_profile(
+    audio: np.ndarray,
+    profile: NoiseProfile,
+    prop_decrease: float = 1.0,
+    n_grad_freq: int = 2,
+    n_grad_time: int = 4,
+) -> np.ndarray:
+    """
+    Spectral gating as done by noisereduce (1.1) reduce_noise,
+    but with the noise statistics given as a precomputed profile:
+    bins of the signal's STFT below the profile's threshold are
+    (with a smoothed mask) scaled down by prop_decrease.
+    """
+    nsamp = len(audio)
+    audio = np.pad(audio, (0, profile.hopLength))
+    sig_stft = _stft(audio, profile.nFft, profile.hopLength, profile.winLength)
+    sig_abs = np.abs(sig_stft)
+    sig_stft_amp = _gated_stft(
+        sig_stft,
+        _db_floor(sig_abs.max()),
+        profile,
+        prop_decrease,
+        n_grad_freq,
+        n_grad_time,
+        sig_abs=sig_abs,
+    )
+    recovered = _istft(sig_stft_amp, profile.hopLength, profile.winLength)
+    return np.pad(recovered[:nsamp], (0, max(0, nsamp - len(recovered))))
+
+
+class _StreamedSignal:
+    """
+    The signal as _stft frames it in reduce_noise_with_profile
+    (padded with hop_length zeros, then reflected by n_fft // 2 at both ends)
+    for a signal of n samples that's read in blocks.
+    Holds only the samples that frames still to come need
+    """
+
+    def __init__(
+        self, blocks: Iterable[np.ndarray], n: int, n_fft: int, hop_length: int
+    ):
+        self._blocks = iter(blocks)
+        self.n = n
+        self.pad = n_fft // 2
+        self.m = n + hop_length
+        self.length = self.m + 2 * self.pad
+        self._buf = np.zeros(0)
+        self._buf_start = 0
+        self._read_to(self.pad + 1)
+        self._head = self._buf[: self.pad + 1].copy()
+
+    def _read_to(self, k_end: int) -> None:
+        k_end = min(k_end, self.n)
+        while self._buf_start + len(self._buf) < k_end:
+            self._buf = np.concatenate(
+                [self._buf, np.asarray(next(self._blocks), dtype=np.float64)]
+            )
+
+    def _signal_index(self, j: np.ndarray) -> np.ndarray:
+        k = np.abs(j - self.pad)
+        return np.where(k > self.m - 1, 2 * (self.m - 1) - k, k)
+
+    def samples(self, j_start: int, j_end: int) -> np.ndarray:
+        k = self._signal_index(np.arange(j_start, j_end))
+        in_signal = k < self.n
+        self._read_to(int(k[in_signal].max()) + 1 if in_signal.any() else 0)
+        result = np.zeros(len(k))
+        k = k[in_signal]
+        result[in_signal] = np.where(
+            k < len(self._head),
+            self._head[np.minimum(k, len(self._head) - 1)],
+            self._buf[np.clip(k - self._buf_start, 0, max(0, len(self._buf) - 1))],
+        )
+        return result
+
+    def release(self, j_start: int) -> None:
+        """
+        drops the samples that no padded index from j_start on needs
+        """
+        if j_start < self.pad:
+            return
+        k_min = min(j_start - self.pad, self.m - 1 - self.pad)
+        drop = min(max(0, k_min - self._buf_start), len(self._buf))
+        self._buf = self._buf[drop:]
+        self._buf_start += drop
+
+
+def _stft_frames(
+    signal: _StreamedSignal,
+    t_start: int,
+    t_end: int,
+    n_fft: int,
+    hop_length: int,
+    win_length: int,
+) -> np.ndarray:
+    y = signal.samples(t_start * hop_length, (t_end - 1) * hop_length + n_fft)
+    frames = np.lib.stride_tricks.as_strided(
+        y,
+        shape=(t_end - t_start, n_fft),
+        strides=(y.strides[0] * hop_length, y.strides[0]),
+    )
+    return np.fft.rfft(frames * _window(n_fft, win_length), axis=1).T
+
+
+def reduce_noise_with_profile_streaming(
+    read_blocks: Callable[[], Iterable[np.ndarray]],
+    profile: NoiseProfile,
+    prop_decrease: float = 1.0,
+    n_grad_freq: int = 2,
+    n_grad_time: int = 4,
+    frames_per_chunk: int = 256,
+) -> Iterator[np.ndarray]:
+    """
+    The same as reduce_noise_with_profile (up to float rounding)
+    for a signal of any length that's read in blocks,
+    with memory use that depends only on frames_per_chunk.
+
+    read_blocks() returns the blocks of the signal and is called twice:
+    a first pass finds the loudest bin of the whole signal
+    (which gating depends on), then the second gates chunks of STFT frames
+    (with enough frames around each one for smoothing the mask twice)
+    and yields the output, by overlap-add, as each part of it is complete
+    """
+    n_fft, hop, win = profile.nFft, profile.hopLength, profile.winLength
+    n = 0
+    head = []
+    for block in read_blocks():
+        n += len(block)
+        if n <= n_fft:
+            head.append(np.asarray(block, dtype=np.float64))
+    if n <= n_fft:
+        # too short for streaming to matter (or for the padding to work as streamed)
+        audio = np.concatenate(head) if head else np.zeros(0)
+        yield reduce_noise_with_profile(
+            audio, profile, prop_decrease, n_grad_freq, n_grad_time
+        )
+        return
+    n_frames = 1 + (n + hop) // hop
+    signal = _StreamedSignal(read_blocks(), n, n_fft, hop)
+    max_abs = 0.0
+    for t in range(0, n_frames, frames_per_chunk):
+        t_end = min(t + frames_per_chunk, n_frames)
+        sig_abs = np.abs(_stft_frames(signal, t, t_end, n_fft, hop, win))
+        max_abs = max(max_abs, sig_abs.max())
+        signal.release(t_end * hop)
+    db_floor = _db_floor(max_abs)
+    # the frames either side of a chunk the (twice) smoothed mask depends on
+    halo = 2 * n_grad_time
+    signal = _StreamedSignal(read_blocks(), n, n_fft, hop)
+    window = _window(n_fft, win)
+    pad = n_fft // 2
+    # the overlap-add of all frames so far from position out_start on
+    out_start = 0
+    out = np.zeros(0)
+    window_sum = np.zeros(0)
+    for t in range(0, n_frames, frames_per_chunk):
+        t_end = min(t + frames_per_chunk, n_frames)
+        t_lo, t_hi = max(0, t - halo), min(n_frames, t_end + halo)
+        sig_stft_amp = _gated_stft(
+            _stft_frames(signal, t_lo, t_hi, n_fft, hop, win),
+            db_floor,
+            profile,
+            prop_decrease,
+            n_grad_freq,
+            n_grad_time,
+        )[:, t - t_lo : t_end - t_lo]
+        signal.release(max(0, t_end - halo) * hop)
+        frames = np.fft.irfft(sig_stft_amp.T, n=n_fft, axis=1) * window
+        end = (t_end - 1) * hop + n_fft
+        out = np.pad(out, (0, end - out_start - len(out)))
+        window_sum = np.pad(window_sum, (0, end - out_start - len(window_sum)))
+        for i, frame in enumerate(frames):
+            p = (t + i) * hop - out_start
+            out[p : p + n_fft] += frame
+            window_sum[p : p + n_fft] += window ** 2
+        # no later frame adds to positions before the start of the next one
+        complete = (t_end * hop if t_end < n_frames else end) - out_start
+        y = out[:complete]
+        nonzero = window_sum[:complete] > np.finfo(window_sum.dtype).tiny
+        y[nonzero] /= window_sum[:complete][nonzero]
+        # the output is positions pad to pad + n (see _istft and reduce_noise_with_profile)
+        result = y[max(0, pad - out_start) : max(0, pad + n - out_start)]
+        if len(result):
+            yield result
+        out, window_sum = out[complete:], window_sum[complete:]
+        out_start += complete
+
+
+def file_hash(p: str) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def noise_profile_path(noise_sample: str) -> str:
+    """
+    where the profile of a noise sample is saved,
+    e.g. build/noise/s001p001.wav => build/noise/profiles/s001p001.npz
+    """
+    d, name = os.path.split(os.path.abspath(noise_sample))
+    return os.path.join(d, "profiles", f"{os.path.splitext(name)[0]}.npz")
+
+
+def load_noise_profile(profile_file: str) -> NoiseProfile:
+    with np.load(profile_file) as d:
+        return NoiseProfile(
+            noiseThresh=d["noiseThresh"],
+            rate=int(d["rate"]),
+            nFft=int(d["nFft"]),
+            winLength=int(d["winLength"]),
+            hopLength=int(d["hopLength"]),
+            nStdThresh=float(d["nStdThresh"]),
+            sourceHash=str(d["sourceHash"]),
+        )
+
+
+def write_noise_profile(profile: NoiseProfile, profile_file: str) -> None:
+    os.makedirs(os.path.dirname(profile_file), exist_ok=True)
+    with staged_files([profile_file]) as [staged]:
+        with open(staged, "wb") as f:
+            np.savez(
+                f,
+                noiseThresh=profile.noiseThresh,
+                rate=profile.rate,
+                nFft=profile.nFft,
+                winLength=profile.winLength,
+                hopLength=profile.hopLength,
+                nStdThresh=profile.nStdThresh,
+                sourceHash=profile.sourceHash,
+            )
+
+
+def update_noise_profile(noise_sample: str) -> NoiseProfile:
+    """
+    returns the saved profile of a noise sample (see noise_profile_path)
+    when it was computed from the sample as it is now
+    and otherwise computes the profile and saves it
+    """
+    source_hash = file_hash(noise_sample)
+    profile_file = noise_profile_path(noise_sample)
+    if os.path.isfile(profile_file):
+        try:
+            profile = load_noise_profile(profile_file)
+            if profile.is_valid_for(source_hash, rate=NOISE_SAMPLE_RATE):
+                return profile
+        except (OSError, KeyError, ValueError):
+            pass  # unreadable, so compute it again
+    # the same scale as the audio _reduce_noise gates
+    noise = find_pcm(noise_sample, rate=NOISE_SAMPLE_RATE).samples / 32768.0
+    profile = compute_noise_profile(
+        noise, rate=NOISE_SAMPLE_RATE, source_hash=source_hash
+    )
+    write_noise_profile(profile, profile_file)
+    return profile
+
+
+@dataclass
+class NoiseReduction:
+    """
+    a file whose noise was reduced: the noise sample used,
+    the hash of the file before, of the sample the profile was computed from
+    and of the file after
+    """
+
+    noiseSample: str
+    inputHash: str
+    profileHash: str
+    outputHash: str
+
+
+@dataclass
+class NoiseReductionLedger:
+    """
+    The noise reductions done, by file (the key is up to the owner of the ledger),
+    so noise is never reduced again in a file that's already reduced
+    (which would degrade its audio a little more each time)
+    """
+
+    reductionsByFile: Dict[str, NoiseReduction] = field(default_factory=lambda: {})
+
+    def __post_init__(self):
+        self.reductionsByFile = {
+            k: v if isinstance(v, NoiseReduction) else NoiseReduction(**v)
+            for k, v in (self.reductionsByFile or {}).items()
+        }
+
+    def find(self, file_key: str) -> Optional[NoiseReduction]:
+        return self.reductionsByFile.get(file_key)
+
+    def needs_reduction(
+        self, file_key: str, file_hash: str, profile_hash: str, noise_sample: str = ""
+    ) -> bool:
+        """
+        false if the file is as its last noise reduction (with this profile) left it,
+        or if it was reduced with another profile and hasn't changed since
+        (then there's no source left to reduce with the new one,
+        so it's logged to rebuild the file)
+        """
+        r = self.find(file_key)
+        if not r or r.outputHash != file_hash:
+            return True
+        if r.profileHash != profile_hash:
+            logging.warning(
+                f"{file_key} already has its noise reduced with {r.noiseSample}"
+                + f" (as it was then), so it's left as is until it's rebuilt to reduce with {noise_sample}"
+            )
+        return False
+
+    def record(
+        self,
+        file_key: str,
+        noise_sample: str,
+        input_hash: str,
+        profile_hash: str,
+        output_hash: str,
+    ) -> None:
+        self.reductionsByFile[file_key] = NoiseReduction(
+            noiseSample=noise_sample,
+            inputHash=input_hash,
+            profileHash=profile_hash,
+            outputHash=output_hash,
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def noise_reduction_ledger_from_yaml(yml: str) -> NoiseReductionLedger:
+    return NoiseReductionLedger(**(yaml_load(yml) or {}))
+
+
+def noise_reduction_ledger_to_yaml(ledger: NoiseReductionLedger, tgt_path: str) -> None:
+    yaml_write(ledger.to_dict(), tgt_path)
+
+
+def _to_pcm_bytes(audio: np.ndarray) -> bytes:
+    return np.clip(np.round(audio * 32768.0), -32768, 32767).astype("<i2").tobytes()
+
+
+def _ffmpeg_write_reduced(
+    noise_profile: NoiseProfile, f: str, target: str, staged_f: str
+) -> ffmpy.FFmpeg:
+    """
+    the ffmpeg run that writes staged_f (for target) from the reduced audio
+    (s16le on stdin), for an mp4, remuxed with the original video of f
+    """
+    pcm_input = {"pipe:0": f"-f s16le -ar {noise_profile.rate} -ac 1"}
+    remux_video = os.path.splitext(target)[1] == ".mp4"
+    return ffmpy.FFmpeg(
+        global_options="-loglevel quiet",
+        inputs={f: None, **pcm_input} if remux_video else pcm_input,
+        outputs={staged_f: "-c:v copy -map 0:v:0 -map 1:a:0" if remux_video else None},
+    )
+
+
+def _write_reduced_blocks(
+    noise_profile: NoiseProfile,
+    f: str,
+    target: str,
+    staged_f: str,
+    blocks: Iterable[np.ndarray],
+) -> None:
+    if can_write(target) and os.path.splitext(target)[1] != ".mp4":
+        with sf.SoundFile(
+            staged_f,
+            "w",
+            samplerate=noise_profile.rate,
+            channels=1,
+            format=os.path.splitext(target)[1].lstrip(".").upper(),
+        ) as out:
+            for block in blocks:
+                out.write(np.frombuffer(_to_pcm_bytes(block), dtype="<i2"))
+        return
+    ff = _ffmpeg_write_reduced(noise_profile, f, target, staged_f)
+    with subprocess.Popen(shlex.split(ff.cmd), stdin=subprocess.PIPE) as proc:
+        try:
+            for block in blocks:
+                proc.stdin.write(_to_pcm_bytes(block))  # type: ignore
+            proc.stdin.close()  # type: ignore
+        except BaseException:
+            proc.kill()
+            raise
+    if proc.returncode != 0:
+        raise ffmpy.FFRuntimeError(ff.cmd, proc.returncode, b"", b"")
+
+
+def _reduce_noise(
+    noise_profile: NoiseProfile,
+    f: Union[str, os.PathLike],
+    stream: bool = False,
+    target: str = "",
+):
+    """
+    Replaces the audio of f with its noise reduced version
+    (or, given a target, writes f with its audio noise reduced to target).
+
+    The audio is decoded (to mono PCM at the profile's rate) straight into memory
+    and the reduced audio is piped into the ffmpeg that writes the result
+    (for an mp4, remuxed with the original video), so nothing is written
+    but the result, and that only replaces f once complete (see utils.staged_files).
+
+    With stream, the audio is decoded (twice) and reduced in blocks
+    (see reduce_noise_with_profile_streaming) and each block of the result
+    is written as it's done (with soundfile, for the types it can write),
+    so memory use doesn't grow with the length of f
+    """
     f = os.path.abspath(f)
-    fpath, fext = os.path.splitext(f)
-    save_file = f"{fpath}-prenoisefix{fext}"
-    os.rename(f, save_file)
-    audio_output_file = f"{fpath}.wav"
-    audio_input_file = f"{fpath}-prenoisefix.wav"
-    if fext != ".wav":
-        ffmpy.FFmpeg(
-            inputs={save_file: None},
-            outputs={audio_input_file: "-acodec pcm_s16le -ac 1 -ar 16000"},
-        ).run()
-    data, rate = sf.read(audio_input_file)
-    reduced_noise = nr.reduce_noise(
-        audio_clip=data, noise_clip=noise_sample, prop_decrease=0.85, verbose=False
-    )
-    sf.write(audio_output_file, reduced_noise, rate)
-    if fext == ".mp4":
-        ffmpy.FFmpeg(
-            inputs={save_file: None, audio_output_file: None},
-            outputs={f: "-c:v copy -map 0:v:0 -map 1:a:0"},
-        ).run()
+    target = os.path.abspath(target) if target else f
+    if stream:
+        with staged_files([target]) as [staged_f]:
+            _write_reduced_blocks(
+                noise_profile,
+                f,
+                target,
+                staged_f,
+                reduce_noise_with_profile_streaming(
+                    lambda: (
+                        b.astype(np.float64) / 32768.0
+                        for b in decode_pcm_blocks(f, rate=noise_profile.rate)
+                    ),
+                    noise_profile,
+                    prop_decrease=0.85,
+                ),
+            )
+        return
+    audio = decode_pcm(f, rate=noise_profile.rate).samples.astype(np.float64) / 32768.0
+    reduced_noise = reduce_noise_with_profile(audio, noise_profile, prop_decrease=0.85)
+    with staged_files([target]) as [staged_f]:
+        _ffmpeg_write_reduced(noise_profile, f, target, staged_f).run(
+            input_data=_to_pcm_bytes(reduced_noise)
+        )
+
+
+def reduce_noise_to(
+    noise_sample: str, src: str, target: str, stream: bool = False
+) -> None:
+    """
+    writes src to target with the noise (given a sample of it) reduced in its audio
+    (for an mp4 target, with the video of src stream copied)
+    """
+    _reduce_noise(update_noise_profile(noise_sample), src, stream=stream, target=target)
+
+
+def _reduce_noise_job(
+    noise_profile: NoiseProfile, stream: bool, i: int, f: str
+) -> None:
+    # module level, so it can run in a process pool
+    _reduce_noise(noise_profile, f, stream=stream)
 
 
 def reduce_noise(
-    noise_sample: str, files_to_fix: Union[str, Iterable[os.PathLike], os.PathLike]
+    noise_sample: str,
+    files_to_fix: Union[str, Iterable[os.PathLike], os.PathLike],
+    jobs: int = 1,
+    stream: bool = False,
+    ledger_file: str = "",
 ):
-    noise_sample_sav = f"{noise_sample}.sav"
-    shutil.move(noise_sample, noise_sample_sav)
-    ffmpy.FFmpeg(
-        inputs={noise_sample_sav: None},
-        outputs={noise_sample: "-acodec pcm_s16le -ac 1 -ar 16000"},
-    ).run()
-    noise, _ = sf.read(noise_sample)
-    for f in (
+    """
+    reduces the noise (given a sample of it) in the audio of each file,
+    running (with jobs > 1) in a pool of processes
+    and (with stream) in blocks, so memory use is flat however long the files.
+    Logs how long each file took
+    and raises the first exception of any file that failed.
+
+    With a ledger_file (see NoiseReductionLedger, keyed by absolute path),
+    files already reduced are skipped and each file reduced is recorded
+    """
+    noise_profile = update_noise_profile(noise_sample)
+    files = (
         glob.glob(str(files_to_fix))  # type: ignore
         if isinstance(files_to_fix, str)
-        else files_to_fix
-    ):
-        _reduce_noise(noise, f)
+        else [str(f) for f in files_to_fix]
+    )
+    ledger: Optional[NoiseReductionLedger] = None
+    input_hashes: Dict[str, str] = {}
+    if ledger_file:
+        ledger = (
+            noise_reduction_ledger_from_yaml(ledger_file)
+            if os.path.isfile(ledger_file)
+            else NoiseReductionLedger()
+        )
+        input_hashes = {f: file_hash(f) for f in files}
+        files = [
+            f
+            for f in files
+            if ledger.needs_reduction(
+                os.path.abspath(f),
+                input_hashes[f],
+                noise_profile.sourceHash,
+                noise_sample,
+            )
+        ]
+    result = run_jobs(
+        files,
+        partial(_reduce_noise_job, noise_profile, stream),
+        max_workers=jobs,
+        use_processes=True,
+    )
+    for r in result.results:
+        logging.info(
+            f"reduce_noise {r.job} wall-time={r.wall_time_secs:.2f}s"
+            + (f" error={r.error}" if r.error else "")
+        )
+    if len(files) > 1:
+        logging.info(f"reduce_noise {result.summary()}")
+    if ledger is not None:
+        for r in result.results:
+            if r.succeeded():
+                ledger.record(
+                    os.path.abspath(r.job),
+                    os.path.abspath(noise_sample),
+                    input_hashes[r.job],
+                    noise_profile.sourceHash,
+                    file_hash(r.job),
+                )
+        noise_reduction_ledger_to_yaml(ledger, ledger_file)
+    failed = result.failed()
+    if failed:
+        raise failed[0].error  # type: ignore
@@ -0,0 +1,55 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+from typing import Any, Dict, Iterable, List
+
+# the key (which no character of a name can be) for the sample at a trie node
+_SAMPLE = ""
+
+
+class NoiseRegistry:
+    """
+    The noise samples of a mentor (build/noise/*.wav) indexed in a trie
+    by their names, each one a prefix of the ids of the utterances it's for:
+    a session (e.g. s001), a session part (s001p001) or one utterance
+    (s001p001s00000413e00000805).
+
+    An utterance gets the sample with the longest name its id starts with
+    (the most specific one), found in O(len(id)) whatever the number of samples
+    """
+
+    def __init__(self, noise_samples: Iterable[str] = ()):
+        self._root: Dict[str, Any] = {}
+        self._samples: List[str] = []
+        for n in noise_samples:
+            self.add(n)
+
+    def add(self, noise_sample: str) -> None:
+        node = self._root
+        for c in os.path.splitext(os.path.basename(noise_sample))[0]:
+            node = node.setdefault(c, {})
+        node[_SAMPLE] = noise_sample
+        self._samples.append(noise_sample)
+
+    def find(self, utterance_id: str) -> str:
+        """
+        the noise sample for an utterance (empty if there's none)
+        """
+        result = ""
+        node = self._root
+        for c in utterance_id:
+            node = node.get(c)
+            if node is None:
+                break
+            result = node.get(_SAMPLE, result)
+        return result
+
+    def noise_samples(self) -> List[str]:
+        return list(self._samples)
+
+    def __len__(self) -> int:
+        return len(self._samples)
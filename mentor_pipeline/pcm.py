@@ -0,0 +1,269 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from collections import defaultdict
+from dataclasses import dataclass
+import glob
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+from threading import Lock
+from typing import Dict, Iterator, List, Optional
+
+import ffmpy
+import numpy as np
+import soundfile as sf
+
+from mentor_pipeline.media_tools import MediaSlice, slice_audio_session
+from mentor_pipeline.probe import find_media_probe
+from mentor_pipeline.provenance import file_fingerprint
+from mentor_pipeline.utils import staged_files
+
+DEFAULT_SAMPLE_RATE = 16000
+
+
+@dataclass
+class PcmAudio:
+    """
+    decoded (mono, 16 bit) audio
+    """
+
+    samples: np.ndarray
+    rate: int
+
+    def get_duration(self) -> float:
+        return len(self.samples) / self.rate
+
+    def slice(self, time_start: float, time_end: float) -> np.ndarray:
+        """
+        the samples from time_start to time_end (clamped to the audio)
+        """
+        i_start = min(
+            max(int(round(float(time_start) * self.rate)), 0), len(self.samples)
+        )
+        i_end = min(
+            max(int(round(float(time_end) * self.rate)), i_start), len(self.samples)
+        )
+        return self.samples[i_start:i_end]
+
+
+def _ffmpeg_decode_command(rate: int) -> str:
+    return f"-vn -ac 1 -ar {rate} -f s16le -acodec pcm_s16le"
+
+
+def _rate_for(src_file: str, rate: int = 0) -> int:
+    rate = rate or find_media_probe(src_file).audioSampleRate
+    return rate if rate > 0 else DEFAULT_SAMPLE_RATE
+
+
+def _decode_with_ffmpeg(src_file: str, rate: int = 0) -> PcmAudio:
+    rate = _rate_for(src_file, rate)
+    out, _ = ffmpy.FFmpeg(
+        inputs={src_file: "-loglevel quiet"},
+        outputs={"pipe:1": _ffmpeg_decode_command(rate)},
+    ).run(stdout=subprocess.PIPE)
+    return PcmAudio(samples=np.frombuffer(out, dtype=np.int16), rate=rate)
+
+
+def decode_pcm(src_file: str, rate: int = 0) -> PcmAudio:
+    """
+    decodes all the audio of a file to mono PCM
+    at the given sample rate (or else the file's own),
+    reading it with soundfile when libsndfile has the format (e.g. wav, flac)
+    and otherwise with ffmpeg (e.g. m4a, mp4)
+    """
+    try:
+        data, sf_rate = sf.read(src_file, dtype="int16", always_2d=True)
+    except RuntimeError:
+        return _decode_with_ffmpeg(src_file, rate)
+    if rate and rate != sf_rate:
+        return _decode_with_ffmpeg(src_file, rate)
+    samples = (
+        data[:, 0] if data.shape[1] == 1 else data.mean(axis=1).round().astype(np.int16)
+    )
+    return PcmAudio(samples=samples, rate=sf_rate)
+
+
+def decode_pcm_blocks(
+    src_file: str, rate: int = 0, block_samples: int = 65536
+) -> Iterator[np.ndarray]:
+    """
+    decodes the audio of a file to mono PCM (see decode_pcm)
+    as blocks of (up to) block_samples samples,
+    so only one block at a time is in memory
+    """
+    rate = _rate_for(src_file, rate)
+    ff = ffmpy.FFmpeg(
+        inputs={src_file: "-loglevel quiet"},
+        outputs={"pipe:1": _ffmpeg_decode_command(rate)},
+    )
+    with subprocess.Popen(shlex.split(ff.cmd), stdout=subprocess.PIPE) as proc:
+        try:
+            while True:
+                block = proc.stdout.read(block_samples * 2)  # type: ignore
+                if len(block) < 2:
+                    break
+                yield np.frombuffer(block[: len(block) // 2 * 2], dtype=np.int16)
+        except BaseException:
+            # including the reader closing the generator before the end
+            proc.kill()
+            raise
+    if proc.returncode != 0:
+        raise ffmpy.FFRuntimeError(ff.cmd, proc.returncode, b"", b"")
+
+
+class PcmCache:
+    """
+    The decoded audio of media files as raw (mono, 16 bit) PCM files in root,
+    opened with numpy.memmap, so readers page in only the windows they use
+    and a file is decoded once for all the stages (and runs) that read it.
+
+    An entry is keyed by the path, size and mtime of its source (and the rate),
+    so it's never used once the source changes.
+    When the entries total more than budget_bytes,
+    the least recently used ones are removed.
+    Safe to use from many threads.
+    """
+
+    def __init__(self, root: str, budget_bytes: int):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self._lock = Lock()
+        self._locks_by_key: Dict[str, Lock] = defaultdict(Lock)
+
+    def _key(self, src_file: str, rate: int) -> str:
+        return hashlib.sha256(
+            json.dumps(
+                [os.path.abspath(src_file), file_fingerprint(src_file), rate]
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def _find_entry(self, key: str) -> str:
+        return next(iter(glob.glob(os.path.join(self.root, f"{key}.*.pcm"))), "")
+
+    def get(self, src_file: str, rate: int = 0) -> PcmAudio:
+        """
+        the audio of src_file at the given sample rate (or else the file's own),
+        decoding it into the cache if it's not there
+        """
+        key = self._key(src_file, rate)
+        with self._lock:
+            key_lock = self._locks_by_key[key]
+        with key_lock:
+            entry = self._find_entry(key)
+            if entry:
+                os.utime(entry)  # most recently used
+            else:
+                entry = self._add(key, src_file, rate)
+        entry_rate = int(os.path.basename(entry).split(".")[1])
+        return PcmAudio(
+            samples=np.memmap(entry, dtype=np.int16, mode="r")
+            if os.path.getsize(entry) > 0
+            else np.zeros(0, dtype=np.int16),
+            rate=entry_rate,
+        )
+
+    def _add(self, key: str, src_file: str, rate: int) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        rate = _rate_for(src_file, rate)
+        entry = os.path.join(self.root, f"{key}.{rate}.pcm")
+        with staged_files([entry]) as [staged]:
+            ffmpy.FFmpeg(
+                inputs={src_file: "-y -loglevel quiet"},
+                outputs={staged: _ffmpeg_decode_command(rate)},
+            ).run()
+        self.evict(keep=entry)
+        return entry
+
+    def evict(self, keep: str = "") -> List[str]:
+        """
+        removes the least recently used entries (other than keep)
+        until the cache is within its budget and returns the removed files
+        """
+        with self._lock:
+            entries = sorted(
+                (
+                    (os.path.getmtime(f), os.path.getsize(f), f)
+                    for f in glob.glob(os.path.join(self.root, "*.pcm"))
+                ),
+            )
+            total = sum(size for _, size, _ in entries)
+            removed: List[str] = []
+            for _, size, f in entries:
+                if total <= self.budget_bytes:
+                    break
+                if f == keep:
+                    continue
+                try:
+                    os.remove(f)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed.append(f)
+            return removed
+
+
+_pcm_cache: Optional[PcmCache] = None
+
+
+def get_pcm_cache() -> Optional[PcmCache]:
+    """
+    the cache consulted by find_pcm (by default none)
+    """
+    return _pcm_cache
+
+
+def set_pcm_cache(cache: Optional[PcmCache]) -> None:
+    global _pcm_cache
+    _pcm_cache = cache
+
+
+def find_pcm(src_file: str, rate: int = 0) -> PcmAudio:
+    """
+    the decoded audio of a file from the PCM cache (see set_pcm_cache)
+    or, with no cache, decoded into memory
+    """
+    return _pcm_cache.get(src_file, rate) if _pcm_cache else decode_pcm(src_file, rate)
+
+
+def can_write(target_file: str) -> bool:
+    """
+    true if soundfile can write a file of this type
+    (e.g. mp3 needs libsndfile 1.1.0 or later)
+    """
+    return (
+        os.path.splitext(target_file)[1].lstrip(".").upper() in sf.available_formats()
+    )
+
+
+def write_pcm_slices(pcm: PcmAudio, slices: List[MediaSlice]) -> None:
+    """
+    writes each slice from the decoded audio
+    (the cut is sample accurate and nothing is decoded again)
+    """
+    for s in slices:
+        os.makedirs(os.path.dirname(s.target_file), exist_ok=True)
+        fmt = os.path.splitext(s.target_file)[1].lstrip(".").upper()
+        with staged_files([s.target_file]) as [staged]:
+            sf.write(staged, pcm.slice(s.time_start, s.time_end), pcm.rate, format=fmt)
+
+
+def slice_audio_session_pcm(src_file: str, slices: List[MediaSlice]) -> None:
+    """
+    Like media_tools.slice_audio_session, but decodes the session audio
+    to PCM once (see find_pcm) and writes every slice from that
+    (so no ffmpeg process per slice or per chunk of slices).
+
+    Slices of a type soundfile can't write go to slice_audio_session
+    """
+    pcm_slices = [s for s in slices if can_write(s.target_file)]
+    other_slices = [s for s in slices if not can_write(s.target_file)]
+    if pcm_slices:
+        write_pcm_slices(find_pcm(src_file), pcm_slices)
+    if other_slices:
+        slice_audio_session(src_file, other_slices)
@@ -0,0 +1,179 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from dataclasses import asdict, dataclass, field
+import os
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from pymediainfo import MediaInfo
+
+from mentor_pipeline.jobs import JobsResult, run_jobs
+from mentor_pipeline.utils import yaml_load, yaml_write
+
+
+@dataclass
+class MediaProbe:
+    """
+    what we need to know about a media file
+    (along with the size and mtime of the file when it was probed).
+    Values that don't apply (e.g. video props of an audio file) are -1 or ""
+    """
+
+    size: int = -1
+    mtime: float = -1.0
+    duration: float = -1.0
+    width: int = -1
+    height: int = -1
+    frameRate: float = -1.0
+    videoCodec: str = ""
+    audioCodec: str = ""
+    audioSampleRate: int = -1
+    audioChannels: int = -1
+    audioChannelLayout: str = ""
+
+    def has_video(self) -> bool:
+        return self.width > 0 and self.height > 0
+
+    def is_valid_for(self, media_file: str) -> bool:
+        if not os.path.isfile(media_file):
+            return False
+        st = os.stat(media_file)
+        return self.size == st.st_size and self.mtime == st.st_mtime
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _to_float(v, default: float = -1.0) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_int(v, default: int = -1) -> int:
+    try:
+        # mediainfo reports some numbers as strings like "2 / 1"
+        return int(str(v).split("/")[0].strip())
+    except (TypeError, ValueError):
+        return default
+
+
+def probe_media(media_file: str) -> MediaProbe:
+    """
+    probes a media file with MediaInfo (doesn't use or update any manifest)
+    """
+    media_info = MediaInfo.parse(media_file)
+    tracks = getattr(media_info, "tracks", [])
+    general = next((t for t in tracks if t.track_type == "General"), None)
+    video = next((t for t in tracks if t.track_type == "Video"), None)
+    audio = next((t for t in tracks if t.track_type == "Audio"), None)
+    result = MediaProbe()
+    if os.path.isfile(media_file):
+        st = os.stat(media_file)
+        result.size = st.st_size
+        result.mtime = st.st_mtime
+    duration_ms = getattr(general, "duration", None) or getattr(video, "duration", None)
+    result.duration = _to_float(duration_ms) / 1000.0 if duration_ms else -1.0
+    if video:
+        result.width = _to_int(getattr(video, "width", None))
+        result.height = _to_int(getattr(video, "height", None))
+        result.frameRate = _to_float(getattr(video, "frame_rate", None))
+        result.videoCodec = str(getattr(video, "format", None) or "")
+    if audio:
+        result.audioCodec = str(getattr(audio, "format", None) or "")
+        result.audioSampleRate = _to_int(getattr(audio, "sampling_rate", None))
+        result.audioChannels = _to_int(getattr(audio, "channel_s", None))
+        result.audioChannelLayout = str(getattr(audio, "channel_layout", None) or "")
+    return result
+
+
+@dataclass
+class ProbeManifest:
+    """
+    probes by media file path, keyed with key_for_path
+    (e.g. relative to the mentor's data or videos, see MentorPath.load_media_probes;
+    absolute by default).
+    A probe is only used while the size and mtime of its file are unchanged.
+    Safe to use from many threads.
+    """
+
+    probesByPath: Dict[str, MediaProbe] = field(default_factory=lambda: {})
+    key_for_path: Callable[[str], str] = field(
+        default=os.path.abspath, compare=False, repr=False
+    )
+
+    def __post_init__(self):
+        self.probesByPath = {
+            k: v if isinstance(v, MediaProbe) else MediaProbe(**v)
+            for k, v in (self.probesByPath or {}).items()
+        }
+        self._lock = Lock()
+
+    def find(self, media_file: str) -> Optional[MediaProbe]:
+        with self._lock:
+            p = self.probesByPath.get(self.key_for_path(media_file))
+        return p if p and p.is_valid_for(media_file) else None
+
+    def probe(self, media_file: str) -> MediaProbe:
+        """
+        returns the probe for a media file from the manifest
+        or else probes the file (and adds it to the manifest if it exists)
+        """
+        p = self.find(media_file)
+        if p:
+            return p
+        p = probe_media(media_file)
+        if p.size >= 0:
+            with self._lock:
+                self.probesByPath[self.key_for_path(media_file)] = p
+        return p
+
+    def probe_all(self, media_files: List[str], jobs: int = 1) -> JobsResult[str]:
+        """
+        makes sure all media files are in the manifest,
+        probing up to `jobs` files concurrently
+        """
+        return run_jobs(
+            [f for f in media_files if not self.find(f)],
+            lambda i, f: self.probe(f),
+            max_workers=jobs,
+        )
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return dict(
+                probesByPath={k: v.to_dict() for k, v in self.probesByPath.items()}
+            )
+
+
+def probe_manifest_from_yaml(yml: str) -> ProbeManifest:
+    return ProbeManifest(**(yaml_load(yml) or {}))
+
+
+def probe_manifest_to_yaml(pm: ProbeManifest, tgt_path: str) -> None:
+    yaml_write(pm.to_dict(), tgt_path)
+
+
+_manifest = ProbeManifest()
+
+
+def get_manifest() -> ProbeManifest:
+    """
+    the manifest consulted by find_media_probe
+    (by default one that lives only as long as the process)
+    """
+    return _manifest
+
+
+def set_manifest(pm: ProbeManifest) -> None:
+    global _manifest
+    _manifest = pm
+
+
+def find_media_probe(media_file: str) -> MediaProbe:
+    return _manifest.probe(media_file)
@@ -6,12 +6,13 @@
 #
 from dataclasses import asdict, dataclass, field
 from datetime import timedelta
-from functools import reduce
+from functools import partial, reduce
 import logging
 import os
 import re
 import shutil
-from typing import Callable, Dict, Iterable, List, Optional
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 from ftfy import fix_text
 import pandas as pd
@@ -19,10 +20,30 @@ from uuid import uuid1
 
 import mentor_pipeline
 from mentor_pipeline.captions import transcript_to_vtt
+from mentor_pipeline.encode_profiles import DEFAULT_ENCODE_PROFILE, EncodeProfile
 from mentor_pipeline import media_tools
+from mentor_pipeline.jobs import (
+    JobProgressCallback,
+    JobsResult,
+    JobsResultSummary,
+    run_jobs,
+)
 from mentor_pipeline.mentorpath import MentorPath
+from mentor_pipeline.noise_registry import NoiseRegistry
 from mentor_pipeline.paraphrases import ParaphrasesByQuestion
+from mentor_pipeline import pcm, probe
+from mentor_pipeline.progress import JobMetrics
+from mentor_pipeline.provenance import (
+    file_fingerprint,
+    fingerprint,
+    ProvenanceManifest,
+)
 from mentor_pipeline.topics import TopicsByQuestion
+from mentor_pipeline.transcript_cache import transcript_cache_key
+from mentor_pipeline.transcript_journal import (
+    apply_transcript_journal,
+    TranscriptJournalEntry,
+)
 from mentor_pipeline.training_data import (
     ClassifierDataBuilder,
     QuestionsParaphrasesAnswersBuilder,
@@ -36,11 +57,15 @@ from transcribe import (
     TranscribeJobsUpdate,
     TranscriptionService,
 )
-from mentor_pipeline.utils import yaml_load
+from mentor_pipeline.utils import staged_files, yaml_load
 from mentor_pipeline.utterance_asset_type import (
     UtteranceAssetType,
+    SESSION_AUDIO,
     SESSION_TIMESTAMPS,
+    SESSION_VIDEO,
     UTTERANCE_AUDIO,
+    UTTERANCE_VIDEO,
+    UTTERANCE_VIDEO_HLS,
     UTTERANCE_VIDEO_MOBILE,
     UTTERANCE_VIDEO_WEB,
 )
@@ -65,14 +90,180 @@ def _copyfile(f: str, t: str) -> None:
     shutil.copyfile(f, t)
 
 
+_PROGRESS_LOG_INTERVAL_SECS = 10.0
+
+
+def _log_jobs_result(
+    logging_function_name: str,
+    jobs_result: JobsResult,
+    job_name: Callable[[Any], str],
+) -> None:
+    for r in jobs_result.results:
+        logging.debug(
+            f"{logging_function_name} {job_name(r.job)} wall-time={r.wall_time_secs:.2f}s cpu-time={r.metrics.cpuTimeSecs:.2f}s media={r.metrics.mediaSecs:.1f}s ({r.metrics.speed():.1f}x realtime) output-size={r.metrics.outputSize}B"
+        )
+    if jobs_result.results:
+        logging.info(f"{logging_function_name} {jobs_result.summary()}")
+
+
+def _log_job_progress(
+    logging_function_name: str, n_jobs: int, job_name: Callable[[Any], str]
+) -> JobProgressCallback:
+    """
+    returns a progress callback for run_jobs
+    that logs the progress of each job every _PROGRESS_LOG_INTERVAL_SECS
+    """
+    logged_at: Dict[int, float] = {}
+
+    def _log(i: int, job: Any, metrics: JobMetrics) -> None:
+        now = time.perf_counter()
+        if now - logged_at.setdefault(i, now) < _PROGRESS_LOG_INTERVAL_SECS:
+            return
+        logged_at[i] = now
+        logging.info(
+            f"{logging_function_name} [{i + 1}/{n_jobs}] {job_name(job)} media={metrics.mediaSecs:.1f}s ({metrics.speed():.1f}x realtime) output-size={metrics.outputSize}B wall-time={metrics.wallTimeSecs:.1f}s"
+        )
+
+    return _log
+
+
+def _run_and_log_jobs(
+    logging_function_name: str,
+    jobs_list: List[Any],
+    job_func: Callable[[int, Any], None],
+    job_name: Callable[[Any], str],
+    jobs: int = 1,
+    use_processes: bool = False,
+) -> JobsResult:
+    """
+    runs jobs (see jobs.run_jobs), logging the progress of each
+    and then a summary for all of them
+    """
+    jobs_result = run_jobs(
+        jobs_list,
+        job_func,
+        max_workers=jobs,
+        on_progress=None
+        if use_processes
+        else _log_job_progress(logging_function_name, len(jobs_list), job_name),
+        use_processes=use_processes,
+    )
+    _log_jobs_result(logging_function_name, jobs_result, job_name)
+    return jobs_result
+
+
+def _profile_kwargs(profile: Optional[EncodeProfile]) -> Dict[str, Any]:
+    # passed to media functions only when set,
+    # so they use the settings we've always used otherwise
+    return dict(profile=profile) if profile else {}
+
+
+def _record_encode_profile(
+    mp: MentorPath,
+    asset_type: UtteranceAssetType,
+    targets: Iterable[str],
+    profile: Optional[EncodeProfile],
+) -> None:
+    """
+    records which encode profile built each of the targets that exist
+    """
+    built = [t for t in targets if t and os.path.isfile(t)]
+    if not built:
+        return
+    profiles_by_asset = mp.load_encode_profiles_by_asset()
+    for t in built:
+        profiles_by_asset[
+            mp.to_relative_path(t, asset_type.get_mentor_asset_root())
+        ] = (profile or DEFAULT_ENCODE_PROFILE).name
+    mp.write_encode_profiles_by_asset(profiles_by_asset)
+
+
+def _is_built(
+    mp: MentorPath,
+    prov: ProvenanceManifest,
+    asset_type: UtteranceAssetType,
+    target: str,
+    fp: str,
+) -> bool:
+    """
+    true if the target exists and was built from inputs with the given fingerprint.
+    A target built from other inputs loses its recorded fingerprint,
+    but is left in place until its rebuild replaces it
+    """
+    key = mp.to_relative_path(target, asset_type.get_mentor_asset_root())
+    if prov.is_up_to_date(key, target, fp):
+        return True
+    if os.path.isfile(target):
+        logging.info(f"{target} is out of date with its inputs and will be rebuilt")
+        prov.remove(key)
+    return False
+
+
+def _record_provenance(
+    mp: MentorPath,
+    prov: ProvenanceManifest,
+    asset_type: UtteranceAssetType,
+    fp_by_target: Dict[str, str],
+    failed_targets: Set[str],
+) -> None:
+    """
+    records the fingerprint of the inputs of each of the targets that exist.
+    A target that failed to build may still be there out of date (see _is_built),
+    so it's recorded with no fingerprint that matches to be rebuilt next time
+    """
+    for t, fp in fp_by_target.items():
+        if t and os.path.isfile(t):
+            prov.set(
+                mp.to_relative_path(t, asset_type.get_mentor_asset_root()),
+                "" if t in failed_targets else fp,
+            )
+
+
+def _failed_targets(
+    jobs_result: JobsResult, job_targets: Callable[[Any], Iterable[str]]
+) -> Set[str]:
+    return {t for r in jobs_result.failed() for t in job_targets(r.job) if t}
+
+
+def _video_fingerprint(
+    source: str, asset_type: UtteranceAssetType, profile: Optional[EncodeProfile]
+) -> str:
+    return fingerprint(
+        asset=asset_type.get_name(),
+        source=file_fingerprint(source),
+        profile=(profile or DEFAULT_ENCODE_PROFILE).to_dict(),
+    )
+
+
+def _slice_fingerprint(
+    source: str,
+    u: Utterance,
+    asset_type: UtteranceAssetType,
+    profile: Optional[EncodeProfile] = None,
+) -> str:
+    return fingerprint(
+        asset=asset_type.get_name(),
+        source=file_fingerprint(source),
+        timeStart=float(u.timeStart),
+        timeEnd=float(u.timeEnd),
+        profile=(profile or DEFAULT_ENCODE_PROFILE).to_dict()
+        if asset_type.get_default_file_ext() == "mp4"
+        else None,
+    )
+
+
 def _prepare_videos(
     utterances: UtteranceMap,
     mp: MentorPath,
     video_type: UtteranceAssetType,
-    encode_func: Callable[[str, str], None],
+    encode_func: Callable[..., None],
     logging_function_name: str,
+    jobs: int = 1,
+    profile: Optional[EncodeProfile] = None,
 ) -> UtteranceMap:
     result_utterances = copy_utterances(utterances)
+    prov = mp.load_provenance()
+    fp_by_target: Dict[str, str] = {}
     ust_list: List[_UtteranceSourceAndTarget] = []
     for u in result_utterances.utterances():
         try:
@@ -84,8 +275,10 @@ def _prepare_videos(
             target_path = mp.find_asset(
                 u, asset_type=video_type, return_non_existing_paths=True
             )
-            if os.path.isfile(target_path):
+            fp = _video_fingerprint(source_path, video_type, profile)
+            if _is_built(mp, prov, video_type, target_path, fp):
                 continue
+            fp_by_target[target_path] = fp
             ust_list.append(
                 _UtteranceSourceAndTarget(
                     utterance=u, source=source_path, target=target_path
@@ -95,17 +288,38 @@ def _prepare_videos(
             logging.exception(
                 f"{logging_function_name}: exception processing utterance: {u_err}"
             )
-    for i, ust in enumerate(ust_list):
+
+    def _encode(i: int, ust: _UtteranceSourceAndTarget) -> None:
         try:
             logging.info(
                 f"{logging_function_name} [{i + 1}/{len(ust_list)}] source={ust.source}, target={ust.target}"
             )
             os.makedirs(os.path.dirname(ust.target), exist_ok=True)
-            encode_func(ust.source, ust.target)
+            encode_func(ust.source, ust.target, **_profile_kwargs(profile))
         except BaseException as u_err:
             logging.exception(
                 f"{logging_function_name}: exception processing utterance: {u_err}"
             )
+            raise  # so the job counts as failed
+
+    failed = _failed_targets(
+        _run_and_log_jobs(
+            logging_function_name,
+            ust_list,
+            _encode,
+            lambda ust: ust.target,
+            jobs=jobs,
+        ),
+        lambda ust: [ust.target],
+    )
+    _record_encode_profile(
+        mp,
+        video_type,
+        (ust.target for ust in ust_list if ust.target not in failed),
+        profile,
+    )
+    _record_provenance(mp, prov, video_type, fp_by_target, failed)
+    mp.write_provenance(prov)
     return result_utterances
 
 
@@ -122,6 +336,10 @@ def _timestr_to_secs(s: str) -> float:
 class SessionToAudio:
     sessionAudio: str = ""
     sessionVideo: str = ""
+    # with noise reduction, the sample of the session's noise
+    # and the session video with its audio noise reduced
+    noiseSample: str = ""
+    sessionVideoDenoised: str = ""
     utterances: List[Utterance] = field(default_factory=lambda: [])
 
 
@@ -136,23 +354,58 @@ class SessionToAudioResultSummary:
         return asdict(self)
 
 
-def prepare_videos_mobile(utterances: UtteranceMap, mp: MentorPath) -> UtteranceMap:
+def prepare_videos_hls(
+    utterances: UtteranceMap,
+    mp: MentorPath,
+    jobs: int = 1,
+    profile: Optional[EncodeProfile] = None,
+) -> UtteranceMap:
+    """
+    packages each utterance video as an HLS bitrate ladder
+    (see media_tools.video_encode_for_hls)
+    """
+    return _prepare_videos(
+        utterances,
+        mp,
+        UTTERANCE_VIDEO_HLS,
+        media_tools.video_encode_for_hls,
+        "prepare_videos_hls",
+        jobs=jobs,
+        profile=profile,
+    )
+
+
+def prepare_videos_mobile(
+    utterances: UtteranceMap,
+    mp: MentorPath,
+    jobs: int = 1,
+    profile: Optional[EncodeProfile] = None,
+) -> UtteranceMap:
     return _prepare_videos(
         utterances,
         mp,
         UTTERANCE_VIDEO_MOBILE,
         media_tools.video_encode_for_mobile,
         "prepare_videos_mobile",
+        jobs=jobs,
+        profile=profile,
     )
 
 
-def prepare_videos_web(utterances: UtteranceMap, mp: MentorPath) -> UtteranceMap:
+def prepare_videos_web(
+    utterances: UtteranceMap,
+    mp: MentorPath,
+    jobs: int = 1,
+    profile: Optional[EncodeProfile] = None,
+) -> UtteranceMap:
     return _prepare_videos(
         utterances,
         mp,
         UTTERANCE_VIDEO_WEB,
         media_tools.video_encode_for_web,
         "prepare_videos_web",
+        jobs=jobs,
+        profile=profile,
     )
 
 
@@ -168,6 +421,8 @@ class SessionToAudioResult:
     utterances: UtteranceMap
     succeeded: List[SessionToAudio] = field(default_factory=lambda: [])
     failed: List[SessionToAudio] = field(default_factory=lambda: [])
+    # wall/cpu time, media secs and output size of the conversions
+    jobs_summary: Optional[JobsResultSummary] = None
 
     def summary(self):
         return SessionToAudioResultSummary(
@@ -182,20 +437,87 @@ class SessionToAudioResult:
         )
 
 
-def sessions_to_audio(utterances: UtteranceMap, mp: MentorPath) -> SessionToAudioResult:
+def _session_audio_target(
+    mp: MentorPath, u: Utterance, audio_format: media_tools.SessionAudioFormat
+) -> str:
+    """
+    the path of the session audio of an utterance in the given format
+    (session audio that isn't extracted from a video is used as is)
+    """
+    session_audio = mp.find_session_audio(u, return_non_existing_paths=True)
+    if not session_audio or not mp.find_session_video(u):
+        return session_audio
+    return f"{os.path.splitext(session_audio)[0]}.{audio_format.ext}"
+
+
+def sessions_to_audio(
+    utterances: UtteranceMap,
+    mp: MentorPath,
+    jobs: int = 1,
+    audio_format: str = media_tools.DEFAULT_SESSION_AUDIO_FORMAT.name,
+    reduce_noise: bool = False,
+) -> SessionToAudioResult:
     """
     Give sessions data and a root sessions directory,
     make sure all that sessionAudio is generated (from video)
-    and assigned to each utterance
+    and assigned to each utterance.
+
+    Converts up to `jobs` sessions at once,
+    to session audio in `audio_format` (see media_tools.SESSION_AUDIO_FORMATS)
+
+    With reduce_noise, each session with a noise sample (see mp.load_noise_registry)
+    has the noise reduced once, for the whole session
+    (with the sample for its session part, e.g. s001p001 or s001):
+    its video is written with the audio noise reduced to build/denoised
+    (see mp.find_session_video_denoised) and the session audio is extracted
+    from that, so utterance audio (and transcripts) are sliced from clean audio
+    and utterance videos are sliced from the denoised session video
+    (see utterances_slice_video), instead of reducing noise
+    in every utterance video after the fact (see utterances_noise_reduction)
     """
+    session_audio_format = media_tools.SESSION_AUDIO_FORMATS[audio_format]
     result = SessionToAudioResult(utterances=copy_utterances(utterances))
+    prov = mp.load_provenance()
+    noise_registry = mp.load_noise_registry() if reduce_noise else NoiseRegistry()
+    fp_by_target: Dict[str, str] = {}
+    noise_sample_by_target: Dict[str, str] = {}
     s2a_by_session_audio_path: Dict[str, SessionToAudio] = dict()
     # probably this could be accumulate but seems like code would be less readable?
     for u in result.utterances.utterances():
         mp.find_and_assign_assets(u)
-        session_audio = mp.find_session_audio(u, return_non_existing_paths=True)
-        if os.path.isfile(session_audio):
-            continue  # no need to process already existing session audio
+        session_audio = _session_audio_target(mp, u, session_audio_format)
+        if session_audio not in noise_sample_by_target:
+            # one sample for the whole session part,
+            # never one meant for a single utterance
+            noise_sample_by_target[session_audio] = noise_registry.find(
+                u.get_session_part_id()
+            )
+        noise_sample = noise_sample_by_target[session_audio]
+        session_video_denoised = mp.find_session_video_denoised(
+            u, return_non_existing_paths=True
+        )
+        if session_audio not in fp_by_target:
+            fp_by_target[session_audio] = (
+                fingerprint(
+                    asset=SESSION_AUDIO.get_name(),
+                    source=file_fingerprint(mp.find_session_video(u)),
+                    noise=file_fingerprint(noise_sample),
+                )
+                if noise_sample
+                else fingerprint(
+                    asset=SESSION_AUDIO.get_name(),
+                    source=file_fingerprint(mp.find_session_video(u)),
+                )
+            )
+            if _is_built(
+                mp, prov, SESSION_AUDIO, session_audio, fp_by_target[session_audio]
+            ) and (not noise_sample or os.path.isfile(session_video_denoised)):
+                # no need to process already existing session audio
+                mp.set_session_audio_path(u, session_audio)
+                continue
+        elif session_audio not in s2a_by_session_audio_path:
+            mp.set_session_audio_path(u, session_audio)
+            continue
         if session_audio not in s2a_by_session_audio_path:
             s2a_by_session_audio_path[session_audio] = SessionToAudio(
                 sessionAudio=session_audio
@@ -205,20 +527,60 @@ def sessions_to_audio(utterances: UtteranceMap, mp: MentorPath) -> SessionToAudi
         s2a.sessionVideo = (
             mp.find_session_video(u) if not s2a.sessionVideo else s2a.sessionVideo
         )
-    for i, s2a in enumerate(s2a_by_session_audio_path.values()):
+        if s2a.sessionVideo:
+            s2a.noiseSample = noise_sample
+            s2a.sessionVideoDenoised = session_video_denoised
+    s2a_list = list(s2a_by_session_audio_path.values())
+    noise_profiles_update(sorted({s2a.noiseSample for s2a in s2a_list} - {""}))
+
+    def _to_audio(i: int, s2a: SessionToAudio) -> None:
         try:
             if not s2a.sessionVideo:
-                continue
+                return
             logging.info(
-                f"sessions_to_audio [{i + 1}/{len(s2a_by_session_audio_path)}] video={s2a.sessionVideo}, audio={s2a.sessionAudio}"
+                f"sessions_to_audio [{i + 1}/{len(s2a_list)}] video={s2a.sessionVideo}, audio={s2a.sessionAudio}"
+                + (f", noise={s2a.noiseSample}" if s2a.noiseSample else "")
             )
-            media_tools.video_to_audio(s2a.sessionVideo, s2a.sessionAudio)
+            if s2a.noiseSample:
+                os.makedirs(os.path.dirname(s2a.sessionVideoDenoised), exist_ok=True)
+                # streaming, since a whole session may not fit in memory
+                mentor_pipeline.noise.reduce_noise_to(
+                    s2a.noiseSample,
+                    s2a.sessionVideo,
+                    s2a.sessionVideoDenoised,
+                    stream=True,
+                )
+                media_tools.video_to_audio(s2a.sessionVideoDenoised, s2a.sessionAudio)
+            else:
+                if s2a.sessionVideoDenoised and os.path.isfile(
+                    s2a.sessionVideoDenoised
+                ):
+                    # so utterance videos are sliced from the session video again
+                    os.remove(s2a.sessionVideoDenoised)
+                media_tools.video_to_audio(s2a.sessionVideo, s2a.sessionAudio)
             for u in s2a.utterances:
-                mp.find_and_assign_assets(u)
+                mp.set_session_audio_path(u, s2a.sessionAudio)
             result.succeeded.append(s2a)  # pylint: disable=E1101
         except BaseException as u_err:
             logging.exception(f"exception processing utterance: {u_err}")
             result.failed.append(s2a)  # pylint: disable=E1101
+            raise  # so the job counts as failed
+
+    result.jobs_summary = _run_and_log_jobs(
+        "sessions_to_audio",
+        s2a_list,
+        _to_audio,
+        lambda s2a: s2a.sessionAudio,
+        jobs=jobs,
+    ).metrics_summary()
+    _record_provenance(
+        mp,
+        prov,
+        SESSION_AUDIO,
+        fp_by_target,
+        set(s2a.sessionAudio for s2a in result.failed),  # pylint: disable=E1101
+    )
+    mp.write_provenance(prov)
     return result
 
 
@@ -302,13 +664,17 @@ def update_topics(utterances: UtteranceMap, topics: TopicsByQuestion) -> Utteran
     return result
 
 
-def _write_transcripts_to_utterances(
+def _transcripts_to_utterances(
     jobs: Iterable[TranscribeJob],
     utterances: UtteranceMap,
     mp: MentorPath,
     strip_non_verbal_tokens=True,
-) -> UtteranceMap:
-    result = copy_utterances(utterances)
+) -> List[TranscriptJournalEntry]:
+    """
+    sets the transcripts of succeeded jobs on the utterances (in place),
+    returning entries for the ones that weren't set already
+    """
+    result: List[TranscriptJournalEntry] = []
     for tres in jobs:
         try:
             if tres.status != TranscribeJobStatus.SUCCEEDED:
@@ -321,18 +687,32 @@ def _write_transcripts_to_utterances(
             audio_path_rel = mp.to_relative_path(
                 tres.sourceFile, UTTERANCE_AUDIO.get_mentor_asset_root()
             )
-            result.set_transcript(
+            u = utterances.find_by_id(tres.jobId)
+            if u and u.transcript == text and u.utteranceAudio == audio_path_rel:
+                continue  # e.g. set from an earlier update
+            utterances.set_transcript(
                 tres.jobId, transcript=text, source_audio=audio_path_rel
             )
+            result.append(
+                TranscriptJournalEntry(
+                    utteranceId=tres.jobId,
+                    transcript=text,
+                    utteranceAudio=audio_path_rel,
+                )
+            )
         except Exception as ex:
             logging.exception(
                 f"failed to process transcript result for id {tres.jobId} with error: {str(ex)}",
                 ex,
             )
-    mp.write_utterances(result)
     return result
 
 
+def _transcription_settings(transcription_service: TranscriptionService) -> dict:
+    t = type(transcription_service)
+    return dict(service=f"{t.__module__}.{t.__qualname__}")
+
+
 def update_transcripts(
     utterances: UtteranceMap,
     transcription_service: TranscriptionService,
@@ -341,29 +721,80 @@ def update_transcripts(
     force_update: bool = False,
     strip_non_verbal_tokens: bool = True,
     on_update: Optional[Callable[[TranscribeJobsUpdate], None]] = None,
+    transcript_cache: bool = False,
 ) -> UtteranceMap:
     """
     Give sessions data and a root sessions directory,
     transcribes the text for items in the sessions data,
     returning an updated copy of the sessions data with transcriptions populated.
+
+    Transcripts that come in before the transcription is done
+    (with each TranscribeJobsUpdate) are appended to the mentor's transcript journal
+    rather than written to utterances.yaml,
+    which is written (and the journal compacted into it) once at the end.
+    Transcripts a crash left in the journal are set on the utterances to start with,
+    so they are not transcribed again (unless force_update).
+
+    With transcript_cache, transcripts are kept in the mentor's
+    transcript cache by a hash of the decoded audio (see transcript_cache),
+    and an utterance whose audio is in the cache gets its transcript from there
+    instead of from the transcription service
     """
-    result = copy_utterances(utterances)
+    journal = mp.load_transcript_journal()
+    journal_ids = set(e.utteranceId for e in journal)
+    result = apply_transcript_journal(copy_utterances(utterances), journal)
+    cache = mp.load_transcript_cache() if transcript_cache else None
+    settings = _transcription_settings(transcription_service)
+    cache_keys_by_id: Dict[str, str] = {}
+    cached_jobs: List[TranscribeJob] = []
     transcribe_requests: List[TranscribeJobRequest] = []
     for u in result.utterances():
         if u.transcript and not force_update:
             continue  # transcript already set
         if u.is_no_transcription_type():
             continue  # transcript already set
+        if u.get_id() in journal_ids and not force_update:
+            continue  # transcribed by a run that crashed before it was done
         audio_path = mp.find_utterance_audio(u)
         if not audio_path:
             logging.warning(f"utterance has no audio {u.get_id()}")
             continue
+        if cache is not None:
+            try:
+                cache_key = transcript_cache_key(audio_path, settings)
+            except BaseException as key_err:
+                logging.warning(
+                    f"failed to hash the audio of utterance {u.get_id()} for the transcript cache: {key_err}"
+                )
+                cache_key = ""
+            transcript = cache.find(cache_key) if cache_key else None
+            if transcript is not None:
+                cached_jobs.append(
+                    TranscribeJob(
+                        jobId=u.get_id(),
+                        sourceFile=audio_path,
+                        status=TranscribeJobStatus.SUCCEEDED,
+                        transcript=transcript,
+                    )
+                )
+                continue
+            if cache_key:
+                cache_keys_by_id[u.get_id()] = cache_key
         transcribe_requests.append(
             TranscribeJobRequest(jobId=u.get_id(), sourceFile=audio_path)
         )
+    if cached_jobs:
+        logging.info(
+            f"update_transcripts: {len(cached_jobs)} transcripts from the transcript cache, {len(transcribe_requests)} to transcribe"
+        )
+        _transcripts_to_utterances(cached_jobs, result, mp, strip_non_verbal_tokens)
 
     def _on_update(u: TranscribeJobsUpdate) -> None:
-        _write_transcripts_to_utterances(u.result.jobs(), utterances, mp)
+        journal_entries = _transcripts_to_utterances(
+            u.result.jobs(), result, mp, strip_non_verbal_tokens
+        )
+        if journal_entries:
+            mp.append_transcript_journal(journal_entries)
         if on_update:
             on_update(u)
 
@@ -371,7 +802,18 @@ def update_transcripts(
     transcribe_result = transcription_service.transcribe(
         transcribe_requests, on_update=_on_update, batch_id=batch_id
     )
-    result = _write_transcripts_to_utterances(transcribe_result.jobs(), utterances, mp)
+    if cache is not None:
+        for j in transcribe_result.jobs():
+            if (
+                j.status == TranscribeJobStatus.SUCCEEDED
+                and j.jobId in cache_keys_by_id
+            ):
+                cache.set(cache_keys_by_id[j.jobId], j.transcript)
+        mp.write_transcript_cache(cache)
+    _transcripts_to_utterances(
+        transcribe_result.jobs(), result, mp, strip_non_verbal_tokens
+    )
+    mp.write_utterances(result, compact_transcript_journal=True)
     return result
 
 
@@ -382,32 +824,80 @@ class _UtteranceReduceNoise:
     utterance_video: str
 
 
+def noise_profiles_update(noise_samples: List[str]) -> Dict[str, str]:
+    """
+    Computes (and saves) the noise profile of each noise sample
+    whose saved profile is missing or out of date,
+    so noise reduction never analyzes a noise sample more than once
+    (see noise.update_noise_profile).
+
+    Returns the hash of the sample each profile was computed from by sample
+    (leaving out samples that failed)
+    """
+    result: Dict[str, str] = {}
+    for i, n in enumerate(noise_samples):
+        try:
+            logging.info(
+                f"noise_profiles_update [{i + 1}/{len(noise_samples)}] noise={n}, profile={mentor_pipeline.noise.noise_profile_path(n)}"
+            )
+            result[n] = mentor_pipeline.noise.update_noise_profile(n).sourceHash
+        except BaseException as n_err:
+            logging.exception(f"exception processing noise sample {n}: {n_err}")
+    return result
+
+
+def _reduce_noise(n_targets: int, i: int, t: _UtteranceReduceNoise) -> None:
+    # module level, so it can run in a process pool
+    try:
+        logging.info(
+            f"utterances_noise_reduction [{i + 1}/{n_targets}] noise={t.noise_sample}, target={t.utterance_video}"
+        )
+        time_start = time.perf_counter()
+        mentor_pipeline.noise.reduce_noise(t.noise_sample, t.utterance_video)
+        logging.info(
+            f"utterances_noise_reduction [{i + 1}/{n_targets}] target={t.utterance_video} wall-time={time.perf_counter() - time_start:.2f}s"
+        )
+    except BaseException as t_err:
+        logging.exception(f"exception processing utterance: {t_err}")
+        raise  # so the job fails and the video isn't recorded as reduced
+
+
 def utterances_noise_reduction(
-    utterances: UtteranceMap, mp: MentorPath
+    utterances: UtteranceMap, mp: MentorPath, jobs: int = 1
 ) -> UtteranceMap:
     """
-    Applies noise reduction to utterance videos if and only if noise samples are provided
+    Applies noise reduction to utterance videos if and only if noise samples are provided.
+    Each utterance gets the most specific noise sample for its id
+    (see noise_registry.NoiseRegistry).
+    Noise reduction is mostly numpy (i.e. python),
+    so it runs in a pool of `jobs` processes.
+
+    Each video reduced is recorded in the mentor's noise reduction ledger
+    (see mp.load_noise_reduction_ledger) with the sample used
+    and the hashes of the video before and after and of the sample's profile,
+    so a rerun skips the videos already reduced and only reduces
+    those that were sliced again since.
+    Videos sliced from a session whose noise was already reduced
+    (see sessions_to_audio) are skipped
     """
-    noise_samples = mp.find_noise_samples()
-    if not noise_samples:
+    noise_registry = mp.load_noise_registry()
+    if not len(noise_registry):
         logging.info(
             f"utterances_noise_reduction no noise samples found in {mp.get_noise_path()}"
         )
         return utterances
-
-    def noise_sample_for_utterance(u: Utterance) -> str:
-        uid = u.get_id()
-        for n in noise_samples:
-            if uid.startswith(os.path.splitext(os.path.basename(n))[0]):
-                return n
-        return ""
-
+    ledger = mp.load_noise_reduction_ledger()
     targets: List[_UtteranceReduceNoise] = []
     for u in utterances.utterances():
         utterance_video = mp.find_utterance_video(u)
         if not utterance_video:
             continue
-        noise_sample = noise_sample_for_utterance(u)
+        if mp.find_session_video_denoised(u):
+            logging.info(
+                f"utterances_noise_reduction skipping {utterance_video}, which is sliced from a denoised session"
+            )
+            continue
+        noise_sample = noise_registry.find(u.get_id())
         if not noise_sample:
             continue
         targets.append(
@@ -415,14 +905,106 @@ def utterances_noise_reduction(
                 utterance=u, noise_sample=noise_sample, utterance_video=utterance_video
             )
         )
-    for i, t in enumerate(targets):
-        logging.info(
-            f"utterances_noise_reduction [{i + 1}/{len(targets)}] noise={t.noise_sample}, target={t.utterance_video}"
+    profile_hashes = noise_profiles_update(sorted(set(t.noise_sample for t in targets)))
+    input_hashes = {
+        t.utterance_video: mentor_pipeline.noise.file_hash(t.utterance_video)
+        for t in targets
+    }
+
+    def _key(t: _UtteranceReduceNoise) -> str:
+        return mp.to_relative_path(
+            t.utterance_video, UTTERANCE_VIDEO.get_mentor_asset_root()
         )
-        mentor_pipeline.noise.reduce_noise(t.noise_sample, t.utterance_video)
+
+    targets = [
+        t
+        for t in targets
+        if t.noise_sample in profile_hashes
+        and ledger.needs_reduction(
+            _key(t),
+            input_hashes[t.utterance_video],
+            profile_hashes[t.noise_sample],
+            t.noise_sample,
+        )
+    ]
+    jobs_result = _run_and_log_jobs(
+        "utterances_noise_reduction",
+        targets,
+        partial(_reduce_noise, len(targets)),
+        lambda t: t.utterance_video,
+        jobs=jobs,
+        use_processes=True,
+    )
+    for r in jobs_result.results:
+        if r.succeeded():
+            ledger.record(
+                _key(r.job),
+                os.path.relpath(r.job.noise_sample, mp.get_mentor_data()),
+                input_hashes[r.job.utterance_video],
+                profile_hashes[r.job.noise_sample],
+                mentor_pipeline.noise.file_hash(r.job.utterance_video),
+            )
+    if jobs_result.results:
+        mp.write_noise_reduction_ledger(ledger)
     return utterances
 
 
+@dataclass
+class _SessionSlices:
+    source: str
+    slices: List[media_tools.MediaSlice] = field(default_factory=lambda: [])
+
+
+def _slices_by_session(
+    source_target_utterances: Iterable[Tuple[str, str, Utterance]]
+) -> List[_SessionSlices]:
+    result: Dict[str, _SessionSlices] = {}
+    for source, target, u in source_target_utterances:
+        if source not in result:
+            result[source] = _SessionSlices(source=source)
+        result[source].slices.append(
+            media_tools.MediaSlice(
+                target_file=target, time_start=u.timeStart, time_end=u.timeEnd
+            )
+        )
+    return list(result.values())
+
+
+def _slice_sessions(
+    logging_function_name: str,
+    sessions: List[_SessionSlices],
+    slice_session_func: Callable[[str, List[media_tools.MediaSlice]], None],
+    jobs: int = 1,
+) -> Set[str]:
+    """
+    Produces the slices for each session with one call to slice_session_func
+    (i.e. one decode of the session),
+    running up to `jobs` sessions concurrently.
+    Returns the targets of the sessions that failed
+    """
+
+    def _slice(i: int, ss: _SessionSlices) -> None:
+        try:
+            logging.info(
+                f"{logging_function_name} [{i + 1}/{len(sessions)}] source={ss.source}, slices={len(ss.slices)}"
+            )
+            slice_session_func(ss.source, ss.slices)
+        except BaseException as s_err:
+            logging.exception(f"exception processing session {ss.source}: {s_err}")
+            raise  # so the job counts as failed
+
+    return _failed_targets(
+        _run_and_log_jobs(
+            logging_function_name,
+            sessions,
+            _slice,
+            lambda ss: ss.source,
+            jobs=jobs,
+        ),
+        lambda ss: (s.target_file for s in ss.slices),
+    )
+
+
 @dataclass
 class _UtteranceToAudio:
     utterance: Utterance
@@ -430,10 +1012,21 @@ class _UtteranceToAudio:
     audio_target: str
 
 
-def utterances_slice_audio(utterances: UtteranceMap, mp: MentorPath) -> UtteranceMap:
+def utterances_slice_audio(
+    utterances: UtteranceMap,
+    mp: MentorPath,
+    jobs: int = 1,
+    slice_by_session: bool = False,
+    slice_in_memory: bool = False,
+) -> UtteranceMap:
     """
     Give sessions data and a root sessions directory,
     slices up the source audio into one file per part in the data.
+    Slicing runs in a pool of `jobs` workers (each one an ffmpeg process).
+    With slice_by_session, all the slices of a session audio file
+    are produced from a single decode of that file.
+    With slice_in_memory, each session audio file is decoded to PCM once
+    and every slice is written from that (see pcm.slice_audio_session_pcm).
 
     For illustration, the source sessions_root might contain the following:
 
@@ -454,6 +1047,8 @@ def utterances_slice_audio(utterances: UtteranceMap, mp: MentorPath) -> Utteranc
     e.g. e00000413 = (end-time) 00:00:04:13
     """
     result_utterances = copy_utterances(utterances)
+    prov = mp.load_provenance()
+    fp_by_target: Dict[str, str] = {}
     u2a_list: List[_UtteranceToAudio] = []
     for u in result_utterances.utterances():
         try:
@@ -480,8 +1075,10 @@ def utterances_slice_audio(utterances: UtteranceMap, mp: MentorPath) -> Utteranc
                 u, return_non_existing_paths=True
             )
             mp.set_utterance_audio_path(u, utterance_audio_path)
-            if os.path.isfile(utterance_audio_path):
+            fp = _slice_fingerprint(session_audio, u, UTTERANCE_AUDIO)
+            if _is_built(mp, prov, UTTERANCE_AUDIO, utterance_audio_path, fp):
                 continue
+            fp_by_target[utterance_audio_path] = fp
             u2a_list.append(
                 _UtteranceToAudio(
                     utterance=u,
@@ -491,7 +1088,22 @@ def utterances_slice_audio(utterances: UtteranceMap, mp: MentorPath) -> Utteranc
             )
         except BaseException as u_err:
             logging.exception(f"exception processing utterance: {u_err}")
-    for i, u2a in enumerate(u2a_list):
+    if slice_by_session or slice_in_memory:
+        failed = _slice_sessions(
+            "utterance_to_audio",
+            _slices_by_session(
+                (u2a.audio_source, u2a.audio_target, u2a.utterance) for u2a in u2a_list
+            ),
+            pcm.slice_audio_session_pcm
+            if slice_in_memory
+            else media_tools.slice_audio_session,
+            jobs=jobs,
+        )
+        _record_provenance(mp, prov, UTTERANCE_AUDIO, fp_by_target, failed)
+        mp.write_provenance(prov)
+        return result_utterances
+
+    def _slice(i: int, u2a: _UtteranceToAudio) -> None:
         try:
             logging.info(
                 f"utterance_to_audio [{i + 1}/{len(u2a_list)}] source={u2a.audio_source}, target={u2a.audio_target}, time-start={u2a.utterance.timeStart}, time-end={u2a.utterance.timeEnd}"
@@ -504,66 +1116,379 @@ def utterances_slice_audio(utterances: UtteranceMap, mp: MentorPath) -> Utteranc
             )
         except BaseException as u_err:
             logging.exception(f"exception processing utterance: {u_err}")
+            raise  # so the job counts as failed
+
+    failed = _failed_targets(
+        _run_and_log_jobs(
+            "utterance_to_audio",
+            u2a_list,
+            _slice,
+            lambda u2a: u2a.audio_target,
+            jobs=jobs,
+        ),
+        lambda u2a: [u2a.audio_target],
+    )
+    _record_provenance(mp, prov, UTTERANCE_AUDIO, fp_by_target, failed)
+    mp.write_provenance(prov)
     return result_utterances
 
 
+def media_probes_update(
+    utterances: UtteranceMap, mp: MentorPath, jobs: int = 1
+) -> probe.ProbeManifest:
+    """
+    Loads the mentor's media probe manifest and makes it the one
+    consulted by all media functions (see probe.find_media_probe),
+    then probes (up to `jobs` at a time) all the session and utterance videos
+    that aren't in the manifest yet and writes the manifest.
+    """
+    manifest = mp.load_media_probes()
+    probe.set_manifest(manifest)
+    media_files: List[str] = []
+    for u in utterances.utterances():
+        for f in [
+            mp.find_session_video(u),
+            mp.find_utterance_video(u),
+            mp.find_utterance_video_mobile(u),
+            mp.find_utterance_video_web(u),
+        ]:
+            if f and f not in media_files:
+                media_files.append(f)
+    jobs_result = manifest.probe_all(media_files, jobs=jobs)
+    for r in jobs_result.failed():
+        logging.error(f"media_probe: exception probing {r.job}: {r.error}")
+    _log_jobs_result("media_probe", jobs_result, str)
+    mp.write_media_probes(manifest)
+    return manifest
+
+
+def _measure_session_loudness(
+    session_files: List[str], mp: MentorPath, jobs: int = 1
+) -> Dict[str, media_tools.LoudnessMeasurement]:
+    """
+    Returns the loudness measurement for each session file
+    (measured once and then persisted with the mentor's data
+    until the session file changes).
+
+    A session that fails to measure is left out of the result.
+    """
+    slm = mp.load_session_loudness()
+    result: Dict[str, media_tools.LoudnessMeasurement] = {}
+    to_measure: List[str] = []
+    for f in session_files:
+        loudness = slm.find(
+            mp.to_relative_path(f, SESSION_VIDEO.get_mentor_asset_root()), f
+        )
+        if loudness:
+            result[f] = loudness
+        else:
+            to_measure.append(f)
+
+    def _measure(i: int, f: str) -> None:
+        try:
+            logging.info(f"session_loudness [{i + 1}/{len(to_measure)}] source={f}")
+            result[f] = media_tools.measure_loudness(f)
+        except BaseException as s_err:
+            logging.exception(f"exception measuring loudness of session {f}: {s_err}")
+            raise  # so the job counts as failed
+
+    _run_and_log_jobs("session_loudness", to_measure, _measure, str, jobs=jobs)
+    for f in to_measure:
+        if f in result:
+            slm.set(
+                mp.to_relative_path(f, SESSION_VIDEO.get_mentor_asset_root()),
+                f,
+                result[f],
+            )
+    if to_measure:
+        mp.write_session_loudness(slm)
+    return result
+
+
 @dataclass
 class _UtteranceToVideo:
     utterance: Utterance
     video_source: str
     video_target: str
+    # set only when slicing renditions (and empty for targets that are built)
+    video_mobile_target: str = ""
+    video_web_target: str = ""
+    # the utterance video (whether or not it needs to be sliced)
+    # and the fingerprint of the inputs it is sliced from
+    video_path: str = ""
+    video_fingerprint: str = ""
+
+
+def _utterance_to_video(
+    u: Utterance,
+    mp: MentorPath,
+    prov: ProvenanceManifest,
+    renditions: bool = False,
+    profile: Optional[EncodeProfile] = None,
+) -> Optional[_UtteranceToVideo]:
+    """
+    Assigns the utterance video path for an utterance
+    and returns what needs to be sliced for it
+    (None if there's nothing to slice or the utterance is invalid)
+    """
+    mp.find_and_assign_assets(u)
+    session_video = mp.find_session_video_denoised(u) or mp.find_session_video(u, mp)
+    if not session_video:
+        logging.warning(f"no video source found for utterance {u}")
+        return None
+    start = float(u.timeStart)
+    if not (start == 0.0 or (start and start >= 0.0)):
+        logging.warning(f"invalid timeStart ({u.timeStart}) for utterance {u.get_id()}")
+        return None
+    end = float(u.timeEnd)
+    if not (end and end > start):
+        logging.warning(f"invalid timeEnd ({u.timeEnd}) for utterance {u.get_id()}")
+        return None
+    utterance_video_path = mp.find_utterance_video(u, return_non_existing_paths=True)
+    mp.set_utterance_video_path(u, utterance_video_path)
+    u2v = _UtteranceToVideo(
+        utterance=u,
+        video_source=session_video,
+        video_target="",
+        video_path=utterance_video_path,
+        video_fingerprint=_slice_fingerprint(
+            session_video, u, UTTERANCE_VIDEO, profile
+        ),
+    )
+    if not _is_built(mp, prov, UTTERANCE_VIDEO, u2v.video_path, u2v.video_fingerprint):
+        u2v.video_target = u2v.video_path
+
+    def _rendition_target(asset_type: UtteranceAssetType, target: str) -> str:
+        # renditions are fingerprinted by the utterance video
+        # (the same as when prepare_videos encodes them from it),
+        # so one that was built from it is rebuilt along with it
+        key = mp.to_relative_path(target, asset_type.get_mentor_asset_root())
+        if u2v.video_target and prov.find(key) is not None:
+            prov.remove(key)
+            return target
+        if _is_built(
+            mp,
+            prov,
+            asset_type,
+            target,
+            _video_fingerprint(u2v.video_path, asset_type, profile),
+        ):
+            return ""
+        return target
+
+    if renditions:
+        u2v.video_mobile_target = _rendition_target(
+            UTTERANCE_VIDEO_MOBILE,
+            mp.find_utterance_video_mobile(u, return_non_existing_paths=True),
+        )
+        u2v.video_web_target = _rendition_target(
+            UTTERANCE_VIDEO_WEB,
+            mp.find_utterance_video_web(u, return_non_existing_paths=True),
+        )
+    if not (u2v.video_target or u2v.video_mobile_target or u2v.video_web_target):
+        return None
+    return u2v
 
 
-def utterances_slice_video(utterances: UtteranceMap, mp: MentorPath) -> UtteranceMap:
+def _record_video_provenance(
+    mp: MentorPath,
+    prov: ProvenanceManifest,
+    asset_type: UtteranceAssetType,
+    u2v_list: List[_UtteranceToVideo],
+    targets: List[str],
+    profile: Optional[EncodeProfile],
+    failed_targets: Set[str],
+) -> None:
+    _record_encode_profile(
+        mp, asset_type, (t for t in targets if t not in failed_targets), profile
+    )
+    _record_provenance(
+        mp,
+        prov,
+        asset_type,
+        {
+            t: u2v.video_fingerprint
+            if asset_type == UTTERANCE_VIDEO
+            else _video_fingerprint(u2v.video_path, asset_type, profile)
+            for u2v, t in zip(u2v_list, targets)
+            if t
+        },
+        failed_targets,
+    )
+    mp.write_provenance(prov)
+
+
+def utterances_slice_video(
+    utterances: UtteranceMap,
+    mp: MentorPath,
+    jobs: int = 1,
+    slice_by_session: bool = False,
+    smart_cut: bool = False,
+    session_loudness: bool = False,
+    renditions: bool = False,
+    profile: Optional[EncodeProfile] = None,
+) -> UtteranceMap:
+    """
+    Slices a video file for each utterance from its session video.
+
+    Slicing runs in a pool of `jobs` workers (each one an ffmpeg process).
+    Paths are assigned to the result utterances before any slicing starts,
+    so the result never depends on the order in which slices complete.
+    With slice_by_session, all the slices of a session video
+    are produced from a single decode of that video.
+    With smart_cut, each slice stream-copies the whole GOPs of its session video
+    and only re-encodes the partial GOPs at its edges
+    (takes precedence over slice_by_session).
+    With session_loudness, the audio loudness of each session video
+    is measured once and every slice is normalized to it in a single pass
+    (instead of measuring and encoding each slice in two passes).
+    With renditions, the mobile and web videos for each utterance
+    are encoded from the same decode of the session as the utterance video
+    (see media_tools.slice_video_renditions; takes precedence over
+    slice_by_session and smart_cut).
+    A session whose noise was reduced (see sessions_to_audio)
+    is sliced from its denoised session video.
+    Each video is skipped if it was built from the same inputs
+    (see _is_built) and rebuilt if any of them changed.
+    Videos are encoded with the given encode profile (if any),
+    which is recorded for each video built.
+    """
     result_utterances = copy_utterances(utterances)
+    prov = mp.load_provenance()
     u2v_list: List[_UtteranceToVideo] = []
     for u in result_utterances.utterances():
         try:
-            mp.find_and_assign_assets(u)
-            session_video = mp.find_session_video(u, mp)
-            if not session_video:
-                logging.warning(f"no video source found for utterance {u}")
-                continue
-            start = float(u.timeStart)
-            if not (start == 0.0 or (start and start >= 0.0)):
-                logging.warning(
-                    f"invalid timeStart ({u.timeStart}) for utterance {u.get_id()}"
-                )
-                continue
-            end = float(u.timeEnd)
-            if not (end and end > start):
-                logging.warning(
-                    f"invalid timeEnd ({u.timeEnd}) for utterance {u.get_id()}"
-                )
-                continue
-            utterance_video_path = mp.find_utterance_video(
-                u, return_non_existing_paths=True
-            )
-            mp.set_utterance_video_path(u, utterance_video_path)
-            if os.path.isfile(utterance_video_path):
-                continue
-            u2v_list.append(
-                _UtteranceToVideo(
-                    utterance=u,
-                    video_source=session_video,
-                    video_target=utterance_video_path,
-                )
+            u2v = _utterance_to_video(
+                u, mp, prov, renditions=renditions, profile=profile
             )
+            if u2v:
+                u2v_list.append(u2v)
         except BaseException as u_err:
             logging.exception(f"exception processing utterance: {u_err}")
-    for i, u2v in enumerate(u2v_list):
+    loudness_by_session = (
+        _measure_session_loudness(
+            sorted({u2v.video_source for u2v in u2v_list}), mp, jobs=jobs
+        )
+        if session_loudness
+        else {}
+    )
+
+    def _encode_kwargs(source: str) -> Dict[str, Any]:
+        # loudness is passed only when measured, so a session that failed
+        # to measure falls back to per-slice normalization
+        return dict(
+            **(
+                dict(loudness=loudness_by_session[source])
+                if source in loudness_by_session
+                else {}
+            ),
+            **_profile_kwargs(profile),
+        )
+
+    if renditions:
+
+        def _slice_renditions(i: int, u2v: _UtteranceToVideo) -> None:
+            try:
+                logging.info(
+                    f"utterance_to_video_renditions [{i + 1}/{len(u2v_list)}] source={u2v.video_source}, target={u2v.video_target}, target-mobile={u2v.video_mobile_target}, target-web={u2v.video_web_target}, time-start={u2v.utterance.timeStart}, time-end={u2v.utterance.timeEnd}"
+                )
+                media_tools.slice_video_renditions(
+                    u2v.video_source,
+                    u2v.utterance.timeStart,
+                    u2v.utterance.timeEnd,
+                    target_file=u2v.video_target or None,
+                    mobile_target_file=u2v.video_mobile_target or None,
+                    web_target_file=u2v.video_web_target or None,
+                    **_encode_kwargs(u2v.video_source),
+                )
+            except BaseException as u_err:
+                logging.exception(f"exception processing utterance: {u_err}")
+                raise  # so the job counts as failed
+
+        failed = _failed_targets(
+            _run_and_log_jobs(
+                "utterance_to_video_renditions",
+                u2v_list,
+                _slice_renditions,
+                lambda u2v: u2v.utterance.get_id(),
+                jobs=jobs,
+            ),
+            lambda u2v: [
+                u2v.video_target,
+                u2v.video_mobile_target,
+                u2v.video_web_target,
+            ],
+        )
+        for asset_type, targets in [
+            (UTTERANCE_VIDEO, [u2v.video_target for u2v in u2v_list]),
+            (UTTERANCE_VIDEO_MOBILE, [u2v.video_mobile_target for u2v in u2v_list]),
+            (UTTERANCE_VIDEO_WEB, [u2v.video_web_target for u2v in u2v_list]),
+        ]:
+            _record_video_provenance(
+                mp, prov, asset_type, u2v_list, targets, profile, failed
+            )
+        return result_utterances
+    if slice_by_session and not smart_cut:
+        failed = _slice_sessions(
+            "utterance_to_video",
+            _slices_by_session(
+                (u2v.video_source, u2v.video_target, u2v.utterance) for u2v in u2v_list
+            ),
+            lambda source, slices: media_tools.slice_video_session(
+                source, slices, **_encode_kwargs(source)
+            ),
+            jobs=jobs,
+        )
+        _record_video_provenance(
+            mp,
+            prov,
+            UTTERANCE_VIDEO,
+            u2v_list,
+            [u2v.video_target for u2v in u2v_list],
+            profile,
+            failed,
+        )
+        return result_utterances
+
+    slice_video = (
+        media_tools.slice_video_smart_cut if smart_cut else media_tools.slice_video
+    )
+
+    def _slice(i: int, u2v: _UtteranceToVideo) -> None:
         try:
             logging.info(
                 f"utterance_to_video [{i + 1}/{len(u2v_list)}] source={u2v.video_source}, target={u2v.video_target}, time-start={u2v.utterance.timeStart}, time-end={u2v.utterance.timeEnd}"
             )
-            media_tools.slice_video(
+            slice_video(
                 u2v.video_source,
                 u2v.video_target,
                 u2v.utterance.timeStart,
                 u2v.utterance.timeEnd,
+                **_encode_kwargs(u2v.video_source),
             )
         except BaseException as u_err:
             logging.exception(f"exception processing utterance: {u_err}")
+            raise  # so the job counts as failed
+
+    failed = _failed_targets(
+        _run_and_log_jobs(
+            "utterance_to_video",
+            u2v_list,
+            _slice,
+            lambda u2v: u2v.video_target,
+            jobs=jobs,
+        ),
+        lambda u2v: [u2v.video_target],
+    )
+    _record_video_provenance(
+        mp,
+        prov,
+        UTTERANCE_VIDEO,
+        u2v_list,
+        [u2v.video_target for u2v in u2v_list],
+        profile,
+        failed,
+    )
     return result_utterances
 
 
@@ -600,8 +1525,9 @@ def utterances_to_captions(
             vtt_content = transcript_to_vtt(u.transcript, duration)
             vtt_path = mp.find_utterance_captions(u, return_non_existing_paths=True)
             os.makedirs(os.path.dirname(vtt_path), exist_ok=True)
-            with open(vtt_path, "w") as f:
-                f.write(vtt_content)
+            with staged_files([vtt_path]) as [staged_vtt_path]:
+                with open(staged_vtt_path, "w") as f:
+                    f.write(vtt_content)
             captions_by_utterance_id[u.get_id()] = vtt_content
         except Exception as u_err:
             logging.warning(
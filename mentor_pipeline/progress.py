@@ -0,0 +1,181 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+import logging
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+
+@dataclass
+class FFmpegProgress:
+    """
+    the progress of one ffmpeg run, as reported with -progress
+    """
+
+    mediaSecs: float = 0.0  # of output written so far
+    speed: float = 0.0  # x realtime
+    outputSize: int = 0  # bytes
+    done: bool = False
+
+
+ProgressCallback = Callable[[FFmpegProgress], None]
+
+_local = threading.local()
+
+
+def _callbacks() -> List[ProgressCallback]:
+    if not hasattr(_local, "callbacks"):
+        _local.callbacks = []
+    return _local.callbacks
+
+
+@contextmanager
+def progress_callback(callback: ProgressCallback) -> Iterator[None]:
+    """
+    calls back with the progress of every ffmpeg run
+    by media functions on this thread while in the context
+    """
+    _callbacks().append(callback)
+    try:
+        yield
+    finally:
+        _callbacks().remove(callback)
+
+
+def is_reporting_progress() -> bool:
+    return bool(_callbacks())
+
+
+def _report_progress(callbacks: List[ProgressCallback], p: FFmpegProgress) -> None:
+    for cb in callbacks:
+        try:
+            cb(p)
+        except BaseException as err:
+            logging.warning(f"exception in progress callback: {err}")
+
+
+def _parse_secs(v: str) -> float:
+    try:
+        return int(v) / 1000000.0
+    except ValueError:
+        return 0.0
+
+
+def ffmpeg_progress_updates(lines: Iterable[str]) -> Iterator[FFmpegProgress]:
+    """
+    parses the key=value lines ffmpeg writes with -progress
+    into an update for each block (each one ends with a progress=... line)
+    """
+    p = FFmpegProgress()
+    for line in lines:
+        k, _, v = line.strip().partition("=")
+        v = v.strip()
+        if k in ["out_time_us", "out_time_ms"]:
+            # both are in microseconds (out_time_ms is misnamed)
+            p.mediaSecs = max(p.mediaSecs, _parse_secs(v))
+        elif k == "total_size":
+            p.outputSize = int(v) if v.isdigit() else p.outputSize
+        elif k == "speed":
+            try:
+                p.speed = float(v.rstrip("x"))
+            except ValueError:
+                pass
+        elif k == "progress":
+            p.done = v == "end"
+            yield FFmpegProgress(**asdict(p))
+
+
+def run_with_progress(
+    run: Callable[..., Any], output_files: Optional[List[str]] = None
+) -> None:
+    """
+    calls run(stdout=<pipe>) for an ffmpeg run that writes -progress to pipe:1
+    and reports each update to the progress callbacks of this thread.
+
+    The last update is always done, and (when output_files is given)
+    has the total size of the output files
+    """
+    callbacks = list(_callbacks())
+    last = FFmpegProgress()
+    r, w = os.pipe()
+
+    def _read() -> None:
+        nonlocal last
+        with os.fdopen(r, "r", errors="replace") as f:
+            for p in ffmpeg_progress_updates(f):
+                last = p
+                if not p.done:
+                    _report_progress(callbacks, p)
+
+    reader = threading.Thread(target=_read, daemon=True)
+    reader.start()
+    try:
+        run(stdout=w)
+    finally:
+        os.close(w)
+        reader.join()
+    sizes = [os.path.getsize(f) for f in output_files or [] if os.path.isfile(f)]
+    if sizes:
+        last.outputSize = sum(sizes)
+    last.done = True
+    _report_progress(callbacks, last)
+
+
+def _children_cpu_time_secs() -> float:
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+@dataclass
+class JobMetrics:
+    """
+    totals for a job over all the ffmpeg runs it makes
+    (including runs that write intermediate files, e.g. the parts of a smart cut)
+    """
+
+    mediaSecs: float = 0.0
+    outputSize: int = 0
+    wallTimeSecs: float = 0.0
+    # the cpu time of this thread and the subprocesses that finished
+    # while the job ran (which includes those of other jobs running at once)
+    cpuTimeSecs: float = 0.0
+
+    def __post_init__(self):
+        self._done = FFmpegProgress()
+        self._current = FFmpegProgress()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time() + _children_cpu_time_secs()
+
+    def speed(self) -> float:
+        """
+        media secs processed per wall sec (x realtime)
+        """
+        return self.mediaSecs / self.wallTimeSecs if self.wallTimeSecs > 0 else 0.0
+
+    def update(self, p: FFmpegProgress) -> None:
+        if p.done:
+            self._done.mediaSecs += p.mediaSecs
+            self._done.outputSize += p.outputSize
+            self._current = FFmpegProgress()
+        else:
+            self._current = p
+        self.mediaSecs = self._done.mediaSecs + self._current.mediaSecs
+        self.outputSize = self._done.outputSize + self._current.outputSize
+        self.wallTimeSecs = time.perf_counter() - self._wall_start
+
+    def finish(self) -> None:
+        self.wallTimeSecs = time.perf_counter() - self._wall_start
+        self.cpuTimeSecs = max(
+            0.0, time.thread_time() + _children_cpu_time_secs() - self._cpu_start
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
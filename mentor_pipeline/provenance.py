@@ -0,0 +1,118 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from dataclasses import dataclass, field
+from functools import lru_cache
+import hashlib
+import json
+import os
+import subprocess
+from threading import Lock
+from typing import Dict, Optional
+
+from mentor_pipeline.utils import yaml_load, yaml_write
+
+
+def file_fingerprint(p: str) -> str:
+    """
+    identifies the content of a file by its size and mtime
+    (empty if the file doesn't exist)
+    """
+    if not p or not os.path.isfile(p):
+        return ""
+    st = os.stat(p)
+    return f"{st.st_size}:{st.st_mtime}"
+
+
+@lru_cache(maxsize=None)
+def tool_versions() -> Dict[str, str]:
+    """
+    versions of the external tools that build assets
+    (a tool that can't be found has an empty version)
+    """
+    result = {}
+    for tool in ["ffmpeg"]:
+        try:
+            out = subprocess.run(
+                [tool, "-version"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                check=True,
+            ).stdout.decode("utf-8", errors="replace")
+            result[tool] = out.splitlines()[0] if out else ""
+        except (OSError, subprocess.CalledProcessError):
+            result[tool] = ""
+    return result
+
+
+def fingerprint(**inputs) -> str:
+    """
+    hash of everything an asset is built from
+    (source fingerprints, time ranges, encode params...)
+    along with the versions of the tools that build it
+    """
+    return hashlib.sha256(
+        json.dumps(
+            dict(inputs=inputs, tools=tool_versions()), sort_keys=True, default=str
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+@dataclass
+class ProvenanceManifest:
+    """
+    the fingerprint of the inputs each derived asset was built from,
+    by asset path (relative to the mentor's data or videos).
+    Safe to use from many threads.
+    """
+
+    fingerprintsByAsset: Dict[str, str] = field(default_factory=lambda: {})
+
+    def __post_init__(self):
+        self.fingerprintsByAsset = dict(self.fingerprintsByAsset or {})
+        self._lock = Lock()
+
+    def find(self, asset_key: str) -> Optional[str]:
+        with self._lock:
+            return self.fingerprintsByAsset.get(asset_key)
+
+    def is_up_to_date(self, asset_key: str, asset_file: str, fp: str) -> bool:
+        """
+        true if the asset exists and was built from inputs with the given fingerprint.
+
+        An asset that exists but has no recorded fingerprint
+        (i.e. it was built before we kept provenance or was put there by hand)
+        is taken to be up to date and gets the fingerprint recorded,
+        so it is rebuilt only once its inputs change from here on
+        """
+        if not os.path.isfile(asset_file):
+            return False
+        with self._lock:
+            recorded = self.fingerprintsByAsset.get(asset_key)
+            if recorded is None:
+                self.fingerprintsByAsset[asset_key] = fp
+                return True
+            return recorded == fp
+
+    def set(self, asset_key: str, fp: str) -> None:
+        with self._lock:
+            self.fingerprintsByAsset[asset_key] = fp
+
+    def remove(self, asset_key: str) -> None:
+        with self._lock:
+            self.fingerprintsByAsset.pop(asset_key, None)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return dict(fingerprintsByAsset=dict(self.fingerprintsByAsset))
+
+
+def provenance_manifest_from_yaml(yml: str) -> ProvenanceManifest:
+    return ProvenanceManifest(**(yaml_load(yml) or {}))
+
+
+def provenance_manifest_to_yaml(pm: ProvenanceManifest, tgt_path: str) -> None:
+    yaml_write(pm.to_dict(), tgt_path)
@@ -10,7 +10,10 @@ from typing import List
 import transcribe
 
 from mentor_pipeline.mentorpath import MentorPath
+from mentor_pipeline.pcm import PcmCache, set_pcm_cache
 from mentor_pipeline.process import (
+    media_probes_update,
+    prepare_videos_hls,
     prepare_videos_mobile,
     prepare_videos_web,
     sessions_to_audio,
@@ -35,18 +38,52 @@ class Pipeline:
         )
         logging.getLogger().setLevel(logging.INFO)
 
-    def data_update(self, force_update_transcripts: bool = False):
+    def _use_pcm_cache(self, pcm_cache_mb: int) -> None:
+        """
+        with a budget (in MB), decoded session audio is cached in build/pcm
+        for all the stages that read it (see pcm.PcmCache)
+        """
+        set_pcm_cache(
+            PcmCache(self.mpath.get_pcm_cache_path(), pcm_cache_mb * 1024 * 1024)
+            if pcm_cache_mb > 0
+            else None
+        )
+
+    def data_update(
+        self,
+        force_update_transcripts: bool = False,
+        jobs: int = 1,
+        slice_by_session: bool = False,
+        session_audio_format: str = "mp3",
+        slice_audio_in_memory: bool = False,
+        session_noise_reduction: bool = False,
+        pcm_cache_mb: int = 0,
+        transcript_cache: bool = False,
+    ):
+        self.mpath.remove_stale_staged_files()
+        self._use_pcm_cache(pcm_cache_mb)
         transcription_service = transcribe.init_transcription_service()
         utterances_synced = sync_timestamps(self.mpath)
-        s2a_result = sessions_to_audio(utterances_synced, self.mpath)
+        s2a_result = sessions_to_audio(
+            utterances_synced,
+            self.mpath,
+            jobs=jobs,
+            audio_format=session_audio_format,
+            reduce_noise=session_noise_reduction,
+        )
         utterances_w_audio_src = utterances_slice_audio(
-            s2a_result.utterances, self.mpath
+            s2a_result.utterances,
+            self.mpath,
+            jobs=jobs,
+            slice_by_session=slice_by_session,
+            slice_in_memory=slice_audio_in_memory,
         )
         utterances_w_transcripts = update_transcripts(
             utterances_w_audio_src,
             transcription_service,
             self.mpath,
             force_update=force_update_transcripts,
+            transcript_cache=transcript_cache,
         )
         utterances_w_paraphrases = update_paraphrases(
             utterances_w_transcripts,
@@ -81,28 +118,59 @@ class Pipeline:
         self.mpath.write_topics_by_question(tbq)
         return tbq
 
-    def videos_reduce_noise(self):
+    def videos_reduce_noise(self, pcm_cache_mb: int = 0, jobs: int = 1):
         utterances = self.mpath.load_utterances(create_new=False)
         if not utterances:
             logging.error(
                 "unable to run video reduce noise with no utterances. Try data_update first."
             )
             return
-        utterances_noise_reduction(utterances, self.mpath)
+        self.mpath.remove_stale_staged_files()
+        self._use_pcm_cache(pcm_cache_mb)
+        utterances_noise_reduction(utterances, self.mpath, jobs=jobs)
 
-    def videos_update(self):
+    def videos_update(
+        self,
+        jobs: int = 1,
+        slice_by_session: bool = False,
+        smart_cut: bool = False,
+        session_loudness: bool = False,
+        renditions: bool = False,
+        encode_profile: str = "",
+        hls: bool = False,
+    ):
         utterances_init = self.mpath.load_utterances(create_new=False)
         if not utterances_init:
             logging.error(
                 "unable to run video update with no utterances. Try data_update first."
             )
             return
-        utterances_w_video = utterances_slice_video(utterances_init, self.mpath)
+        self.mpath.remove_stale_staged_files()
+        profile = self.mpath.load_encode_profiles().find(encode_profile)
+        media_probes = media_probes_update(utterances_init, self.mpath, jobs=jobs)
+        utterances_w_video = utterances_slice_video(
+            utterances_init,
+            self.mpath,
+            jobs=jobs,
+            slice_by_session=slice_by_session,
+            smart_cut=smart_cut,
+            session_loudness=session_loudness,
+            renditions=renditions,
+            profile=profile,
+        )
         self.mpath.write_utterances(utterances_w_video)
+        # with renditions, these only encode what slicing couldn't
+        # (e.g. utterances with a video but no session video)
         utterances_w_video_mobile = prepare_videos_mobile(
-            utterances_w_video, self.mpath
+            utterances_w_video, self.mpath, jobs=jobs, profile=profile
         )
         utterances_w_video_web = prepare_videos_web(
-            utterances_w_video_mobile, self.mpath
+            utterances_w_video_mobile, self.mpath, jobs=jobs, profile=profile
         )
         self.mpath.write_utterances(utterances_w_video_web)
+        if hls:
+            prepare_videos_hls(
+                utterances_w_video_web, self.mpath, jobs=jobs, profile=profile
+            )
+        # the encoders add any new videos they probe to the manifest
+        self.mpath.write_media_probes(media_probes)
@@ -0,0 +1,72 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+from typing import Dict, Optional
+
+from mentor_pipeline.pcm import find_pcm
+from mentor_pipeline.utils import yaml_load, yaml_write
+
+
+def audio_hash(audio_file: str) -> str:
+    """
+    hash of the decoded audio of a file (see pcm.find_pcm),
+    so it's the same for the same audio whatever the name of the file
+    or the utterance it's for
+    """
+    pcm_audio = find_pcm(audio_file)
+    h = hashlib.sha256(f"{pcm_audio.rate}:".encode("utf-8"))
+    h.update(pcm_audio.samples.tobytes())
+    return h.hexdigest()
+
+
+def transcript_cache_key(audio_file: str, settings: dict) -> str:
+    """
+    the key for the transcript of the audio of a file
+    transcribed with the given settings (e.g. the transcription service)
+    """
+    return hashlib.sha256(
+        json.dumps(
+            dict(audio=audio_hash(audio_file), settings=settings), sort_keys=True
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+@dataclass
+class TranscriptCache:
+    """
+    The transcripts of a mentor's utterance audio by transcript_cache_key,
+    so audio that was transcribed before (with the same settings)
+    is never sent to the transcription service again,
+    even once its utterance gets a new id or transcripts are force updated.
+
+    The transcripts are as the service returned them
+    (i.e. with any non-verbal tokens)
+    """
+
+    transcriptsByKey: Dict[str, str] = field(default_factory=lambda: {})
+
+    def __post_init__(self):
+        self.transcriptsByKey = dict(self.transcriptsByKey or {})
+
+    def find(self, key: str) -> Optional[str]:
+        return self.transcriptsByKey.get(key)
+
+    def set(self, key: str, transcript: str) -> None:
+        self.transcriptsByKey[key] = transcript
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def transcript_cache_from_yaml(yml: str) -> TranscriptCache:
+    return TranscriptCache(**(yaml_load(yml) or {}))
+
+
+def transcript_cache_to_yaml(tc: TranscriptCache, tgt_path: str) -> None:
+    yaml_write(tc.to_dict(), tgt_path)
@@ -0,0 +1,72 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from dataclasses import asdict, dataclass
+import json
+import logging
+import os
+from typing import Iterable, List
+
+from mentor_pipeline.utterances import UtteranceMap
+
+
+@dataclass
+class TranscriptJournalEntry:
+    """
+    a transcript set on an utterance (see UtteranceMap.set_transcript)
+    """
+
+    utteranceId: str
+    transcript: str
+    utteranceAudio: str
+
+
+def transcript_journal_append(
+    entries: Iterable[TranscriptJournalEntry], journal_path: str
+) -> None:
+    """
+    appends entries to a journal of transcripts (one json object per line)
+    and syncs it to disk, so the entries survive a crash
+    """
+    os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+    with open(journal_path, "a") as f:
+        for e in entries:
+            f.write(json.dumps(asdict(e)) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def transcript_journal_read(journal_path: str) -> List[TranscriptJournalEntry]:
+    """
+    the entries of a journal of transcripts in the order they were appended
+    (leaving out a last line that a crash cut short)
+    """
+    if not os.path.isfile(journal_path):
+        return []
+    result: List[TranscriptJournalEntry] = []
+    with open(journal_path) as f:
+        for i, line in enumerate(f):
+            try:
+                result.append(TranscriptJournalEntry(**json.loads(line)))
+            except (TypeError, ValueError):
+                logging.warning(f"skipping incomplete entry {i + 1} of {journal_path}")
+    return result
+
+
+def apply_transcript_journal(
+    utterances: UtteranceMap, entries: Iterable[TranscriptJournalEntry]
+) -> UtteranceMap:
+    """
+    sets the transcripts from journal entries on the utterances (in place),
+    later entries for an utterance winning
+    and leaving out entries for utterances that no longer exist
+    """
+    for e in entries:
+        if utterances.find_by_id(e.utteranceId):
+            utterances.set_transcript(
+                e.utteranceId, transcript=e.transcript, source_audio=e.utteranceAudio
+            )
+    return utterances
@@ -4,7 +4,11 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
+from contextlib import contextmanager
+import logging
 import os
+import shutil
+from typing import Iterator, List
 import yaml
 
 try:
@@ -51,14 +55,82 @@ def load_timestamp_data(filename, convert_timestamps_to_seconds=True):
     return text_type, questions, start_times, end_times
 
 
+_STAGED_FILE_INFIX = ".partial"
+
+
+def staged_file_path(p: str) -> str:
+    """
+    the temp path an output is written to before it's renamed to p:
+    a hidden file in the same dir that keeps the ext of p
+    (so tools like ffmpeg still infer the format from it),
+    e.g. utterance_video/u1.mp4 => utterance_video/.u1.partial.mp4
+    """
+    d, name = os.path.split(p)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(d, f".{stem}{_STAGED_FILE_INFIX}{ext}")
+
+
+def is_staged_file_path(p: str) -> bool:
+    name = os.path.basename(p)
+    return name.startswith(".") and _STAGED_FILE_INFIX in name
+
+
+@contextmanager
+def staged_files(targets: List[str]) -> Iterator[List[str]]:
+    """
+    yields the staged (temp) path for each target.
+    Once the body completes, each staged file that was written is renamed
+    to its target, so a target only ever exists once it's complete.
+    If the body raises, the staged files are removed instead.
+    """
+    staged = [staged_file_path(t) for t in targets]
+    try:
+        yield staged
+    except BaseException:
+        for s in staged:
+            if os.path.isfile(s):
+                os.remove(s)
+        raise
+    for s, t in zip(staged, targets):
+        if os.path.isfile(s):
+            os.replace(s, t)
+
+
+def remove_stale_staged_files(root: str) -> List[str]:
+    """
+    removes all the staged files (and dirs) under root
+    (left behind by a run that was killed before its outputs completed)
+    and returns their paths
+    """
+    result: List[str] = []
+    if not os.path.isdir(root):
+        return result
+    for d, dirs, files in os.walk(root):
+        for f in files:
+            if is_staged_file_path(f):
+                p = os.path.join(d, f)
+                os.remove(p)
+                result.append(p)
+        # e.g. the dir of temp parts for a smart cut
+        for sd in [sd for sd in dirs if is_staged_file_path(sd)]:
+            p = os.path.join(d, sd)
+            shutil.rmtree(p, ignore_errors=True)
+            dirs.remove(sd)
+            result.append(p)
+    for p in result:
+        logging.warning(f"removed incomplete output {p}")
+    return result
+
+
 def yaml_write(to_write: dict, write_path: str) -> None:
     """
     Writes a dictionary to a given path in yaml format.
     Mainly broken out as a utility for convenience of mocking in tests.
     """
     os.makedirs(os.path.dirname(write_path), exist_ok=True)
-    with open(write_path, "w") as f:
-        yaml.dump(to_write, f)
+    with staged_files([write_path]) as [staged_path]:
+        with open(staged_path, "w") as f:
+            yaml.dump(to_write, f)
 
 
 def yaml_load(from_path: str) -> dict:
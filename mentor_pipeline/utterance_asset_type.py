@@ -149,6 +149,14 @@ UTTERANCE_VIDEO_WEB = UtteranceAssetType(
     infer_path_from_utterance=lambda u: os.path.join("web", f"{u.get_id()}.mp4"),
 )
 
+UTTERANCE_VIDEO_HLS = UtteranceAssetType(
+    "utteranceVideoHls",
+    MentorAssetRoot.VIDEOS,
+    "",
+    "m3u8",
+    infer_path_from_utterance=lambda u: os.path.join("hls", u.get_id(), "master.m3u8"),
+)
+
 UTTERANCE_CAPTIONS = UtteranceAssetType(
     "utteranceCaptions",
     MentorAssetRoot.DATA,
@@ -86,6 +86,12 @@ class Utterance:
     def get_id(self) -> str:
         return _utterance_id(self.session, self.part, self.timeStart, self.timeEnd)
 
+    def get_session_part_id(self) -> str:
+        """
+        the id of the utterance's session part (the prefix of its id), e.g. s001p001
+        """
+        return f"s{self.session:03}p{self.part:03}"
+
     def is_no_transcription_type(self) -> bool:
         return bool(self.utteranceType == UtteranceType.IDLE)
 
@@ -12,6 +12,30 @@ def _get_mentors_data_root(data: os.PathLike) -> str:
     return data or os.path.join(os.path.curdir, "data", "mentors")
 
 
+_jobs_option = click.option(
+    "-j",
+    "--jobs",
+    default=1,
+    envvar="MENTOR_PIPELINE_JOBS",
+    type=click.IntRange(min=1),
+    help="number of jobs (ffmpeg runs or worker processes) to run concurrently (env: MENTOR_PIPELINE_JOBS)",
+)
+_slice_by_session_option = click.option(
+    "--slice-by-session",
+    default=False,
+    is_flag=True,
+    help="produce all slices of a session from a single decode of the session",
+)
+
+_pcm_cache_option = click.option(
+    "--pcm-cache-mb",
+    default=0,
+    envvar="MENTOR_PIPELINE_PCM_CACHE_MB",
+    type=click.IntRange(min=0),
+    help="disk budget in MB for decoded audio cached in build/pcm, 0 for no cache (env: MENTOR_PIPELINE_PCM_CACHE_MB)",
+)
+
+
 @click.group()
 def cli():
     pass
@@ -19,23 +43,86 @@ def cli():
 
 @cli.command()
 @click.option("--force-update-transcripts", default=False, is_flag=True)
+@_jobs_option
+@_slice_by_session_option
+@click.option(
+    "--session-audio-format",
+    default="mp3",
+    type=click.Choice(["mp3", "m4a", "flac", "wav"]),
+    help="format of the audio extracted from session videos: m4a copies the aac audio, flac and wav are 16kHz mono",
+)
+@click.option(
+    "--slice-audio-in-memory",
+    default=False,
+    is_flag=True,
+    help="decode each session audio once to PCM and write utterance audio from memory",
+)
+@click.option(
+    "--session-noise-reduction",
+    default=False,
+    is_flag=True,
+    help="reduce noise once per session (with its sample in build/noise) before any slicing, so utterance audio and videos get the cleaned audio",
+)
+@_pcm_cache_option
+@click.option(
+    "--transcript-cache",
+    default=False,
+    is_flag=True,
+    help="keep transcripts by a hash of the utterance audio in .mentor/transcript_cache.yaml and never send audio that's in there to be transcribed again",
+)
 @click.option("-m", "--mentor", required=True, type=str)
 @click.option("-d", "--data", required=False, type=click.Path(exists=True))
-def data_update(force_update_transcripts, mentor, data):
+def data_update(
+    force_update_transcripts,
+    jobs,
+    slice_by_session,
+    session_audio_format,
+    slice_audio_in_memory,
+    session_noise_reduction,
+    pcm_cache_mb,
+    transcript_cache,
+    mentor,
+    data,
+):
     p = Pipeline(mentor, _get_mentors_data_root(data))
-    p.data_update(force_update_transcripts=bool(force_update_transcripts))
+    p.data_update(
+        force_update_transcripts=bool(force_update_transcripts),
+        jobs=jobs,
+        slice_by_session=bool(slice_by_session),
+        session_audio_format=session_audio_format,
+        slice_audio_in_memory=bool(slice_audio_in_memory),
+        session_noise_reduction=bool(session_noise_reduction),
+        pcm_cache_mb=pcm_cache_mb,
+        transcript_cache=bool(transcript_cache),
+    )
 
 
 @cli.command()
 @click.option(
     "-n", "--noise", "noise_sample", required=True, type=click.Path(exists=True)
 )
+@_jobs_option
+@click.option(
+    "--stream",
+    is_flag=True,
+    default=False,
+    help="reduce noise in blocks, so memory use doesn't grow with the length of a file",
+)
+@click.option(
+    "--ledger",
+    "ledger_file",
+    default="",
+    type=click.Path(),
+    help="yaml file that records each file reduced, so files already reduced are skipped",
+)
 @click.argument("files", required=True, nargs=-1, type=click.Path())
-def reduce_noise(noise_sample, files):
+def reduce_noise(noise_sample, jobs, stream, ledger_file, files):
     all_files = []
     for f in [files] if isinstance(files, str) else files:
         all_files.extend([x for x in glob.glob(f)])
-    noise.reduce_noise(noise_sample, all_files)
+    noise.reduce_noise(
+        noise_sample, all_files, jobs=jobs, stream=stream, ledger_file=ledger_file
+    )
 
 
 @cli.command()
@@ -47,19 +134,72 @@ def topics_by_question_generate(mentor, data):
 
 
 @cli.command()
+@_jobs_option
+@_pcm_cache_option
 @click.option("-m", "--mentor", required=True, type=str)
 @click.option("-d", "--data", required=False, type=click.Path(exists=True))
-def videos_reduce_noise(mentor, data):
+def videos_reduce_noise(jobs, pcm_cache_mb, mentor, data):
     p = Pipeline(mentor, _get_mentors_data_root(data))
-    p.videos_reduce_noise()
+    p.videos_reduce_noise(pcm_cache_mb=pcm_cache_mb, jobs=jobs)
 
 
 @cli.command()
+@_jobs_option
+@_slice_by_session_option
+@click.option(
+    "--smart-cut",
+    default=False,
+    is_flag=True,
+    help="re-encode only the partial GOPs at the edges of each slice",
+)
+@click.option(
+    "--session-loudness",
+    default=False,
+    is_flag=True,
+    help="measure loudness once per session and normalize every slice to it",
+)
+@click.option(
+    "--renditions",
+    default=False,
+    is_flag=True,
+    help="encode each slice and its mobile and web videos from one decode",
+)
+@click.option(
+    "-p",
+    "--encode-profile",
+    default="",
+    envvar="MENTOR_PIPELINE_ENCODE_PROFILE",
+    help="name of the encode profile for videos, e.g. preview or release (env: MENTOR_PIPELINE_ENCODE_PROFILE)",
+)
+@click.option(
+    "--hls",
+    default=False,
+    is_flag=True,
+    help="also package each utterance video as an HLS bitrate ladder (in hls/)",
+)
 @click.option("-m", "--mentor", required=True, type=str)
 @click.option("-d", "--data", required=False, type=click.Path(exists=True))
-def videos_update(mentor, data):
+def videos_update(
+    jobs,
+    slice_by_session,
+    smart_cut,
+    session_loudness,
+    renditions,
+    encode_profile,
+    hls,
+    mentor,
+    data,
+):
     p = Pipeline(mentor, _get_mentors_data_root(data))
-    p.videos_update()
+    p.videos_update(
+        jobs=jobs,
+        slice_by_session=bool(slice_by_session),
+        smart_cut=bool(smart_cut),
+        session_loudness=bool(session_loudness),
+        renditions=bool(renditions),
+        encode_profile=encode_profile,
+        hls=bool(hls),
+    )
 
 
 if __name__ == "__main__":
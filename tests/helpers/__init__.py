@@ -8,6 +8,7 @@ from .bunch import Bunch  # noqa: F401
 from .mock_audio_slicer import MockAudioSlicer  # noqa: F401
 from .mock_media_converter import MockMediaConverter  # noqa: F401
 from .mock_noise_reducer import MockNoiseReducer  # noqa: F401
+from .mock_session_slicer import MockSessionSlicer  # noqa: F401
 from .mock_transcriptions import MockTranscriptions  # noqa: F401
 from .mock_video_slicer import MockVideoSlicer  # noqa: F401
 from .mock_video_to_audio_converter import MockVideoToAudioConverter  # noqa: F401
@@ -51,6 +51,7 @@ class MockAudioSlicer:
         mpath: MentorPath,
         expected_calls_yaml="expected-slice-audio-calls.yaml",
         fail_on_no_calls=False,
+        any_order=False,
     ) -> None:
         expected_calls_yaml_path = mpath.get_mentor_data(expected_calls_yaml)
         if fail_on_no_calls:
@@ -77,6 +78,6 @@ class MockAudioSlicer:
             assert (
                 len(expected_calls) > 0
             ), f"expected mock-slice-audio calls at path {expected_calls_yaml_path}"
-        self.mock_slice_audio.assert_has_calls(expected_calls)
+        self.mock_slice_audio.assert_has_calls(expected_calls, any_order=any_order)
         if self.mock_logging_info:
             self.mock_logging_info.assert_has_calls(expected_calls_logging_info)
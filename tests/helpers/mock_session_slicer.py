@@ -0,0 +1,69 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+from typing import Dict, List
+from unittest.mock import call, Mock
+
+from mentor_pipeline.media_tools import MediaSlice
+from mentor_pipeline.mentorpath import MentorPath
+from mentor_pipeline.utterance_asset_type import MentorAssetRoot
+from mentor_pipeline.utils import yaml_load
+
+
+class MockSessionSlicer:
+    """
+    Mocks `media_tools.slice_audio_session` or `media_tools.slice_video_session`
+    to create dummy versions of the files that would be output by the real function.
+
+    Expected calls are read from the same yaml files used by
+    MockAudioSlicer and MockVideoSlicer, grouped by source.
+    """
+
+    def _on_slice_session_create_dummy_output(
+        self, src_file: str, slices: List[MediaSlice]
+    ) -> None:
+        for s in slices:
+            os.makedirs(os.path.dirname(s.target_file), exist_ok=True)
+            with open(s.target_file, "w") as f:
+                f.write(
+                    f"ffmpy.FFmpeg(inputs={{{src_file}: None}} outputs={{{s.target_file}: some command}} --ss {s.time_start} --to {s.time_end}"
+                )
+
+    def __init__(self, mock_slice_session: Mock, create_dummy_output_files=True):
+        self.mock_slice_session = mock_slice_session
+        if create_dummy_output_files:
+            mock_slice_session.side_effect = self._on_slice_session_create_dummy_output
+
+    def assert_has_calls(
+        self,
+        mpath: MentorPath,
+        target_asset_root: MentorAssetRoot,
+        expected_calls_yaml: str,
+        any_order=False,
+    ) -> None:
+        expected_calls_yaml_path = mpath.get_mentor_data(expected_calls_yaml)
+        assert os.path.isfile(
+            expected_calls_yaml_path
+        ), f"expected slice calls at path {expected_calls_yaml_path}"
+        slices_by_source: Dict[str, List[MediaSlice]] = {}
+        for call_data in yaml_load(expected_calls_yaml_path):
+            source = mpath.get_mentor_data(call_data.get("source"))
+            slices_by_source.setdefault(source, []).append(
+                MediaSlice(
+                    target_file=mpath.get_mentor_asset(
+                        target_asset_root, call_data.get("target")
+                    ),
+                    time_start=call_data.get("time_start_secs"),
+                    time_end=call_data.get("time_end_secs"),
+                )
+            )
+        expected_calls = [
+            call(source, slices) for source, slices in slices_by_source.items()
+        ]
+        assert len(expected_calls) > 0
+        self.mock_slice_session.assert_has_calls(expected_calls, any_order=any_order)
+        assert self.mock_slice_session.call_count == len(expected_calls)
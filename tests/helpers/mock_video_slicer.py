@@ -43,6 +43,7 @@ class MockVideoSlicer:
         mpath: MentorPath,
         expected_calls_yaml="expected-slice-video-calls.yaml",
         fail_on_no_calls=False,
+        any_order=False,
     ) -> None:
         expected_calls_yaml_path = mpath.get_mentor_data(expected_calls_yaml)
         if fail_on_no_calls:
@@ -69,6 +70,6 @@ class MockVideoSlicer:
             assert (
                 len(expected_calls) > 0
             ), f"expected mock-slice-video calls at path {expected_calls_yaml_path}"
-        self.mock_slice_video.assert_has_calls(expected_calls)
+        self.mock_slice_video.assert_has_calls(expected_calls, any_order=any_order)
         if self.mock_logging_info:
             self.mock_logging_info.assert_has_calls(expected_calls_logging_info)
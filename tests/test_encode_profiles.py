@@ -0,0 +1,82 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+
+import pytest
+
+from mentor_pipeline.encode_profiles import (
+    DEFAULT_ENCODE_PROFILE,
+    EncodeProfile,
+    load_encode_profile_registry,
+)
+from mentor_pipeline.utils import yaml_write
+
+
+def test_default_profile_encodes_with_the_settings_we_have_always_used():
+    assert DEFAULT_ENCODE_PROFILE.video_output_command() == [
+        "-c:v",
+        "libx264",
+        "-crf",
+        "23",
+    ]
+    assert DEFAULT_ENCODE_PROFILE.audio_output_command() == ["-c:a", "aac"]
+
+
+@pytest.mark.parametrize(
+    "profile,expected_command",
+    [
+        (
+            EncodeProfile(preset="veryfast", crf=28, threads=2),
+            ["-c:v", "libx264", "-preset", "veryfast", "-crf", "28", "-threads", "2"],
+        ),
+        (
+            EncodeProfile(videoCodec="libx265", videoBitrate="2M"),
+            ["-c:v", "libx265", "-b:v", "2M"],
+        ),
+    ],
+)
+def test_profile_video_output_command(profile: EncodeProfile, expected_command):
+    assert profile.video_output_command() == expected_command
+
+
+def test_it_loads_profiles_from_global_and_then_mentor_config(tmpdir):
+    global_config = os.path.join(tmpdir, "data", "encode_profiles.yaml")
+    mentor_config = os.path.join(
+        tmpdir, "data", "mentors", "m1", "encode_profiles.yaml"
+    )
+    yaml_write(
+        dict(
+            default="preview",
+            profiles=dict(
+                preview=dict(threads=2),
+                archive=dict(extends="release", crf=16, webMaxHeight=1080),
+            ),
+        ),
+        global_config,
+    )
+    yaml_write(dict(profiles=dict(archive=dict(crf=18))), mentor_config)
+    registry = load_encode_profile_registry(
+        [global_config, mentor_config, os.path.join(tmpdir, "not_there.yaml")]
+    )
+    assert registry.find() == EncodeProfile(
+        name="preview", preset="veryfast", crf=28, threads=2
+    )
+    # mentor config overrides props of the global definition of a profile
+    assert registry.find("archive") == EncodeProfile(
+        name="archive", preset="slow", crf=18, webMaxHeight=1080
+    )
+    assert registry.find("release") == EncodeProfile(
+        name="release", preset="slow", crf=20
+    )
+    with pytest.raises(KeyError):
+        registry.find("no-such-profile")
+
+
+def test_it_has_no_profile_unless_one_is_configured_or_requested():
+    registry = load_encode_profile_registry([])
+    assert registry.find() is None
+    assert registry.find("preview").preset == "veryfast"
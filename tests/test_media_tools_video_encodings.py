@@ -9,7 +9,13 @@ from unittest.mock import Mock, patch
 
 from callee.operators import Contains
 
-from mentor_pipeline.media_tools import video_encode_for_mobile, video_encode_for_web
+from mentor_pipeline.media_tools import (
+    slice_video_renditions,
+    video_encode_for_hls,
+    video_encode_for_mobile,
+    video_encode_for_web,
+)
+from mentor_pipeline.utils import staged_file_path
 
 from .helpers import Bunch
 
@@ -48,8 +54,10 @@ def test_video_encode_for_mobile_outputs_480x480_video(
     mockFFmpegInst = Mock()
     mock_ffmpeg_cls.return_value = mockFFmpegInst
     video_encode_for_mobile(input, output)
+    # ffmpeg writes a staged file that's renamed to the output once complete
     mock_ffmpeg_cls.assert_called_once_with(
-        inputs={input: None}, outputs={output: Contains(f"crop={expected_filter}")}
+        inputs={input: None},
+        outputs={staged_file_path(output): Contains(f"crop={expected_filter}")},
     )
     mockFFmpegInst.run.assert_called_once()
 
@@ -89,7 +97,99 @@ def test_video_encode_for_web_outputs_16x9_video_max_720p(
     mockFFmpegInst = Mock()
     mock_ffmpeg_cls.return_value = mockFFmpegInst
     video_encode_for_web(input, output)
+    # ffmpeg writes a staged file that's renamed to the output once complete
     mock_ffmpeg_cls.assert_called_once_with(
-        inputs={input: None}, outputs={output: Contains(f"crop={expected_filter}")}
+        inputs={input: None},
+        outputs={staged_file_path(output): Contains(f"crop={expected_filter}")},
     )
     mockFFmpegInst.run.assert_called_once()
+
+
+@patch("os.makedirs")
+@patch("pymediainfo.MediaInfo.parse")
+@patch("ffmpy.FFmpeg")
+def test_slice_video_renditions_encodes_only_missing_targets_from_one_decode(
+    mock_ffmpeg_cls, mock_media_info_parse, mock_makedirs
+):
+    mock_media_info_parse.return_value = Bunch(
+        tracks=[Bunch(track_type="Video", width=1280, height=720)]
+    )
+    slice_video_renditions(
+        "session1.mp4",
+        2.5,
+        10.0,
+        target_file=None,
+        mobile_target_file="mobile/u1.mp4",
+        web_target_file="web/u1.mp4",
+    )
+    mock_ffmpeg_cls.assert_called_once()
+    kwargs = mock_ffmpeg_cls.call_args.kwargs
+    assert kwargs["inputs"] == {"session1.mp4": ("-ss", "2.5", "-to", "10.0")}
+    assert list(kwargs["outputs"].keys()) == [
+        staged_file_path("mobile/u1.mp4"),
+        staged_file_path("web/u1.mp4"),
+    ]
+    filter_graph = kwargs["global_options"][
+        kwargs["global_options"].index("-filter_complex") + 1
+    ]
+    assert "[0:v]split=2[vs0][vs1]" in filter_graph
+    assert "[vs0]crop=iw-740:ih-180,scale=480:480[v0]" in filter_graph
+    assert "[vs1]crop=iw-0:ih-0,scale=1280:720[v1]" in filter_graph
+    assert "loudnorm=I=-23:LRA=7:TP=-2" in filter_graph
+    assert kwargs["outputs"][staged_file_path("web/u1.mp4")][:4] == (
+        "-map",
+        "[v1]",
+        "-map",
+        "[a1]",
+    )
+    mock_ffmpeg_cls.return_value.run.assert_called_once()
+
+
+@patch("os.makedirs")
+@patch("pymediainfo.MediaInfo.parse")
+@patch("ffmpy.FFmpeg")
+@pytest.mark.parametrize(
+    "input_video_dims,expected_heights",
+    [
+        ((1920, 1080), [240, 360, 720]),
+        ((1280, 720), [240, 360, 720]),
+        ((640, 360), [240, 360]),
+        ((320, 180), [240]),
+    ],
+)
+def test_video_encode_for_hls_encodes_a_ladder_without_upscaling(
+    mock_ffmpeg_cls,
+    mock_media_info_parse,
+    mock_makedirs,
+    input_video_dims,
+    expected_heights,
+):
+    mock_media_info_parse.return_value = Bunch(
+        tracks=[
+            Bunch(
+                track_type="Video",
+                width=input_video_dims[0],
+                height=input_video_dims[1],
+            )
+        ]
+    )
+    video_encode_for_hls("utterance1.mp4", "hls/u1/master.m3u8")
+    mock_ffmpeg_cls.assert_called_once()
+    kwargs = mock_ffmpeg_cls.call_args.kwargs
+    assert kwargs["inputs"] == {"utterance1.mp4": None}
+    filter_graph = kwargs["global_options"][
+        kwargs["global_options"].index("-filter_complex") + 1
+    ]
+    n = len(expected_heights)
+    assert filter_graph.startswith(
+        f"[0:v]split={n}" + "".join(f"[vs{i}]" for i in range(n))
+    )
+    output_command = kwargs["outputs"]["hls/u1/%v/index.m3u8"]
+    assert output_command[output_command.index("-master_pl_name") + 1] == (
+        ".master.partial.m3u8"
+    )
+    assert output_command[output_command.index("-var_stream_map") + 1] == " ".join(
+        f"v:{i},a:{i},name:{h}p" for i, h in enumerate(expected_heights)
+    )
+    assert output_command[output_command.index("-hls_segment_type") + 1] == "fmp4"
+    mock_ffmpeg_cls.return_value.run.assert_called_once()
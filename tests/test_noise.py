@@ -0,0 +1,211 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+import shutil
+from unittest.mock import patch
+
+import ffmpy
+import numpy as np
+import pytest
+import soundfile as sf
+
+from mentor_pipeline import noise
+from mentor_pipeline.noise import (
+    compute_noise_profile,
+    noise_profile_path,
+    reduce_noise_with_profile,
+    update_noise_profile,
+)
+from mentor_pipeline.pcm import decode_pcm
+
+from .helpers import resource_root_for_test
+
+RESOURCE_ROOT = resource_root_for_test(__file__)
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="requires ffmpeg"
+)
+
+
+def _noise(secs: float, seed: int = 0, scale: float = 0.02) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(int(secs * 16000)) * scale
+
+
+def _write_noise_sample(p: str, seed: int = 0) -> str:
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    sf.write(p, _noise(2, seed=seed), 16000, subtype="PCM_16")
+    return p
+
+
+def test_it_saves_the_noise_profile_and_reuses_it_until_the_sample_changes(tmpdir):
+    noise_sample = _write_noise_sample(
+        os.path.join(tmpdir, "build", "noise", "s001p001.wav")
+    )
+    with patch(
+        "mentor_pipeline.noise.compute_noise_profile", wraps=compute_noise_profile
+    ) as mock_compute:
+        profile = update_noise_profile(noise_sample)
+        assert noise_profile_path(noise_sample) == os.path.join(
+            tmpdir, "build", "noise", "profiles", "s001p001.npz"
+        )
+        assert os.path.isfile(noise_profile_path(noise_sample))
+        profile_reloaded = update_noise_profile(noise_sample)
+        assert mock_compute.call_count == 1
+        np.testing.assert_array_equal(profile_reloaded.noiseThresh, profile.noiseThresh)
+        assert profile_reloaded.sourceHash == profile.sourceHash
+        _write_noise_sample(noise_sample, seed=1)
+        assert update_noise_profile(noise_sample).sourceHash != profile.sourceHash
+        assert mock_compute.call_count == 2
+
+
+def test_it_attenuates_noise_and_keeps_the_signal():
+    profile = compute_noise_profile(_noise(2, seed=1))
+    t = np.arange(16000 * 8) / 16000
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t) * (t % 4 < 2)
+    audio = tone + _noise(8, seed=2)
+    result = reduce_noise_with_profile(audio, profile, prop_decrease=0.85)
+    assert len(result) == len(audio)
+    quiet = (t % 4 >= 2.2) & (t % 4 < 3.8)
+    loud = (t % 4 >= 0.2) & (t % 4 < 1.8)
+    assert np.std(result[quiet]) < np.std(audio[quiet]) / 4
+    assert np.std(result[loud]) > np.std(audio[loud]) / 2
+
+
+def test_it_matches_noisereduce_1_1_0():
+    """
+    noisereduce_1_1_0.npz has a noise sample, audio (both int16)
+    and the output of noisereduce==1.1.0 (with librosa==0.8.1) for them:
+
+        nr.reduce_noise(
+            audio_clip=audio / 32768.0,
+            noise_clip=noise / 32768.0,
+            prop_decrease=0.85,
+            verbose=False,
+        )
+    """
+    with np.load(os.path.join(RESOURCE_ROOT, "noisereduce_1_1_0.npz")) as golden:
+        profile = compute_noise_profile(golden["noise"] / 32768.0)
+        result = reduce_noise_with_profile(
+            golden["audio"] / 32768.0, profile, prop_decrease=0.85
+        )
+        np.testing.assert_allclose(result, golden["reduced"], atol=1e-9)
+
+
+def test_stft_round_trips():
+    y = _noise(1, scale=0.1)
+    reconstructed = noise._istft(noise._stft(y, 2048, 512, 2048), 512, 2048)
+    np.testing.assert_allclose(reconstructed, y[: len(reconstructed)], atol=1e-12)
+
+
+@requires_ffmpeg
+def test_it_reduces_noise_in_many_files_in_a_pool_of_processes(tmpdir):
+    noise_sample = _write_noise_sample(os.path.join(tmpdir, "noise", "s001.wav"))
+    files = []
+    for i in range(3):
+        files.append(os.path.join(tmpdir, f"u{i}.wav"))
+        sf.write(files[-1], _noise(1, seed=i + 10), 16000, subtype="PCM_16")
+    noise.reduce_noise(noise_sample, files, jobs=2)
+    for i, f in enumerate(files):
+        data, _ = sf.read(f)
+        # prop_decrease=0.85 (as noisereduce was called) keeps ~15% of pure noise
+        assert np.std(data) < np.std(_noise(1, seed=i + 10)) / 3
+
+
+@requires_ffmpeg
+def test_it_replaces_a_file_only_once_its_noise_is_reduced(tmpdir):
+    noise_sample = _write_noise_sample(os.path.join(tmpdir, "noise", "s001.wav"))
+    f = os.path.join(tmpdir, "videos", "u1.wav")
+    os.makedirs(os.path.dirname(f))
+    sf.write(f, _noise(1, seed=10), 16000, subtype="PCM_16")
+    with open(f, "rb") as fr:
+        original = fr.read()
+    with patch(
+        "mentor_pipeline.noise.reduce_noise_with_profile",
+        side_effect=KeyboardInterrupt(),
+    ):
+        with pytest.raises(KeyboardInterrupt):
+            noise.reduce_noise(noise_sample, [f])
+    with open(f, "rb") as fr:
+        assert fr.read() == original
+    noise.reduce_noise(noise_sample, [f])
+    data, rate = sf.read(f)
+    assert rate == 16000 and len(data) == 16000
+    assert os.listdir(os.path.dirname(f)) == ["u1.wav"]
+
+
+@pytest.mark.parametrize(
+    "secs,block_samples,frames_per_chunk",
+    [(0.1, 1000, 4), (3.0007, 1000, 7), (3.0007, 16000 * 4, 256), (20, 4096, 64)],
+)
+def test_streaming_matches_reducing_noise_in_one_pass(
+    secs, block_samples, frames_per_chunk
+):
+    profile = compute_noise_profile(_noise(2, seed=1))
+    t = np.arange(int(secs * 16000)) / 16000
+    audio = 0.3 * np.sin(2 * np.pi * 440 * t) * (t % 4 < 2) + _noise(secs, seed=2)
+    expected = reduce_noise_with_profile(audio, profile, prop_decrease=0.85)
+    blocks = list(
+        noise.reduce_noise_with_profile_streaming(
+            lambda: (
+                audio[i : i + block_samples]
+                for i in range(0, len(audio), block_samples)
+            ),
+            profile,
+            prop_decrease=0.85,
+            frames_per_chunk=frames_per_chunk,
+        )
+    )
+    assert max(len(b) for b in blocks) <= max(
+        len(audio) if len(audio) <= profile.nFft else 0,
+        (frames_per_chunk + 4) * profile.hopLength,
+    )
+    np.testing.assert_allclose(np.concatenate(blocks), expected, atol=1e-9)
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("ext", ["wav", "m4a"])
+def test_it_reduces_noise_in_a_file_streaming_the_same_as_in_one_pass(ext, tmpdir):
+    noise_sample = _write_noise_sample(os.path.join(tmpdir, "noise", "s001.wav"))
+    files = [os.path.join(tmpdir, f"u{i}.{ext}") for i in range(2)]
+    for f in files:
+        sf.write(os.path.join(tmpdir, "u.wav"), _noise(3, seed=10), 16000)
+        ffmpy.FFmpeg(
+            global_options="-loglevel quiet -y",
+            inputs={os.path.join(tmpdir, "u.wav"): None},
+            outputs={f: None},
+        ).run()
+    noise.reduce_noise(noise_sample, files[:1])
+    noise.reduce_noise(noise_sample, files[1:], stream=True)
+    one_pass, streamed = [decode_pcm(f).samples.astype(np.int32) for f in files]
+    assert len(streamed) == len(one_pass)
+    assert np.abs(streamed - one_pass).max() <= 1
+
+
+@requires_ffmpeg
+def test_it_skips_files_the_ledger_has_as_reduced(tmpdir):
+    noise_sample = _write_noise_sample(os.path.join(tmpdir, "noise", "s001.wav"))
+    ledger_file = os.path.join(tmpdir, ".mentor", "noise_reduction_ledger.yaml")
+    files = []
+    for i in range(2):
+        files.append(os.path.join(tmpdir, f"u{i}.wav"))
+        sf.write(files[-1], _noise(1, seed=i + 10), 16000, subtype="PCM_16")
+    noise.reduce_noise(noise_sample, files, ledger_file=ledger_file)
+    with open(files[0], "rb") as f:
+        reduced = f.read()
+    sf.write(files[1], _noise(1, seed=20), 16000, subtype="PCM_16")
+    with patch(
+        "mentor_pipeline.noise._reduce_noise", wraps=noise._reduce_noise
+    ) as mock_reduce_noise:
+        noise.reduce_noise(noise_sample, files, ledger_file=ledger_file)
+        # only the file that changed since
+        assert [c[0][1] for c in mock_reduce_noise.call_args_list] == files[1:]
+    with open(files[0], "rb") as f:
+        assert f.read() == reduced
+    ledger = noise.noise_reduction_ledger_from_yaml(ledger_file)
+    assert ledger.find(os.path.abspath(files[0])).outputHash == noise.file_hash(
+        files[0]
+    )
@@ -0,0 +1,33 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import pytest
+
+from mentor_pipeline.noise_registry import NoiseRegistry
+
+NOISE_SAMPLES = [
+    "/m/build/noise/s001p001.wav",
+    "/m/build/noise/s001.wav",
+    "/m/build/noise/s001p001s00000413e00000805.wav",
+    "/m/build/noise/s002p001.wav",
+]
+
+
+@pytest.mark.parametrize(
+    "utterance_id,expected_noise_sample",
+    [
+        ("s001p001s00000413e00000805", "/m/build/noise/s001p001s00000413e00000805.wav"),
+        ("s001p001s00000000e00000100", "/m/build/noise/s001p001.wav"),
+        ("s001p002s00000000e00000100", "/m/build/noise/s001.wav"),
+        ("s002p001s00000000e00000100", "/m/build/noise/s002p001.wav"),
+        ("s002p002s00000000e00000100", ""),
+        ("s003p001s00000000e00000100", ""),
+    ],
+)
+def test_it_finds_the_noise_sample_with_the_longest_matching_prefix(
+    utterance_id: str, expected_noise_sample: str
+):
+    assert NoiseRegistry(NOISE_SAMPLES).find(utterance_id) == expected_noise_sample
@@ -0,0 +1,126 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+import shutil
+import time
+from unittest.mock import patch
+
+import ffmpy
+import numpy as np
+import pytest
+import soundfile as sf
+
+from mentor_pipeline.media_tools import MediaSlice
+from mentor_pipeline.pcm import decode_pcm, PcmCache, slice_audio_session_pcm
+
+
+def _write_session_audio(p: str, rate: int = 16000, secs: int = 10) -> np.ndarray:
+    """
+    writes a stereo session wav where each sample of the left channel
+    is its own index (mod 2^15) and returns the samples of the left channel
+    """
+    left = (np.arange(rate * secs) % 32768).astype(np.int16)
+    sf.write(p, np.stack([left, left], axis=1), rate, subtype="PCM_16")
+    return left
+
+
+def test_it_writes_sample_accurate_slices_from_one_decode(tmpdir):
+    session_audio = os.path.join(tmpdir, "session1.wav")
+    samples = _write_session_audio(session_audio)
+    slices = [
+        MediaSlice(os.path.join(tmpdir, "utterance_audio", "u1.wav"), 0.0, 1.5),
+        MediaSlice(os.path.join(tmpdir, "utterance_audio", "u2.wav"), 2.12, 4.78),
+        MediaSlice(os.path.join(tmpdir, "utterance_audio", "u3.wav"), 9.5, 12.0),
+    ]
+    with patch("mentor_pipeline.pcm.sf.read", wraps=sf.read) as mock_read:
+        slice_audio_session_pcm(session_audio, slices)
+        mock_read.assert_called_once()
+    for s, (i_start, i_end) in zip(
+        slices, [(0, 24000), (33920, 76480), (152000, 160000)]
+    ):
+        data, rate = sf.read(s.target_file, dtype="int16")
+        assert rate == 16000
+        np.testing.assert_array_equal(data, samples[i_start:i_end])
+    assert sorted(os.listdir(os.path.join(tmpdir, "utterance_audio"))) == [
+        "u1.wav",
+        "u2.wav",
+        "u3.wav",
+    ]
+
+
+def test_it_decodes_stereo_to_mono(tmpdir):
+    session_audio = os.path.join(tmpdir, "session1.wav")
+    left = np.full(8000, 1000, dtype=np.int16)
+    sf.write(session_audio, np.stack([left, left * 3], axis=1), 8000)
+    pcm_audio = decode_pcm(session_audio)
+    assert pcm_audio.rate == 8000
+    assert pcm_audio.get_duration() == 1.0
+    np.testing.assert_array_equal(pcm_audio.samples, np.full(8000, 2000))
+
+
+@patch("mentor_pipeline.pcm.slice_audio_session")
+def test_it_slices_types_soundfile_cannot_write_with_ffmpeg(
+    mock_slice_audio_session, tmpdir
+):
+    session_audio = os.path.join(tmpdir, "session1.wav")
+    _write_session_audio(session_audio)
+    slices = [
+        MediaSlice(os.path.join(tmpdir, "utterance_audio", "u1.wav"), 0.0, 1.5),
+        MediaSlice(os.path.join(tmpdir, "utterance_audio", "u2.m4a"), 2.0, 3.0),
+    ]
+    slice_audio_session_pcm(session_audio, slices)
+    assert os.path.isfile(slices[0].target_file)
+    mock_slice_audio_session.assert_called_once_with(session_audio, slices[1:])
+
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="requires ffmpeg"
+)
+
+
+@requires_ffmpeg
+def test_the_cache_decodes_a_session_once_and_memory_maps_it(tmpdir):
+    session_audio = os.path.join(tmpdir, "session1.wav")
+    samples = _write_session_audio(session_audio)
+    cache = PcmCache(os.path.join(tmpdir, "build", "pcm"), 10 * 1024 * 1024)
+    with patch("mentor_pipeline.pcm.ffmpy.FFmpeg", wraps=ffmpy.FFmpeg) as mock_ffmpeg:
+        pcm_audio = cache.get(session_audio)
+        assert cache.get(session_audio).rate == 16000
+        mock_ffmpeg.assert_called_once()
+    assert isinstance(pcm_audio.samples, np.memmap)
+    np.testing.assert_array_equal(pcm_audio.slice(2.12, 4.78), samples[33920:76480])
+
+
+@requires_ffmpeg
+def test_the_cache_decodes_again_once_a_session_changes(tmpdir):
+    session_audio = os.path.join(tmpdir, "session1.wav")
+    _write_session_audio(session_audio, secs=2)
+    cache = PcmCache(os.path.join(tmpdir, "build", "pcm"), 10 * 1024 * 1024)
+    assert cache.get(session_audio).get_duration() == 2.0
+    _write_session_audio(session_audio, secs=3)
+    os.utime(session_audio, (0, 1))
+    assert cache.get(session_audio).get_duration() == 3.0
+
+
+@requires_ffmpeg
+def test_the_cache_evicts_the_least_recently_used_sessions_over_budget(tmpdir):
+    sessions = [os.path.join(tmpdir, f"session{i}.wav") for i in range(3)]
+    for s in sessions:
+        _write_session_audio(s, secs=1)  # 32000 bytes of pcm
+    cache = PcmCache(os.path.join(tmpdir, "build", "pcm"), 70000)
+    cache.get(sessions[0])
+    cache.get(sessions[1])
+    time.sleep(0.01)
+    cache.get(sessions[0])  # so session1 is the least recently used
+    time.sleep(0.01)
+    cache.get(sessions[2])
+    entries = os.listdir(cache.root)
+    assert len(entries) == 2
+    with patch("mentor_pipeline.pcm.ffmpy.FFmpeg", wraps=ffmpy.FFmpeg) as mock_ffmpeg:
+        cache.get(sessions[0])
+        cache.get(sessions[2])
+        mock_ffmpeg.assert_not_called()
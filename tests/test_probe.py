@@ -0,0 +1,138 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from mentor_pipeline.mentorpath import MentorPath
+from mentor_pipeline.probe import (
+    MediaProbe,
+    ProbeManifest,
+    probe_manifest_from_yaml,
+    probe_manifest_to_yaml,
+)
+
+from .helpers import Bunch
+
+
+def _media_info(width=1280, height=720) -> Bunch:
+    return Bunch(
+        tracks=[
+            Bunch(track_type="General", duration=12345),
+            Bunch(
+                track_type="Video",
+                width=width,
+                height=height,
+                frame_rate="29.970",
+                format="AVC",
+            ),
+            Bunch(
+                track_type="Audio",
+                format="AAC",
+                sampling_rate=48000,
+                channel_s=2,
+                channel_layout="L R",
+            ),
+        ]
+    )
+
+
+def _write_media_file(tmpdir, name: str, content: str = "not really video") -> str:
+    f = os.path.join(tmpdir, name)
+    with open(f, "w") as fp:
+        fp.write(content)
+    return f
+
+
+@patch("pymediainfo.MediaInfo.parse")
+def test_it_records_props_of_media_files(mock_media_info_parse, tmpdir):
+    mock_media_info_parse.return_value = _media_info()
+    f = _write_media_file(tmpdir, "session1.mp4")
+    p = ProbeManifest().probe(f)
+    assert p == MediaProbe(
+        size=os.stat(f).st_size,
+        mtime=os.stat(f).st_mtime,
+        duration=12.345,
+        width=1280,
+        height=720,
+        frameRate=29.97,
+        videoCodec="AVC",
+        audioCodec="AAC",
+        audioSampleRate=48000,
+        audioChannels=2,
+        audioChannelLayout="L R",
+    )
+
+
+@patch("pymediainfo.MediaInfo.parse")
+def test_it_probes_each_file_only_once_until_the_file_changes(
+    mock_media_info_parse, tmpdir
+):
+    mock_media_info_parse.return_value = _media_info()
+    f = _write_media_file(tmpdir, "session1.mp4")
+    manifest = ProbeManifest()
+    manifest.probe(f)
+    manifest.probe(f)
+    assert mock_media_info_parse.call_count == 1
+    _write_media_file(tmpdir, "session1.mp4", "a new recording")
+    mock_media_info_parse.return_value = _media_info(width=1920, height=1080)
+    assert manifest.probe(f).width == 1920
+    assert mock_media_info_parse.call_count == 2
+
+
+@patch("pymediainfo.MediaInfo.parse")
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_it_persists_probes_from_a_batch(mock_media_info_parse, tmpdir, jobs: int):
+    mock_media_info_parse.return_value = _media_info()
+    files = [_write_media_file(tmpdir, f"session{i}.mp4") for i in range(6)]
+    manifest = ProbeManifest()
+    jobs_result = manifest.probe_all(files, jobs=jobs)
+    assert len(jobs_result.results) == len(files)
+    assert not jobs_result.failed()
+    manifest_path = os.path.join(tmpdir, ".mentor", "media_probes.yaml")
+    probe_manifest_to_yaml(manifest, manifest_path)
+    manifest_loaded = probe_manifest_from_yaml(manifest_path)
+    assert manifest_loaded == manifest
+    assert not manifest_loaded.probe_all(files, jobs=jobs).results
+    assert mock_media_info_parse.call_count == len(files)
+
+
+@patch("pymediainfo.MediaInfo.parse")
+def test_it_keys_a_mentors_probes_relative_to_the_mentor(mock_media_info_parse, tmpdir):
+    mock_media_info_parse.return_value = _media_info()
+    root = os.path.join(tmpdir, "before")
+    mp = MentorPath(
+        mentor_id="m1", root_path_data_mentors=os.path.join(root, "data", "mentors")
+    )
+    session_video = mp.get_mentor_data(os.path.join("build", "recordings", "s1.mp4"))
+    utterance_video = mp.get_mentor_video(os.path.join("web", "u1.mp4"))
+    for f in [session_video, utterance_video]:
+        os.makedirs(os.path.dirname(f), exist_ok=True)
+        _write_media_file(os.path.dirname(f), os.path.basename(f))
+    manifest = mp.load_media_probes()
+    manifest.probe_all([session_video, utterance_video])
+    mp.write_media_probes(manifest)
+    assert set(manifest.probesByPath.keys()) == {
+        os.path.join("build", "recordings", "s1.mp4"),
+        os.path.join("web", "u1.mp4"),
+    }
+    # the probes still apply to the mentor's files once it's moved
+    shutil.copytree(root, os.path.join(tmpdir, "after"))
+    mp_moved = MentorPath(
+        mentor_id="m1",
+        root_path_data_mentors=os.path.join(tmpdir, "after", "data", "mentors"),
+    )
+    manifest_moved = mp_moved.load_media_probes()
+    assert not manifest_moved.probe_all(
+        [
+            mp_moved.get_mentor_data(os.path.join("build", "recordings", "s1.mp4")),
+            mp_moved.get_mentor_video(os.path.join("web", "u1.mp4")),
+        ]
+    ).results
+    assert mock_media_info_parse.call_count == 2
@@ -0,0 +1,75 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from mentor_pipeline.jobs import run_jobs
+from mentor_pipeline.media_tools import slice_audio
+from mentor_pipeline.progress import FFmpegProgress, ffmpeg_progress_updates
+
+
+def test_it_parses_an_update_for_each_block_of_ffmpeg_progress():
+    lines = [
+        "frame=120",
+        "total_size=262192",
+        "out_time_us=4000000",
+        "out_time_ms=4000000",
+        "out_time=00:00:04.000000",
+        "speed=2.01x",
+        "progress=continue",
+        "total_size=N/A",
+        "out_time_us=N/A",
+        "speed=N/A",
+        "progress=continue",
+        "total_size=524288",
+        "out_time_us=8500000",
+        "speed=2.5x",
+        "progress=end",
+    ]
+    assert list(ffmpeg_progress_updates(lines)) == [
+        FFmpegProgress(mediaSecs=4.0, speed=2.01, outputSize=262192),
+        FFmpegProgress(mediaSecs=4.0, speed=2.01, outputSize=262192),
+        FFmpegProgress(mediaSecs=8.5, speed=2.5, outputSize=524288, done=True),
+    ]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="requires ffmpeg")
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_it_reports_the_progress_of_the_ffmpeg_runs_of_each_job(
+    tmpdir, max_workers: int
+):
+    src = os.path.join(tmpdir, "session1.wav")
+    subprocess.run(
+        f"ffmpeg -y -loglevel quiet -f lavfi -i sine=frequency=440:duration=30 {src}",
+        shell=True,
+        check=True,
+    )
+    slices = [(0.0, 12.0), (12.0, 20.0), (20.0, 30.0)]
+    targets = [os.path.join(tmpdir, "utterance_audio", f"u{i}.mp3") for i in range(3)]
+    updates = []
+    jobs_result = run_jobs(
+        list(range(3)),
+        lambda i, job: slice_audio(src, targets[i], *slices[i]),
+        max_workers=max_workers,
+        on_progress=lambda i, job, metrics: updates.append((i, metrics.mediaSecs)),
+    )
+    assert not jobs_result.failed()
+    for i, r in enumerate(jobs_result.results):
+        assert r.metrics.mediaSecs == pytest.approx(
+            slices[i][1] - slices[i][0], abs=0.1
+        )
+        assert r.metrics.outputSize == os.path.getsize(targets[i])
+        assert r.metrics.wallTimeSecs > 0
+        assert (i, r.metrics.mediaSecs) in updates
+    summary = jobs_result.metrics_summary()
+    assert summary.jobCount == 3
+    assert summary.mediaSecs == pytest.approx(30.0, abs=0.3)
+    assert summary.outputSize == sum(os.path.getsize(t) for t in targets)
+    assert summary.cpuTimeSecs > 0
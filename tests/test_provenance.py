@@ -0,0 +1,46 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+
+from mentor_pipeline.provenance import (
+    file_fingerprint,
+    fingerprint,
+    ProvenanceManifest,
+    provenance_manifest_from_yaml,
+    provenance_manifest_to_yaml,
+)
+
+
+def _write_file(tmpdir, name: str, content: str = "some media") -> str:
+    f = os.path.join(tmpdir, name)
+    with open(f, "w") as fp:
+        fp.write(content)
+    return f
+
+
+def test_fingerprint_changes_with_any_input(tmpdir):
+    src = _write_file(tmpdir, "session1.mp4")
+    fp = fingerprint(source=file_fingerprint(src), timeStart=1.0, timeEnd=2.5)
+    assert fp == fingerprint(timeEnd=2.5, timeStart=1.0, source=file_fingerprint(src))
+    assert fp != fingerprint(source=file_fingerprint(src), timeStart=1.0, timeEnd=2.6)
+    _write_file(tmpdir, "session1.mp4", "a new recording")
+    assert fp != fingerprint(source=file_fingerprint(src), timeStart=1.0, timeEnd=2.5)
+
+
+def test_it_adopts_existing_assets_and_then_tracks_their_inputs(tmpdir):
+    asset = _write_file(tmpdir, "u1.mp4")
+    pm = ProvenanceManifest()
+    assert not pm.is_up_to_date("u1.mp4", os.path.join(tmpdir, "missing.mp4"), "a")
+    # no fingerprint was recorded for the existing asset, so it's kept as is
+    assert pm.is_up_to_date("u1.mp4", asset, "a")
+    assert pm.is_up_to_date("u1.mp4", asset, "a")
+    assert not pm.is_up_to_date("u1.mp4", asset, "b")
+    pm.set("u1.mp4", "b")
+    assert pm.is_up_to_date("u1.mp4", asset, "b")
+    manifest_path = os.path.join(tmpdir, ".mentor", "provenance.yaml")
+    provenance_manifest_to_yaml(pm, manifest_path)
+    assert provenance_manifest_from_yaml(manifest_path).find("u1.mp4") == "b"
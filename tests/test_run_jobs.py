@@ -0,0 +1,78 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+import threading
+import time
+
+import ffmpy
+import pytest
+
+from mentor_pipeline.jobs import run_jobs
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_it_returns_results_in_job_order_regardless_of_completion_order(
+    max_workers: int,
+):
+    jobs = [0.04, 0.0, 0.03, 0.01, 0.02]
+    result = run_jobs(jobs, lambda i, job: time.sleep(job), max_workers=max_workers)
+    assert [r.job for r in result.results] == jobs
+    assert all(r.succeeded() for r in result.results)
+
+
+def test_it_captures_job_errors_without_stopping_other_jobs():
+    def _job(i: int, job: str) -> None:
+        if job == "bad":
+            raise ValueError("bad job")
+
+    result = run_jobs(["a", "bad", "c"], _job, max_workers=2)
+    assert [r.succeeded() for r in result.results] == [True, False, True]
+    assert isinstance(result.failed()[0].error, ValueError)
+
+
+def test_it_runs_jobs_concurrently_and_records_wall_time_per_job():
+    barrier = threading.Barrier(3, timeout=5)
+    result = run_jobs([1, 2, 3], lambda i, job: barrier.wait(), max_workers=3)
+    assert all(r.succeeded() for r in result.results)
+    assert all(r.wall_time_secs > 0 for r in result.results)
+
+
+def _job_in_process(i: int, job: str) -> None:
+    if job == "bad":
+        raise ValueError("bad job")
+    with open(job, "w") as f:
+        f.write(f"{os.getpid()}")
+
+
+def test_it_runs_jobs_in_a_pool_of_processes(tmpdir):
+    jobs = [os.path.join(tmpdir, f"job{i}.txt") for i in range(3)] + ["bad"]
+    result = run_jobs(jobs, _job_in_process, max_workers=2, use_processes=True)
+    assert [r.job for r in result.results] == jobs
+    assert [r.succeeded() for r in result.results] == [True, True, True, False]
+    assert isinstance(result.failed()[0].error, ValueError)
+    assert all(r.wall_time_secs > 0 for r in result.results)
+    for j in jobs[:3]:
+        with open(j) as f:
+            assert int(f.read()) != os.getpid()
+
+
+def _job_in_process_ffmpeg_fails(i: int, job: str) -> None:
+    if job == "bad":
+        raise ffmpy.FFRuntimeError("ffmpeg -i bad.mp4 bad.wav", 1, b"", b"")
+
+
+def test_it_returns_errors_that_cannot_be_pickled_from_a_pool_of_processes():
+    result = run_jobs(
+        ["a", "bad", "c"],
+        _job_in_process_ffmpeg_fails,
+        max_workers=2,
+        use_processes=True,
+    )
+    assert [r.succeeded() for r in result.results] == [True, False, True]
+    error = result.failed()[0].error
+    assert isinstance(error, RuntimeError)
+    assert str(error).startswith("FFRuntimeError: ")
@@ -6,6 +6,7 @@
 #
 import os
 
+import numpy as np
 import pytest
 from unittest.mock import patch
 
@@ -14,19 +15,24 @@ from .helpers import (
     copy_mentor_to_tmp,
     resource_root_mentors_for_test,
 )
+from mentor_pipeline.noise import NoiseProfile
 from mentor_pipeline.run import Pipeline
 
 MENTOR_ROOT = resource_root_mentors_for_test(__file__)
 
 
+@patch("mentor_pipeline.noise.update_noise_profile")
 @patch("mentor_pipeline.noise.reduce_noise")
 @pytest.mark.parametrize("mentor_root,mentor_id", [(MENTOR_ROOT, "mentor1")])
 def test_run_videos_reduce_noise_applies_noise_reduction(
-    mock_noise_reducer, mentor_root: str, mentor_id: str
+    mock_noise_reducer, mock_update_noise_profile, mentor_root: str, mentor_id: str
 ):
     mpath = copy_mentor_to_tmp(
         mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
     )
+    mock_update_noise_profile.return_value = NoiseProfile(
+        noiseThresh=np.zeros(1025), sourceHash="noise-sample-hash"
+    )
     mock_noise_reducer = MockNoiseReducer(mock_noise_reducer)
     p = Pipeline(mentor_id, mpath.root_path_data_mentors)
     p.videos_reduce_noise()
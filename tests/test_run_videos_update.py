@@ -65,3 +65,40 @@ def test_it_generates_all_videos_for_a_mentor(
         assert_utterance_asset_exists(mpath, u, UTTERANCE_VIDEO)
         assert_utterance_asset_exists(mpath, u, UTTERANCE_VIDEO_MOBILE)
         assert_utterance_asset_exists(mpath, u, UTTERANCE_VIDEO_WEB)
+
+
+@patch("mentor_pipeline.media_tools.video_encode_for_web")
+@patch("mentor_pipeline.media_tools.video_encode_for_mobile")
+@patch("mentor_pipeline.media_tools.slice_video_renditions")
+@pytest.mark.parametrize("mentor_root,mentor_id", [(MENTOR_ROOT, "mentor1")])
+def test_it_generates_all_videos_for_a_mentor_from_one_decode_with_renditions(
+    mock_slice_video_renditions,
+    mock_video_encode_for_mobile,
+    mock_video_encode_for_web,
+    mentor_root: str,
+    mentor_id: str,
+):
+    def _create_dummy_outputs(src_file, time_start, time_end, **targets):
+        for t in targets.values():
+            if isinstance(t, str):
+                os.makedirs(os.path.dirname(t), exist_ok=True)
+                with open(t, "w") as f:
+                    f.write(f"{src_file} --ss {time_start} --to {time_end}")
+
+    mock_slice_video_renditions.side_effect = _create_dummy_outputs
+    mpath = copy_mentor_to_tmp(
+        mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+    )
+    p = Pipeline(mentor_id, mpath.root_path_data_mentors)
+    p.videos_update(renditions=True)
+    assert_utterances_match_expected(mpath)
+    expected_utterances = load_expected_utterances(mpath)
+    assert mock_slice_video_renditions.call_count == len(
+        expected_utterances.utterances()
+    )
+    mock_video_encode_for_mobile.assert_not_called()
+    mock_video_encode_for_web.assert_not_called()
+    for u in expected_utterances.utterances():
+        assert_utterance_asset_exists(mpath, u, UTTERANCE_VIDEO)
+        assert_utterance_asset_exists(mpath, u, UTTERANCE_VIDEO_MOBILE)
+        assert_utterance_asset_exists(mpath, u, UTTERANCE_VIDEO_WEB)
@@ -4,6 +4,8 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
+import os
+
 import pytest
 from unittest.mock import patch
 
@@ -70,3 +72,134 @@ def _test_sessions_to_audio(
         )
         assert_utterances_match_expected(mp, utterances=result.utterances)
         assert_session_to_audio_result_summary_match_expected(mp, result.summary())
+
+
+@pytest.mark.parametrize(
+    "mentor_data_root,mentor_id,audio_format,jobs",
+    [
+        (MENTOR_DATA_ROOT, "generates-audio-for-each-session", "flac", 1),
+        (MENTOR_DATA_ROOT, "generates-audio-for-each-session", "m4a", 2),
+    ],
+)
+def test_it_generates_session_audio_in_the_configured_format(
+    mentor_data_root: str, mentor_id: str, audio_format: str, jobs: int
+):
+    with patch("mentor_pipeline.media_tools.video_to_audio") as mock_video_to_audio:
+        mp = copy_mentor_to_tmp(mentor_id, mentor_data_root)
+        MockVideoToAudioConverter(mock_video_to_audio, create_dummy_output_files=True)
+        result = sessions_to_audio(
+            mp.load_utterances(), mp, jobs=jobs, audio_format=audio_format
+        )
+        assert sorted(c[0][1] for c in mock_video_to_audio.call_args_list) == [
+            mp.get_mentor_data(f"build/recordings/{p}.{audio_format}")
+            for p in [
+                "session1/p1-some-questions",
+                "session1/p2-some-utterances",
+                "session2/p1-more-utterances",
+            ]
+        ]
+        assert [u.sessionAudio for u in result.utterances.utterances()] == [
+            os.path.splitext(u.sessionVideo)[0] + f".{audio_format}"
+            for u in result.utterances.utterances()
+        ]
+        assert_session_to_audio_result_summary_match_expected(mp, result.summary())
+
+
+@pytest.mark.parametrize(
+    "mentor_data_root,mentor_id",
+    [(MENTOR_DATA_ROOT, "generates-audio-for-each-session")],
+)
+def test_it_reduces_noise_once_per_session_before_extracting_audio(
+    mentor_data_root: str, mentor_id: str
+):
+    with patch(
+        "mentor_pipeline.media_tools.video_to_audio"
+    ) as mock_video_to_audio, patch(
+        "mentor_pipeline.noise.reduce_noise_to"
+    ) as mock_reduce_noise_to, patch(
+        "mentor_pipeline.noise.update_noise_profile"
+    ):
+        mp = copy_mentor_to_tmp(mentor_id, mentor_data_root)
+        MockVideoToAudioConverter(mock_video_to_audio, create_dummy_output_files=True)
+
+        def _reduce_noise_to(noise_sample, src, target, stream=False):
+            with open(target, "w") as f:
+                f.write(f"{src} without {noise_sample}")
+
+        mock_reduce_noise_to.side_effect = _reduce_noise_to
+        noise_sample = mp.get_noise_path("s001p001.wav")
+        os.makedirs(mp.get_noise_path())
+        with open(noise_sample, "w") as f:
+            f.write("noise")
+        utterances = mp.load_utterances()
+        sessions_to_audio(utterances, mp, reduce_noise=True)
+        session_video = mp.get_mentor_data(
+            "build/recordings/session1/p1-some-questions.mp4"
+        )
+        session_video_denoised = mp.get_denoised_path(
+            "build/recordings/session1/p1-some-questions.mp4"
+        )
+        mock_reduce_noise_to.assert_called_once_with(
+            noise_sample, session_video, session_video_denoised, stream=True
+        )
+        assert (
+            session_video_denoised,
+            mp.get_mentor_data("build/recordings/session1/p1-some-questions.mp3"),
+        ) in [c[0] for c in mock_video_to_audio.call_args_list]
+        assert mock_video_to_audio.call_count == 3
+        # built, so neither is done again
+        sessions_to_audio(utterances, mp, reduce_noise=True)
+        assert mock_reduce_noise_to.call_count == 1
+        assert mock_video_to_audio.call_count == 3
+        # without noise reduction, the session audio is extracted again
+        # and the denoised video is removed, so videos are sliced from the session
+        sessions_to_audio(utterances, mp)
+        assert not os.path.exists(session_video_denoised)
+        assert mock_video_to_audio.call_count == 4
+
+
+@pytest.mark.parametrize(
+    "mentor_data_root,mentor_id",
+    [(MENTOR_DATA_ROOT, "generates-audio-for-each-session")],
+)
+def test_it_reduces_noise_in_a_session_with_the_sample_for_its_session_part(
+    mentor_data_root: str, mentor_id: str
+):
+    with patch(
+        "mentor_pipeline.media_tools.video_to_audio"
+    ) as mock_video_to_audio, patch(
+        "mentor_pipeline.noise.reduce_noise_to"
+    ) as mock_reduce_noise_to, patch(
+        "mentor_pipeline.noise.update_noise_profile"
+    ):
+        mp = copy_mentor_to_tmp(mentor_id, mentor_data_root)
+        MockVideoToAudioConverter(mock_video_to_audio, create_dummy_output_files=True)
+
+        def _reduce_noise_to(noise_sample, src, target, stream=False):
+            with open(target, "w") as f:
+                f.write(f"{src} without {noise_sample}")
+
+        mock_reduce_noise_to.side_effect = _reduce_noise_to
+        os.makedirs(mp.get_noise_path())
+        # samples for single utterances are for utterance videos only
+        for name in [
+            "s001.wav",
+            "s001p001s00000000e00000100.wav",
+            "s001p001s00000212e00000478.wav",
+        ]:
+            with open(mp.get_noise_path(name), "w") as f:
+                f.write(name)
+        utterances = mp.load_utterances()
+        sessions_to_audio(utterances, mp, reduce_noise=True)
+        assert sorted(
+            (c[0][0], os.path.basename(c[0][1]))
+            for c in mock_reduce_noise_to.call_args_list
+        ) == [
+            (mp.get_noise_path("s001.wav"), "p1-some-questions.mp4"),
+            (mp.get_noise_path("s001.wav"), "p2-some-utterances.mp4"),
+        ]
+        # so changing a sample for a single utterance rebuilds no session
+        with open(mp.get_noise_path("s001p001s00000212e00000478.wav"), "w") as f:
+            f.write("changed")
+        sessions_to_audio(utterances, mp, reduce_noise=True)
+        assert mock_reduce_noise_to.call_count == 2
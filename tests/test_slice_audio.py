@@ -11,7 +11,8 @@ import pytest
 
 from .helpers import resource_root_mentors_for_test
 from mentor_pipeline.mentorpath import MentorPath
-from mentor_pipeline.media_tools import slice_audio
+from mentor_pipeline.media_tools import MediaSlice, slice_audio, slice_audio_session
+from mentor_pipeline.utils import staged_file_path
 
 
 MENTOR_DATA_ROOT = resource_root_mentors_for_test(__file__)
@@ -30,3 +31,42 @@ def test_it_creates_directories_for_output_as_needed(
     audio_tgt = os.path.join("build", "utterance_audio", "utterance1.mp3")
     slice_audio(audio_src, audio_tgt, 0.0, 1.0)
     mock_make_dirs.assert_called_once_with(os.path.dirname(audio_tgt), exist_ok=True)
+
+
+@patch("os.makedirs")
+@patch("ffmpy.FFmpeg")
+def test_slice_audio_session_decodes_each_part_of_the_session_once(
+    mock_ffmpeg, mock_make_dirs
+):
+    audio_src = "session1.mp3"
+    slices = [
+        MediaSlice(target_file="out/u3.mp3", time_start=30.0, time_end=35.5),
+        MediaSlice(target_file="out/u1.mp3", time_start=2.0, time_end=4.25),
+        MediaSlice(target_file="out/u2.mp3", time_start=10.0, time_end=12.0),
+    ]
+    slice_audio_session(audio_src, slices, max_outputs_per_call=2)
+    assert mock_ffmpeg.call_count == 2
+    first_call, second_call = mock_ffmpeg.call_args_list
+    assert first_call.kwargs["inputs"] == {
+        audio_src: ("-y", "-ss", "2.0", "-loglevel", "quiet")
+    }
+    assert list(first_call.kwargs["outputs"].keys()) == [
+        staged_file_path("out/u1.mp3"),
+        staged_file_path("out/u2.mp3"),
+    ]
+    assert first_call.kwargs["outputs"][staged_file_path("out/u2.mp3")][:4] == (
+        "-ss",
+        "8.0",
+        "-to",
+        "10.0",
+    )
+    assert second_call.kwargs["inputs"] == {
+        audio_src: ("-y", "-ss", "30.0", "-loglevel", "quiet")
+    }
+    assert second_call.kwargs["outputs"][staged_file_path("out/u3.mp3")][:4] == (
+        "-ss",
+        "0.0",
+        "-to",
+        "5.5",
+    )
+    assert mock_ffmpeg.return_value.run.call_count == 2
@@ -0,0 +1,110 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+import shutil
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from mentor_pipeline.media_tools import slice_video_smart_cut
+from mentor_pipeline.utterances import Utterance
+
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+    reason="requires ffmpeg and ffprobe",
+)
+
+
+def _create_session_video(video_file: str, video_codec_command: str) -> str:
+    """
+    writes a 30s test session video with a keyframe every 2 seconds
+    """
+    subprocess.run(
+        f"ffmpeg -y -loglevel quiet -f lavfi -i testsrc=duration=30:size=320x180:rate=30"
+        f" -f lavfi -i sine=frequency=440:duration=30"
+        f" {video_codec_command} -g 60 -pix_fmt yuv420p -c:a aac -shortest {video_file}",
+        shell=True,
+        check=True,
+    )
+    return video_file
+
+
+def _probe_duration(media_file: str, stream: str) -> float:
+    return float(
+        subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                stream,
+                "-show_entries",
+                "stream=duration",
+                "-of",
+                "csv=p=0",
+                media_file,
+            ],
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout.strip()
+    )
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize(
+    "video_codec_command", ["-c:v libx264 -bf 0", "-c:v libx264 -bf 2"]
+)
+@pytest.mark.parametrize(
+    "time_start,time_end",
+    [(3.3, 11.7), (0.0, 5.5), (4.0, 8.0), (10.02, 25.51), (2.5, 3.5)],
+)
+def test_output_duration_matches_utterance_duration(
+    tmpdir, video_codec_command: str, time_start: float, time_end: float
+):
+    session_video = _create_session_video(
+        os.path.join(tmpdir, "session1.mp4"), video_codec_command
+    )
+    utterance = Utterance(timeStart=time_start, timeEnd=time_end)
+    target = os.path.join(tmpdir, "utterance_video", "utterance1.mp4")
+    slice_video_smart_cut(
+        session_video,
+        target,
+        utterance.timeStart,
+        utterance.timeEnd,
+        normalize_audio=False,
+    )
+    assert _probe_duration(target, "v:0") == pytest.approx(
+        utterance.get_duration(), abs=0.1
+    )
+    assert _probe_duration(target, "a:0") == pytest.approx(
+        utterance.get_duration(), abs=0.1
+    )
+    assert os.listdir(os.path.dirname(target)) == ["utterance1.mp4"]
+
+
+@requires_ffmpeg
+@patch("mentor_pipeline.media_tools.slice_video")
+def test_it_falls_back_to_slice_video_for_codecs_it_cannot_cut(
+    mock_slice_video, tmpdir
+):
+    session_video = _create_session_video(
+        os.path.join(tmpdir, "session1.mp4"), "-c:v mpeg4"
+    )
+    target = os.path.join(tmpdir, "utterance_video", "utterance1.mp4")
+    slice_video_smart_cut(session_video, target, 3.3, 11.7)
+    mock_slice_video.assert_called_once_with(
+        session_video,
+        target,
+        3.3,
+        11.7,
+        normalize_audio=True,
+        normalize_audio_lrt=7,
+        loudness=None,
+        profile=None,
+    )
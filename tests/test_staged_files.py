@@ -0,0 +1,67 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+
+import pytest
+
+from mentor_pipeline.mentorpath import MentorPath
+from mentor_pipeline.utils import staged_file_path, staged_files
+
+
+def _write_file(p: str, content: str = "some media") -> str:
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    with open(p, "w") as f:
+        f.write(content)
+    return p
+
+
+def test_it_renames_staged_files_to_their_targets_once_complete(tmpdir):
+    targets = [os.path.join(tmpdir, "web", f"u{i}.mp4") for i in range(2)]
+    with staged_files(targets) as staged:
+        assert staged == [
+            os.path.join(tmpdir, "web", f".u{i}.partial.mp4") for i in range(2)
+        ]
+        for s in staged:
+            _write_file(s)
+        assert not any(os.path.exists(t) for t in targets)
+    assert all(os.path.isfile(t) for t in targets)
+    assert sorted(os.listdir(os.path.join(tmpdir, "web"))) == ["u0.mp4", "u1.mp4"]
+
+
+def test_it_never_leaves_a_partial_target_when_interrupted(tmpdir):
+    target = os.path.join(tmpdir, "web", "u1.mp4")
+    with pytest.raises(KeyboardInterrupt):
+        with staged_files([target]) as [staged]:
+            _write_file(staged, "the first half of a video")
+            raise KeyboardInterrupt()
+    assert os.listdir(os.path.join(tmpdir, "web")) == []
+
+
+def test_it_removes_stale_staged_files_of_a_mentor(tmpdir):
+    mp = MentorPath(
+        mentor_id="mentor1",
+        root_path_data_mentors=os.path.join(tmpdir, "data", "mentors"),
+    )
+    complete = [
+        _write_file(mp.get_mentor_data(os.path.join("build", "utterance_audio", p)))
+        for p in ["u1.mp3", "u2.mp3"]
+    ] + [_write_file(mp.get_mentor_video(os.path.join("web", "u1.mp4")))]
+    stale = [
+        _write_file(staged_file_path(complete[1])),
+        _write_file(
+            staged_file_path(mp.get_mentor_video(os.path.join("web", "u2.mp4")))
+        ),
+        _write_file(
+            mp.get_mentor_video(
+                os.path.join("utterance_video", ".tmp1.partial", "p0.mp4")
+            )
+        ),
+    ]
+    removed = mp.remove_stale_staged_files()
+    assert sorted(removed) == sorted(stale[:2] + [os.path.dirname(stale[2])])
+    assert all(os.path.isfile(p) for p in complete)
+    assert not any(os.path.exists(p) for p in stale)
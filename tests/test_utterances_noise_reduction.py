@@ -5,6 +5,9 @@
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
 import os
+import shutil
+
+import numpy as np
 import pytest
 from unittest.mock import patch
 
@@ -13,7 +16,12 @@ from .helpers import (
     MockNoiseReducer,
     resource_root_mentors_for_test,
 )
-from mentor_pipeline.process import utterances_noise_reduction
+from mentor_pipeline.noise import NoiseProfile
+from mentor_pipeline.process import (
+    sessions_to_audio,
+    utterances_noise_reduction,
+    utterances_slice_video,
+)
 
 
 MENTOR_ROOT = resource_root_mentors_for_test(__file__)
@@ -32,7 +40,10 @@ def test_it_matches_noise_sample_to_utterance_by_prefix(
 def _test_utterance_noise_reduction(
     mentor_root: str, mentor_id: str, require_reduce_noise_calls: bool = True
 ):
-    with patch("mentor_pipeline.noise.reduce_noise") as mock_reduce_noise:
+    with patch("mentor_pipeline.noise.reduce_noise") as mock_reduce_noise, patch(
+        "mentor_pipeline.noise.update_noise_profile"
+    ) as mock_update_noise_profile:
+        mock_update_noise_profile.return_value = _noise_profile()
         mp = copy_mentor_to_tmp(
             mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
         )
@@ -42,3 +53,116 @@ def _test_utterance_noise_reduction(
         mock_noise_reducer.assert_has_calls(
             mp, fail_on_no_calls=require_reduce_noise_calls
         )
+        # each noise sample is analyzed once, before any noise reduction
+        noise_samples = sorted(set(c[0][0] for c in mock_reduce_noise.call_args_list))
+        assert [
+            c[0][0] for c in mock_update_noise_profile.call_args_list
+        ] == noise_samples
+
+
+def _noise_profile(source_hash: str = "noise-sample-hash") -> NoiseProfile:
+    return NoiseProfile(noiseThresh=np.zeros(1025), sourceHash=source_hash)
+
+
+@pytest.mark.parametrize(
+    "mentor_root,mentor_id",
+    [(MENTOR_ROOT, "mentor1-matches-noise-sample-to-utterance_by_prefix")],
+)
+def test_it_uses_the_most_specific_noise_sample_for_an_utterance(
+    mentor_root: str, mentor_id: str
+):
+    with patch("mentor_pipeline.noise.reduce_noise") as mock_reduce_noise, patch(
+        "mentor_pipeline.noise.update_noise_profile", return_value=_noise_profile()
+    ):
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        for name in ["s001.wav", "s001p001s00000000e00000100.wav"]:
+            shutil.copyfile(mp.get_noise_path("s001p001.wav"), mp.get_noise_path(name))
+        utterances_noise_reduction(mp.load_utterances(), mp)
+        mock_reduce_noise.assert_called_once_with(
+            mp.get_noise_path("s001p001s00000000e00000100.wav"),
+            mp.get_mentor_video("build/utterance_video/s001p001s00000000e00000100.mp4"),
+        )
+
+
+@pytest.mark.parametrize(
+    "mentor_root,mentor_id",
+    [(MENTOR_ROOT, "mentor1-matches-noise-sample-to-utterance_by_prefix")],
+)
+def test_it_reduces_noise_again_only_in_videos_that_were_rebuilt(
+    mentor_root: str, mentor_id: str
+):
+    with patch("mentor_pipeline.noise.reduce_noise") as mock_reduce_noise, patch(
+        "mentor_pipeline.noise.update_noise_profile", return_value=_noise_profile()
+    ) as mock_update_noise_profile, patch("logging.warning") as mock_logging_warning:
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        video = mp.get_mentor_video(
+            "build/utterance_video/s001p001s00000000e00000100.mp4"
+        )
+        utterances = mp.load_utterances()
+        utterances_noise_reduction(utterances, mp)
+        assert mock_reduce_noise.call_count == 1
+        ledger = mp.load_noise_reduction_ledger()
+        r = ledger.find("build/utterance_video/s001p001s00000000e00000100.mp4")
+        assert r.noiseSample == "build/noise/s001p001.wav"
+        assert r.profileHash == "noise-sample-hash"
+        utterances_noise_reduction(utterances, mp)
+        assert mock_reduce_noise.call_count == 1
+        # reduced with an older profile, so there's no source to reduce again
+        mock_update_noise_profile.return_value = _noise_profile("new-sample-hash")
+        utterances_noise_reduction(utterances, mp)
+        assert mock_reduce_noise.call_count == 1
+        mock_logging_warning.assert_called_once()
+        with open(video, "wb") as f:
+            f.write(b"sliced again")
+        utterances_noise_reduction(utterances, mp)
+        assert mock_reduce_noise.call_count == 2
+        assert (
+            mp.load_noise_reduction_ledger()
+            .find("build/utterance_video/s001p001s00000000e00000100.mp4")
+            .profileHash
+            == "new-sample-hash"
+        )
+
+
+@pytest.mark.parametrize(
+    "mentor_root,mentor_id", [(MENTOR_ROOT, "mentor2-slices-from-denoised-sessions")]
+)
+def test_it_skips_videos_sliced_from_a_denoised_session(
+    mentor_root: str, mentor_id: str
+):
+    def _write_target(tgt_file: str, content: str) -> None:
+        os.makedirs(os.path.dirname(tgt_file), exist_ok=True)
+        with open(tgt_file, "w") as f:
+            f.write(content)
+
+    with patch(
+        "mentor_pipeline.media_tools.video_to_audio",
+        side_effect=lambda src, tgt, **kwargs: _write_target(tgt, src),
+    ), patch(
+        "mentor_pipeline.noise.reduce_noise_to",
+        side_effect=lambda sample, src, tgt, stream=False: _write_target(tgt, src),
+    ), patch(
+        "mentor_pipeline.media_tools.slice_video",
+        side_effect=lambda src, tgt, *args, **kwargs: _write_target(tgt, src),
+    ) as mock_slice_video, patch(
+        "mentor_pipeline.noise.reduce_noise"
+    ) as mock_reduce_noise, patch(
+        "mentor_pipeline.noise.update_noise_profile", return_value=_noise_profile()
+    ):
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        utterances = sessions_to_audio(
+            mp.load_utterances(), mp, reduce_noise=True
+        ).utterances
+        utterances = utterances_slice_video(utterances, mp)
+        session_video_denoised = mp.get_denoised_path(
+            "build/recordings/session1/p1-some-questions.mp4"
+        )
+        assert mock_slice_video.call_args[0][0] == session_video_denoised
+        utterances_noise_reduction(utterances, mp)
+        mock_reduce_noise.assert_not_called()
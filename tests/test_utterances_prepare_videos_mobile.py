@@ -14,6 +14,7 @@ from .helpers import (
     MockMediaConverter,
     resource_root_mentors_for_test,
 )
+from mentor_pipeline.encode_profiles import EncodeProfile
 from mentor_pipeline.process import prepare_videos_mobile
 
 
@@ -45,6 +46,31 @@ def test_it_logs_info_for_each_call_to_generate_mobile_video(
     _test_utterances_prepare_videos_mobile(mentor_root, mentor_id, test_logging=True)
 
 
+@pytest.mark.parametrize("mentor_root,mentor_id", [(MENTOR_ROOT, "mentor1")])
+def test_it_encodes_with_the_given_profile_and_records_it_for_each_video(
+    mentor_root: str, mentor_id: str
+):
+    profile = EncodeProfile(name="preview", preset="veryfast", crf=28)
+
+    def _create_dummy_output(src_file, tgt_file, profile=None):
+        os.makedirs(os.path.dirname(tgt_file), exist_ok=True)
+        with open(tgt_file, "w") as f:
+            f.write(f"{src_file} profile={profile.name}")
+
+    with patch("mentor_pipeline.media_tools.video_encode_for_mobile") as mock_encode:
+        mock_encode.side_effect = _create_dummy_output
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        prepare_videos_mobile(mp.load_utterances(), mp, profile=profile)
+        assert mock_encode.call_count > 0
+        for c in mock_encode.call_args_list:
+            assert c.kwargs == dict(profile=profile)
+        profiles_by_asset = mp.load_encode_profiles_by_asset()
+        assert len(profiles_by_asset) == mock_encode.call_count
+        assert set(profiles_by_asset.values()) == {"preview"}
+
+
 def _test_utterances_prepare_videos_mobile(
     mentor_root: str, mentor_id: str, test_logging=False
 ):
@@ -11,9 +11,11 @@ from .helpers import (
     assert_utterances_match_expected,
     copy_mentor_to_tmp,
     MockAudioSlicer,
+    MockSessionSlicer,
     resource_root_mentors_for_test,
 )
 from mentor_pipeline.process import utterances_slice_audio
+from mentor_pipeline.utterance_asset_type import UTTERANCE_AUDIO
 
 
 MENTOR_DATA_ROOT = resource_root_mentors_for_test(__file__)
@@ -53,12 +55,106 @@ def test_it_logs_info_for_each_call_to_generate_utterance_audio(
     )
 
 
+@pytest.mark.parametrize(
+    "mentor_data_root,mentor_id",
+    [
+        (MENTOR_DATA_ROOT, "mentor1"),
+        (MENTOR_DATA_ROOT, "mentor2-skips-existing-audio"),
+    ],
+)
+def test_it_generates_the_same_utterances_when_slicing_with_many_jobs(
+    mentor_data_root: str, mentor_id: str
+):
+    _test_utterance_to_audio(
+        mentor_data_root, mentor_id, require_video_to_audio_calls=False, jobs=4
+    )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("mentor_data_root,mentor_id", [(MENTOR_DATA_ROOT, "mentor1")])
+def test_it_slices_all_utterances_of_a_session_at_once_when_slicing_by_session(
+    mentor_data_root: str, mentor_id: str, jobs: int
+):
+    with patch(
+        "mentor_pipeline.media_tools.slice_audio_session"
+    ) as mock_slice_audio_session, patch(
+        "mentor_pipeline.media_tools.slice_audio"
+    ) as mock_slice_audio:
+        mp = copy_mentor_to_tmp(mentor_id, mentor_data_root)
+        mock_session_slicer = MockSessionSlicer(mock_slice_audio_session)
+        actual_utterances = utterances_slice_audio(
+            mp.load_utterances(), mp, jobs=jobs, slice_by_session=True
+        )
+        mock_session_slicer.assert_has_calls(
+            mp,
+            UTTERANCE_AUDIO.get_mentor_asset_root(),
+            "expected-slice-audio-calls.yaml",
+            any_order=jobs > 1,
+        )
+        mock_slice_audio.assert_not_called()
+        assert_utterances_match_expected(mp, utterances=actual_utterances)
+
+
+@pytest.mark.parametrize("mentor_data_root,mentor_id", [(MENTOR_DATA_ROOT, "mentor1")])
+def test_it_slices_from_pcm_in_memory_when_slicing_in_memory(
+    mentor_data_root: str, mentor_id: str
+):
+    with patch(
+        "mentor_pipeline.pcm.slice_audio_session_pcm"
+    ) as mock_slice_audio_session_pcm, patch(
+        "mentor_pipeline.media_tools.slice_audio_session"
+    ) as mock_slice_audio_session, patch(
+        "mentor_pipeline.media_tools.slice_audio"
+    ) as mock_slice_audio:
+        mp = copy_mentor_to_tmp(mentor_id, mentor_data_root)
+        mock_session_slicer = MockSessionSlicer(mock_slice_audio_session_pcm)
+        actual_utterances = utterances_slice_audio(
+            mp.load_utterances(), mp, slice_in_memory=True
+        )
+        mock_session_slicer.assert_has_calls(
+            mp,
+            UTTERANCE_AUDIO.get_mentor_asset_root(),
+            "expected-slice-audio-calls.yaml",
+        )
+        mock_slice_audio_session.assert_not_called()
+        mock_slice_audio.assert_not_called()
+        assert_utterances_match_expected(mp, utterances=actual_utterances)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("mentor_data_root,mentor_id", [(MENTOR_DATA_ROOT, "mentor1")])
+def test_it_reports_utterances_that_fail_to_slice_as_failed_jobs(
+    mentor_data_root: str, mentor_id: str, jobs: int
+):
+    calls = []
+
+    def _slice_audio(src_file: str, target_file: str, *args, **kwargs):
+        calls.append(target_file)
+        if len(calls) == 1:
+            raise Exception("failed to slice")
+
+    with patch(
+        "mentor_pipeline.media_tools.slice_audio", side_effect=_slice_audio
+    ), patch("logging.info") as mock_logging_info:
+        mp = copy_mentor_to_tmp(mentor_id, mentor_data_root)
+        utterances_slice_audio(mp.load_utterances(), mp, jobs=jobs)
+        summaries = [
+            c[0][0]
+            for c in mock_logging_info.call_args_list
+            if c[0] and " jobs (" in str(c[0][0])
+        ]
+        assert len(calls) > 1
+        assert len(summaries) == 1
+        assert f"{len(calls)} jobs (1 failed)" in summaries[0]
+
+
 def _test_utterance_to_audio(
     mentor_data_root: str,
     mentor_id: str,
     require_video_to_audio_calls: bool = True,
     require_audio_slice_calls=True,
     test_logging=False,
+    jobs: int = 1,
 ):
     with patch("mentor_pipeline.media_tools.slice_audio") as mock_slice_audio, patch(
         "logging.info"
@@ -69,8 +165,8 @@ def _test_utterance_to_audio(
             mock_logging_info=mock_logging_info if test_logging else None,
         )
         utterances_before = mp.load_utterances()
-        actual_utterances = utterances_slice_audio(utterances_before, mp)
+        actual_utterances = utterances_slice_audio(utterances_before, mp, jobs=jobs)
         mock_audio_slicer.assert_has_calls(
-            mp, fail_on_no_calls=require_audio_slice_calls
+            mp, fail_on_no_calls=require_audio_slice_calls, any_order=jobs > 1
         )
         assert_utterances_match_expected(mp, utterances=actual_utterances)
@@ -6,15 +6,20 @@
 #
 import os
 import pytest
-from unittest.mock import patch
+from unittest.mock import call, patch
 
 from .helpers import (
     assert_utterances_match_expected,
     copy_mentor_to_tmp,
+    MockSessionSlicer,
     MockVideoSlicer,
     resource_root_mentors_for_test,
 )
+from mentor_pipeline.encode_profiles import EncodeProfile
+from mentor_pipeline.media_tools import LoudnessMeasurement
 from mentor_pipeline.process import utterances_slice_video
+from mentor_pipeline.utterance_asset_type import MentorAssetRoot, UTTERANCE_VIDEO
+from mentor_pipeline.utils import yaml_load
 
 
 MENTOR_ROOT = resource_root_mentors_for_test(__file__)
@@ -52,16 +57,236 @@ def test_it_logs_info_for_each_call_to_generate_utterance_video(
     )
 
 
+@pytest.mark.parametrize(
+    "mentor_root,mentor_id",
+    [(MENTOR_ROOT, "mentor1"), (MENTOR_ROOT, "mentor3-encodes-missing-video")],
+)
+def test_it_generates_the_same_utterances_when_slicing_with_many_jobs(
+    mentor_root: str, mentor_id: str
+):
+    _test_utterance_to_video(
+        mentor_root, mentor_id, require_video_to_audio_calls=False, jobs=4
+    )
+
+
+@pytest.mark.parametrize(
+    "mentor_root,mentor_id",
+    [(MENTOR_ROOT, "mentor1"), (MENTOR_ROOT, "mentor2-skips-existing-video")],
+)
+def test_it_slices_all_utterances_of_a_session_at_once_when_slicing_by_session(
+    mentor_root: str, mentor_id: str
+):
+    with patch(
+        "mentor_pipeline.media_tools.slice_video_session"
+    ) as mock_slice_video_session, patch(
+        "mentor_pipeline.media_tools.slice_video"
+    ) as mock_slice_video:
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        mock_session_slicer = MockSessionSlicer(mock_slice_video_session)
+        actual_utterances = utterances_slice_video(
+            mp.load_utterances(), mp, slice_by_session=True
+        )
+        mock_session_slicer.assert_has_calls(
+            mp,
+            UTTERANCE_VIDEO.get_mentor_asset_root(),
+            "expected-slice-video-calls.yaml",
+        )
+        mock_slice_video.assert_not_called()
+        assert_utterances_match_expected(mp, utterances=actual_utterances)
+
+
+@pytest.mark.parametrize(
+    "mentor_root,mentor_id",
+    [(MENTOR_ROOT, "mentor1"), (MENTOR_ROOT, "mentor2-skips-existing-video")],
+)
+def test_it_slices_each_utterance_with_smart_cut(mentor_root: str, mentor_id: str):
+    _test_utterance_to_video(
+        mentor_root, mentor_id, require_video_to_audio_calls=False, smart_cut=True
+    )
+
+
+@pytest.mark.parametrize("mentor_root,mentor_id", [(MENTOR_ROOT, "mentor1")])
+def test_it_measures_loudness_once_per_session_and_reuses_it_for_every_slice(
+    mentor_root: str, mentor_id: str
+):
+    loudness = LoudnessMeasurement(
+        input_i=-21.76,
+        input_lra=3.2,
+        input_tp=-11.35,
+        input_thresh=-31.76,
+        target_offset=0.04,
+    )
+    with patch(
+        "mentor_pipeline.media_tools.measure_loudness"
+    ) as mock_measure_loudness, patch(
+        "mentor_pipeline.media_tools.slice_video"
+    ) as mock_slice_video:
+        mock_measure_loudness.return_value = loudness
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        utterances_slice_video(mp.load_utterances(), mp, session_loudness=True)
+        expected_calls_data = yaml_load(
+            mp.get_mentor_data("expected-slice-video-calls.yaml")
+        )
+        sessions = sorted(
+            {mp.get_mentor_data(c["source"]) for c in expected_calls_data}
+        )
+        mock_measure_loudness.assert_has_calls(
+            [call(s) for s in sessions], any_order=True
+        )
+        assert mock_measure_loudness.call_count == len(sessions)
+        mock_slice_video.assert_has_calls(
+            [
+                call(
+                    mp.get_mentor_data(c["source"]),
+                    mp.get_mentor_video(c["target"]),
+                    c["time_start_secs"],
+                    c["time_end_secs"],
+                    loudness=loudness,
+                )
+                for c in expected_calls_data
+            ]
+        )
+        # measurements are persisted, so slicing again doesn't measure again
+        mock_measure_loudness.reset_mock()
+        utterances_slice_video(mp.load_utterances(), mp, session_loudness=True)
+        mock_measure_loudness.assert_not_called()
+        assert (
+            mp.load_session_loudness().find(
+                mp.to_relative_path(sessions[0], MentorAssetRoot.DATA), sessions[0]
+            )
+            == loudness
+        )
+
+
+@pytest.mark.parametrize(
+    "mentor_root,mentor_id", [(MENTOR_ROOT, "mentor2-skips-existing-video")]
+)
+def test_it_slices_only_missing_videos_and_renditions_with_renditions(
+    mentor_root: str, mentor_id: str
+):
+    with patch(
+        "mentor_pipeline.media_tools.slice_video_renditions"
+    ) as mock_slice_video_renditions, patch(
+        "mentor_pipeline.media_tools.slice_video"
+    ) as mock_slice_video:
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        actual_utterances = utterances_slice_video(
+            mp.load_utterances(), mp, renditions=True
+        )
+        mock_slice_video.assert_not_called()
+        assert_utterances_match_expected(mp, utterances=actual_utterances)
+        expected_video_targets = {
+            mp.get_mentor_video(c["target"])
+            for c in yaml_load(mp.get_mentor_data("expected-slice-video-calls.yaml"))
+        }
+        assert mock_slice_video_renditions.call_count == len(
+            actual_utterances.utterances()
+        )
+        for c in mock_slice_video_renditions.call_args_list:
+            # the mobile and web videos don't exist for any utterance,
+            # but some utterance videos do
+            assert c.kwargs["mobile_target_file"]
+            assert c.kwargs["web_target_file"]
+            assert (
+                c.kwargs["target_file"] is None
+                or c.kwargs["target_file"] in expected_video_targets
+            )
+        assert {
+            c.kwargs["target_file"]
+            for c in mock_slice_video_renditions.call_args_list
+            if c.kwargs["target_file"]
+        } == expected_video_targets
+
+
+@pytest.mark.parametrize("mentor_root,mentor_id", [(MENTOR_ROOT, "mentor1")])
+def test_it_rebuilds_only_videos_whose_inputs_changed(mentor_root: str, mentor_id: str):
+    def _create_dummy_output(src_file, tgt_file, time_start, time_end, **kwargs):
+        os.makedirs(os.path.dirname(tgt_file), exist_ok=True)
+        with open(tgt_file, "w") as f:
+            f.write(f"{src_file} {time_start}-{time_end}")
+
+    with patch("mentor_pipeline.media_tools.slice_video") as mock_slice_video:
+        mock_slice_video.side_effect = _create_dummy_output
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        utterances = utterances_slice_video(mp.load_utterances(), mp)
+        n_videos = mock_slice_video.call_count
+        assert n_videos > 0
+        # nothing changed, so nothing is rebuilt
+        mock_slice_video.reset_mock()
+        utterances = utterances_slice_video(utterances, mp)
+        mock_slice_video.assert_not_called()
+        # a fixed timestamp rebuilds only that utterance's video
+        u = utterances.utterances()[0]
+        u.timeEnd = float(u.timeEnd) + 1.0
+        utterances = utterances_slice_video(utterances, mp)
+        mock_slice_video.assert_called_once()
+        assert mock_slice_video.call_args.args[1] == mp.find_utterance_video(u)
+        assert mock_slice_video.call_args.args[3] == u.timeEnd
+        # new encode settings rebuild every video
+        mock_slice_video.reset_mock()
+        utterances_slice_video(
+            utterances, mp, profile=EncodeProfile(name="release", crf=20)
+        )
+        assert mock_slice_video.call_count == n_videos
+
+
+@pytest.mark.parametrize("mentor_root,mentor_id", [(MENTOR_ROOT, "mentor1")])
+def test_it_keeps_an_out_of_date_video_until_it_is_rebuilt(
+    mentor_root: str, mentor_id: str
+):
+    def _create_dummy_output(src_file, tgt_file, time_start, time_end, **kwargs):
+        os.makedirs(os.path.dirname(tgt_file), exist_ok=True)
+        with open(tgt_file, "w") as f:
+            f.write(f"{src_file} {time_start}-{time_end}")
+
+    def _fail(src_file, tgt_file, time_start, time_end, **kwargs):
+        # the out-of-date video is still there to be replaced
+        assert os.path.isfile(tgt_file)
+        raise Exception("failed to slice")
+
+    with patch("mentor_pipeline.media_tools.slice_video") as mock_slice_video:
+        mock_slice_video.side_effect = _create_dummy_output
+        mp = copy_mentor_to_tmp(
+            mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
+        )
+        utterances = utterances_slice_video(mp.load_utterances(), mp)
+        u = utterances.utterances()[0]
+        u.timeEnd = float(u.timeEnd) + 1.0
+        mock_slice_video.reset_mock()
+        mock_slice_video.side_effect = _fail
+        utterances = utterances_slice_video(utterances, mp)
+        mock_slice_video.assert_called_once()
+        assert os.path.isfile(mp.find_utterance_video(u))
+        # the rebuild failed, so the video is still out of date
+        mock_slice_video.reset_mock()
+        mock_slice_video.side_effect = _create_dummy_output
+        utterances_slice_video(utterances, mp)
+        mock_slice_video.assert_called_once()
+        assert mock_slice_video.call_args.args[1] == mp.find_utterance_video(u)
+
+
 def _test_utterance_to_video(
     mentor_root: str,
     mentor_id: str,
     require_video_to_audio_calls: bool = True,
     require_video_slice_calls: bool = True,
     test_logging=False,
+    jobs: int = 1,
+    smart_cut: bool = False,
 ):
-    with patch("mentor_pipeline.media_tools.slice_video") as mock_slice_video, patch(
-        "logging.info"
-    ) as mock_logging_info:
+    with patch(
+        "mentor_pipeline.media_tools.slice_video_smart_cut"
+        if smart_cut
+        else "mentor_pipeline.media_tools.slice_video"
+    ) as mock_slice_video, patch("logging.info") as mock_logging_info:
         mp = copy_mentor_to_tmp(
             mentor_id, os.path.join(mentor_root, mentor_id, "data", "mentors")
         )
@@ -70,8 +295,10 @@ def _test_utterance_to_video(
             mock_logging_info=mock_logging_info if test_logging else None,
         )
         utterances_before = mp.load_utterances()
-        actual_utterances = utterances_slice_video(utterances_before, mp)
+        actual_utterances = utterances_slice_video(
+            utterances_before, mp, jobs=jobs, smart_cut=smart_cut
+        )
         mock_video_slicer.assert_has_calls(
-            mp, fail_on_no_calls=require_video_slice_calls
+            mp, fail_on_no_calls=require_video_slice_calls, any_order=jobs > 1
         )
         assert_utterances_match_expected(mp, utterances=actual_utterances)
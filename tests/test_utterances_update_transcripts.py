@@ -4,11 +4,18 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
+import os
+import shutil
+
+import ffmpy
+import numpy as np
 import pytest
-from unittest.mock import patch
+import soundfile as sf
+from unittest.mock import Mock, patch
 
 from mentor_pipeline.process import update_transcripts
 import transcribe
+from transcribe import TranscribeJob, TranscribeJobStatus
 from mentor_pipeline.utterances import utterances_from_yaml
 
 from .helpers import (
@@ -102,3 +109,131 @@ def _test_utterances_update_transcripts(
         )
         mock_transcriptions.expect_calls()
         assert expected_utterances.to_dict() == actual_utterances.to_dict()
+
+
+def _write_audio(p: str, seed: int) -> None:
+    wav = f"{p}.wav"
+    sf.write(wav, np.random.default_rng(seed).standard_normal(8000) * 0.1, 16000)
+    ffmpy.FFmpeg(
+        global_options="-loglevel quiet -y", inputs={wav: None}, outputs={p: None}
+    ).run()
+    os.remove(wav)
+
+
+def _mock_transcription_service(fail_after_updates: int = -1) -> Mock:
+    """
+    a transcription service that completes one job per update
+    (and, with fail_after_updates, crashes after that many updates)
+    """
+
+    def _transcribe(requests, on_update=None, batch_id=""):
+        jobs = [
+            TranscribeJob(
+                jobId=r.jobId,
+                sourceFile=r.sourceFile,
+                status=TranscribeJobStatus.SUCCEEDED,
+                transcript=f"transcript %um of {os.path.basename(r.sourceFile)}",
+            )
+            for r in requests
+        ]
+        for i in range(len(jobs)):
+            if i == fail_after_updates:
+                raise KeyboardInterrupt()
+            if on_update:
+                on_update(Mock(result=Mock(jobs=Mock(return_value=jobs[: i + 1]))))
+        return Mock(jobs=Mock(return_value=jobs))
+
+    service = Mock()
+    service.transcribe.side_effect = _transcribe
+    return service
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="requires ffmpeg")
+def test_it_transcribes_the_same_audio_only_once_with_the_transcript_cache():
+    mpath = copy_mentor_to_tmp("mentor1", MENTOR_DATA_ROOT)
+    utterances = mpath.load_utterances()
+    audio_files = [mpath.find_utterance_audio(u) for u in utterances.utterances()]
+    for i, f in enumerate(audio_files):
+        _write_audio(f, seed=i)
+    service = _mock_transcription_service()
+    transcribed = update_transcripts(utterances, service, mpath, transcript_cache=True)
+    assert len(service.transcribe.call_args[0][0]) == len(audio_files)
+    assert all(
+        u.transcript == f"transcript of {os.path.basename(f)}"
+        for u, f in zip(transcribed.utterances(), audio_files)
+    )
+    # force updated, every transcript comes from the cache
+    force_updated = update_transcripts(
+        utterances, service, mpath, force_update=True, transcript_cache=True
+    )
+    assert service.transcribe.call_args[0][0] == []
+    assert force_updated.to_dict() == transcribed.to_dict()
+    assert mpath.load_utterances().to_dict() == transcribed.to_dict()
+    # only audio that changed is transcribed again
+    _write_audio(audio_files[0], seed=100)
+    update_transcripts(
+        utterances, service, mpath, force_update=True, transcript_cache=True
+    )
+    assert [r.sourceFile for r in service.transcribe.call_args[0][0]] == [
+        audio_files[0]
+    ]
+
+
+def test_it_journals_transcripts_on_each_update_and_writes_utterances_once():
+    mpath = copy_mentor_to_tmp("mentor1", MENTOR_DATA_ROOT)
+    utterances = mpath.load_utterances()
+    journal_sizes = []
+
+    def _on_update(update):
+        journal_sizes.append(len(mpath.load_transcript_journal()))
+        assert len(
+            [u for u in mpath.load_utterances().utterances() if u.transcript]
+        ) == len(journal_sizes)
+
+    with patch(
+        "mentor_pipeline.mentorpath.utterances_to_yaml"
+    ) as mock_utterances_to_yaml:
+        update_transcripts(
+            utterances, _mock_transcription_service(), mpath, on_update=_on_update
+        )
+        mock_utterances_to_yaml.assert_called_once()
+    # each update appends only the jobs completed since the last one
+    assert journal_sizes == list(range(1, len(utterances.utterances()) + 1))
+    assert not os.path.exists(mpath.get_transcript_journal_data_path())
+
+
+def test_it_replays_the_transcript_journal_after_a_crash():
+    mpath = copy_mentor_to_tmp("mentor1", MENTOR_DATA_ROOT)
+    utterances = mpath.load_utterances()
+    with pytest.raises(KeyboardInterrupt):
+        update_transcripts(
+            utterances, _mock_transcription_service(fail_after_updates=2), mpath
+        )
+    ids = [u.get_id() for u in utterances.utterances()]
+    assert [e.utteranceId for e in mpath.load_transcript_journal()] == ids[:2]
+    service = _mock_transcription_service()
+    result = update_transcripts(mpath.load_utterances(), service, mpath)
+    assert [r.jobId for r in service.transcribe.call_args[0][0]] == ids[2:]
+    assert all(u.transcript for u in result.utterances())
+    assert not os.path.exists(mpath.get_transcript_journal_data_path())
+    assert mpath.load_utterances().to_dict() == result.to_dict()
+
+
+def test_it_transcribes_journaled_utterances_again_when_force_updating():
+    mpath = copy_mentor_to_tmp("mentor1", MENTOR_DATA_ROOT)
+    utterances = mpath.load_utterances()
+    with pytest.raises(KeyboardInterrupt):
+        update_transcripts(
+            utterances, _mock_transcription_service(fail_after_updates=2), mpath
+        )
+    ids = [u.get_id() for u in utterances.utterances()]
+    # a stage that writes utterances meanwhile keeps the journal
+    mpath.write_utterances(mpath.load_utterances())
+    assert [e.utteranceId for e in mpath.load_transcript_journal()] == ids[:2]
+    service = _mock_transcription_service()
+    result = update_transcripts(
+        mpath.load_utterances(), service, mpath, force_update=True
+    )
+    assert [r.jobId for r in service.transcribe.call_args[0][0]] == ids
+    assert not os.path.exists(mpath.get_transcript_journal_data_path())
+    assert mpath.load_utterances().to_dict() == result.to_dict()